@@ -1,6 +1,10 @@
 from fastapi import APIRouter
-from api.endpoints import avistamentos, telemetria
+from api.endpoints import avistamentos, telemetria, places, metrics, tiles, sync
 
 api_router = APIRouter()
 api_router.include_router(avistamentos.router, tags=["avistamentos"])
 api_router.include_router(telemetria.router, tags=["telemetria"])
+api_router.include_router(places.router, tags=["places"])
+api_router.include_router(tiles.router, tags=["tiles"])
+api_router.include_router(sync.router, tags=["sync"])
+api_router.include_router(metrics.router, tags=["metrics"])
@@ -1,18 +1,83 @@
 import json
-from fastapi import APIRouter, Request, HTTPException, Header, Form
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
-from typing import Optional, Dict, Any
+from datetime import datetime, timezone
+from fastapi import APIRouter, Request, HTTPException, Header, Form, Body
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+from typing import Optional, Dict, Any, List
 
 from database import db
 from config import templates
-from services.avistamentos import query_avistamentos, build_avistamentos_url, count_avistamentos
-from services.storage import generate_signed_url
+from services.avistamentos import (
+    query_avistamentos,
+    build_avistamentos_url,
+    count_avistamentos,
+    export_avistamentos,
+    create_avistamento_doc,
+    patch_avistamento_doc,
+    update_avistamento_doc,
+    delete_avistamento_doc,
+    get_avistamentos,
+    update_avistamentos,
+    delete_avistamentos,
+    DATE_FIELDS,
+    LIST_FIELDS,
+    MAX_BATCH_DOCS,
+)
+from services.counters import count_headers
+from services.etags import etag_matches, make_etag, not_modified, validator_headers
+from services.export import EXPORT_EXTENSIONS, EXPORT_FORMATS, arrow_available
+from services.pagination import InvalidCursor
+from services.projection import parse_fields
+from services.storage import generate_signed_url, generate_signed_urls, signed_url_window
+from services.executor import run_blocking
+from services.serialization import api_response, is_api_request, response_format
+from services.versions import AVISTAMENTOS_VERSION, cached_version
 
 
 
 router = APIRouter()
 
 
+def _parse_data_param(data_str: Optional[str], is_end: bool = False) -> Optional[int]:
+    """
+    Converte date_start/date_end (timestamp Unix ou AAAA-MM-DD, em UTC como
+    `data_registro`) em timestamp. Strings vazias (formulários HTML) são None.
+    """
+    if not data_str or not data_str.strip():
+        return None
+    try:
+        return int(data_str)
+    except ValueError:
+        pass
+    try:
+        data = datetime.strptime(data_str.strip(), "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Data inválida, use AAAA-MM-DD ou timestamp")
+    if is_end:
+        # Fim do dia
+        data = data.replace(hour=23, minute=59, second=59)
+    return int(data.timestamp())
+
+
+def _check_date_filters(d_start, d_end, dia_registro, mes_registro, ano_registro):
+    # Intervalo de datas junto com dia/mes/ano_registro exigiria índices
+    # compostos para cada combinação (firestore.indexes.json só declara
+    # data_registro, registro)
+    if (d_start is not None or d_end is not None) and (
+        dia_registro is not None or mes_registro is not None or ano_registro is not None
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail="Use date_start/date_end ou dia/mes/ano_registro, não os dois",
+        )
+
+
+def _parse_fields_param(fields: Optional[str]):
+    try:
+        return parse_fields(fields)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Campos inválidos em `fields`")
+
+
 @router.get("/avistamentos")
 async def list_avistamentos(
     request: Request,
@@ -21,9 +86,14 @@ async def list_avistamentos(
     dia_registro: Optional[int] = None,
     mes_registro: Optional[int] = None,
     ano_registro: Optional[int] = None,
+    date_start: Optional[str] = None,
+    date_end: Optional[str] = None,
+    cursor: Optional[str] = None,
     format: Optional[str] = None,
     count: bool = False,
+    fields: Optional[str] = None,
     accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
 ):
     """
     Retorna avistamentos paginados em HTML ou JSON.
@@ -31,55 +101,116 @@ async def list_avistamentos(
     Por padrão retorna HTML para navegadores. Para JSON, use:
     - ?format=json ou
     - Header Accept: application/json
+
+    Para paginar sem custo proporcional à profundidade, use o `cursor`
+    retornado em `next_cursor`/`prev_cursor`. O parâmetro `page` continua
+    funcionando por compatibilidade.
+
+    Com `count=true` o total vem dos contadores pré-calculados e a resposta
+    traz X-Counts-Updated-At.
+
+    A ETag vem da versão da coleção (versoes/avistamentos, incrementada a cada
+    escrita) e dos parâmetros; com If-None-Match igual responde 304 sem
+    consultar nem renderizar.
+
+    `date_start`/`date_end` (AAAA-MM-DD ou timestamp, inclusivos) filtram por
+    intervalo de datas do registro, ordenando por data; não combinam com
+    dia/mes/ano_registro (400).
+
+    `fields=registro,local,...` retorna só esses campos (lidos do Firestore
+    com select). O HTML usa por padrão só os campos exibidos na tabela.
     """
+    d_start = _parse_data_param(date_start)
+    d_end = _parse_data_param(date_end, is_end=True)
+    _check_date_filters(d_start, d_end, dia_registro, mes_registro, ano_registro)
+    projection = _parse_fields_param(fields)
+
+    representation = response_format(format, accept)
+    if projection is None and representation == "html":
+        projection = LIST_FIELDS
+    version = await run_blocking(cached_version, AVISTAMENTOS_VERSION)
+
     if count:
-        total = count_avistamentos(
+        etag = make_etag(
+            "avistamentos/count", version, representation, dia_registro, mes_registro, ano_registro, d_start, d_end
+        )
+        if etag_matches(if_none_match, etag):
+            return not_modified(validator_headers(etag))
+        total, updated_at = await run_blocking(
+            count_avistamentos,
             dia_registro=dia_registro,
             mes_registro=mes_registro,
             ano_registro=ano_registro,
+            date_start=d_start,
+            date_end=d_end,
         )
-        return JSONResponse({"count": total})
-
-    items, page, page_size, has_more = query_avistamentos(
-        page=page,
-        page_size=page_size,
-        dia_registro=dia_registro,
-        mes_registro=mes_registro,
-        ano_registro=ano_registro,
-    )
+        return api_response({"count": total}, accept, format, headers=count_headers(etag, updated_at))
 
-    # Decide o formato: JSON se format=json ou Accept contém application/json
-    return_json = (
-        format == "json"
-        or (accept and "application/json" in accept and "text/html" not in accept)
+    # O HTML traz URLs assinadas das imagens: a ETag muda antes que expirem
+    etag = make_etag(
+        "avistamentos", version, representation, page, page_size, dia_registro, mes_registro, ano_registro,
+        cursor, d_start, d_end, projection, signed_url_window() if representation == "html" else None,
     )
+    headers = validator_headers(etag)
+    if etag_matches(if_none_match, etag):
+        return not_modified(headers)
 
-    if return_json:
-        return JSONResponse(
+    try:
+        items, page, page_size, has_more, next_cursor, prev_cursor = await run_blocking(
+            query_avistamentos,
+            page=page,
+            page_size=page_size,
+            dia_registro=dia_registro,
+            mes_registro=mes_registro,
+            ano_registro=ano_registro,
+            cursor=cursor,
+            date_start=d_start,
+            date_end=d_end,
+            fields=projection,
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+    # Decide o formato: dados (JSON ou MessagePack) se pedidos em format ou Accept
+    if representation != "html":
+        return api_response(
             {
                 "page": page,
                 "page_size": page_size,
                 "count": len(items),
                 "items": items,
-            }
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
+            },
+            accept,
+            format,
+            headers=headers,
         )
 
-    # Retorna HTML
-    next_page = page + 1 if has_more else None
-    prev_page = page - 1 if page > 1 else None
+    # Miniaturas: assina as URLs de todas as imagens da página de uma vez
+    image_filenames = {item.get("registro"): f"imagens/{item.get('registro')}.jpg" for item in items}
+    try:
+        image_urls = await run_blocking(generate_signed_urls, list(image_filenames.values()))
+    except Exception as e:
+        print(f"Erro ao gerar URLs assinadas: {e}")
+        image_urls = {}
+    for item in items:
+        item["image_url"] = image_urls.get(image_filenames[item.get("registro")])
 
+    # Retorna HTML (os links usam o cursor; `page` serve apenas para exibição)
     next_page_url = (
         build_avistamentos_url(
-            next_page, page_size, dia_registro, mes_registro, ano_registro
+            page + 1, page_size, dia_registro, mes_registro, ano_registro, next_cursor, date_start, date_end
         )
-        if next_page
+        if next_cursor
         else None
     )
     prev_page_url = (
         build_avistamentos_url(
-            prev_page, page_size, dia_registro, mes_registro, ano_registro
+            max(page - 1, 1), page_size, dia_registro, mes_registro, ano_registro, prev_cursor,
+            date_start, date_end,
         )
-        if prev_page
+        if prev_cursor
         else None
     )
 
@@ -95,16 +226,122 @@ async def list_avistamentos(
             "dia_registro": dia_registro,
             "mes_registro": mes_registro,
             "ano_registro": ano_registro,
+            "date_start": date_start,
+            "date_end": date_end,
         },
+        headers=headers,
+    )
+
+
+@router.get("/avistamentos/export")
+async def export_avistamentos_endpoint(
+    format: str = "ndjson",
+    dia_registro: Optional[int] = None,
+    mes_registro: Optional[int] = None,
+    ano_registro: Optional[int] = None,
+    date_start: Optional[str] = None,
+    date_end: Optional[str] = None,
+):
+    """
+    Exporta todos os avistamentos que correspondem aos filtros em uma única
+    resposta, como NDJSON (padrão), CSV (`format=csv`) ou Arrow IPC
+    (`format=arrow`). Os documentos são lidos e enviados em blocos.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato inválido, use: {', '.join(EXPORT_FORMATS)}")
+    if format == "arrow" and not arrow_available():
+        raise HTTPException(status_code=501, detail="Exportação Arrow requer pyarrow (requirements-optional.txt)")
+
+    d_start = _parse_data_param(date_start)
+    d_end = _parse_data_param(date_end, is_end=True)
+    _check_date_filters(d_start, d_end, dia_registro, mes_registro, ano_registro)
+
+    body = export_avistamentos(format, dia_registro, mes_registro, ano_registro, d_start, d_end)
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="avistamentos.{EXPORT_EXTENSIONS[format]}"'},
     )
 
 
+def _check_batch_size(count: int):
+    if count > MAX_BATCH_DOCS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_BATCH_DOCS} avistamentos por requisição")
+
+
+def _batch_results(results: Dict[str, str]) -> Dict[str, Any]:
+    totals: Dict[str, int] = {}
+    for status in results.values():
+        totals[status] = totals.get(status, 0) + 1
+    return {
+        "results": [{"registro": registro, "status": status} for registro, status in results.items()],
+        "totals": totals,
+    }
+
+
+@router.post("/avistamentos:batchGet")
+async def batch_get_avistamentos(
+    registros: List[str] = Body(..., embed=True),
+    format: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+):
+    """
+    Lê vários avistamentos em uma única consulta.
+
+    Body: {"registros": ["123", "456", ...]}. A resposta traz um resultado
+    por avistamento, na ordem pedida: status "found" (com o avistamento) ou
+    "not_found".
+    """
+    _check_batch_size(len(registros))
+    avistamentos = await run_blocking(get_avistamentos, registros)
+    results = [
+        {"registro": registro, "status": "found", "avistamento": avistamento}
+        if avistamento is not None
+        else {"registro": registro, "status": "not_found"}
+        for registro, avistamento in avistamentos.items()
+    ]
+    return api_response({"results": results}, accept, format)
+
+
+@router.patch("/avistamentos:batch")
+async def batch_update_avistamentos(
+    updates: Dict[str, Dict[str, Any]] = Body(..., embed=True),
+    format: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+):
+    """
+    Atualiza vários avistamentos em poucos commits.
+
+    Body: {"updates": {"123": {"campo": "valor"}, ...}}. A resposta traz um
+    resultado por avistamento ("updated" ou "not_found") e os totais.
+    """
+    _check_batch_size(len(updates))
+    results = await run_blocking(update_avistamentos, updates)
+    return api_response(_batch_results(results), accept, format)
+
+
+@router.delete("/avistamentos:batch")
+async def batch_delete_avistamentos(
+    registros: List[str] = Body(..., embed=True),
+    format: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+):
+    """
+    Remove vários avistamentos em poucos commits.
+
+    Body: {"registros": ["123", ...]}. A resposta traz um resultado por
+    avistamento ("deleted" ou "not_found") e os totais.
+    """
+    _check_batch_size(len(registros))
+    results = await run_blocking(delete_avistamentos, registros)
+    return api_response(_batch_results(results), accept, format)
+
+
 @router.post("/avistamentos/{registro}")
 async def create_avistamento(registro, body):
     json_data = json.loads(body)
-    registro_ref = db.collection("avistamentos").document(registro)
-    registro_ref.set(json_data)
-    return {"message": "Avistamento criado com sucesso", "avistamento": json_data}
+    avistamento = await run_blocking(create_avistamento_doc, registro, json_data)
+    return {"message": "Avistamento criado com sucesso", "avistamento": avistamento}
 
 
 @router.get("/avistamentos/{registro}")
@@ -112,7 +349,9 @@ async def read_avistamento(
     request: Request,
     registro: str,
     format: Optional[str] = None,
+    fields: Optional[str] = None,
     accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
 ):
     """
     Retorna um avistamento específico em HTML ou JSON.
@@ -120,34 +359,42 @@ async def read_avistamento(
     Por padrão retorna HTML para navegadores. Para JSON, use:
     - ?format=json ou
     - Header Accept: application/json
+
+    `fields=registro,local,...` lê e retorna só esses campos.
+
+    A ETag vem da data da última atualização do documento; com If-None-Match
+    igual responde 304 sem assinar a URL da imagem nem renderizar.
     """
+    projection = _parse_fields_param(fields)
     doc_ref = db.collection("avistamentos").document(registro)
-    doc = doc_ref.get()
+    doc = await run_blocking(doc_ref.get, None if projection is None else list(projection))
 
     if not doc.exists:
         raise HTTPException(status_code=404, detail="Avistamento não encontrado")
 
+    representation = response_format(format, accept)
+    headers = validator_headers(
+        make_etag("avistamento", registro, doc.update_time, representation, projection, signed_url_window())
+    )
+    if etag_matches(if_none_match, headers["ETag"]):
+        return not_modified(headers)
+
     avistamento = doc.to_dict()
 
     # Gera URL assinada para a imagem
     # Assumindo que o nome do arquivo é imagens/{registro}.jpg
     image_filename = f"imagens/{registro}.jpg"
     try:
-        image_url = generate_signed_url(image_filename)
+        image_url = await run_blocking(generate_signed_url, image_filename)
     except Exception as e:
         print(f"Erro ao gerar URL assinada: {e}")
         image_url = None
 
-    # Decide o formato: JSON se format=json ou Accept contém application/json
-    return_json = (
-        format == "json"
-        or (accept and "application/json" in accept and "text/html" not in accept)
-    )
-
-    if return_json:
+    # Decide o formato: dados (JSON ou MessagePack) se pedidos em format ou Accept
+    if representation != "html":
         response_data = avistamento.copy()
         response_data["image_url"] = image_url
-        return JSONResponse(response_data)
+        return api_response(response_data, accept, format, headers=headers)
 
     return templates.TemplateResponse(
         request=request,
@@ -158,6 +405,7 @@ async def read_avistamento(
             "avistamento": avistamento,
             "image_url": image_url,
         },
+        headers=headers,
     )
 
 
@@ -167,7 +415,7 @@ async def edit_avistamento_form(request: Request, registro: str):
     Exibe o formulário de edição de um avistamento.
     """
     doc_ref = db.collection("avistamentos").document(registro)
-    doc = doc_ref.get()
+    doc = await run_blocking(doc_ref.get)
 
     if not doc.exists:
         raise HTTPException(status_code=404, detail="Avistamento não encontrado")
@@ -193,56 +441,50 @@ async def update_avistamento(
 
     Aceita JSON no body. Para HTML, redireciona após atualização.
     """
-    doc_ref = db.collection("avistamentos").document(registro)
-    doc = doc_ref.get()
+    # Decide o formato: dados (JSON ou MessagePack) se pedidos em format ou Accept
+    return_json = is_api_request(format, accept)
 
-    if not doc.exists:
-        raise HTTPException(status_code=404, detail="Avistamento não encontrado")
+    if not return_json:
+        # O redirecionamento não precisa do documento: um único commit
+        if not await run_blocking(patch_avistamento_doc, registro, avistamento_data):
+            raise HTTPException(status_code=404, detail="Avistamento não encontrado")
+        return RedirectResponse(url=f"/avistamentos/{registro}", status_code=303)
 
-    # Atualiza o documento
-    doc_ref.update(avistamento_data)
+    # Atualiza o documento (e os contadores, se a data de registro mudou)
+    updated_avistamento = await run_blocking(update_avistamento_doc, registro, avistamento_data)
 
-    # Busca o documento atualizado
-    updated_doc = doc_ref.get()
-    updated_avistamento = updated_doc.to_dict()
+    if updated_avistamento is None:
+        raise HTTPException(status_code=404, detail="Avistamento não encontrado")
 
-    # Decide o formato: JSON se format=json ou Accept contém application/json
-    return_json = (
-        format == "json"
-        or (accept and "application/json" in accept and "text/html" not in accept)
+    return api_response(
+        {"message": "Avistamento atualizado com sucesso", "avistamento": updated_avistamento}, accept, format
     )
 
-    if return_json:
-        return JSONResponse(
-            {"message": "Avistamento atualizado com sucesso", "avistamento": updated_avistamento}
-        )
-
-    # Para HTML, redireciona para a visualização
-    return RedirectResponse(url=f"/avistamentos/{registro}", status_code=303)
-
 
-@router.post("/avistamentos/{registro}")
+@router.post("/avistamentos/{registro}/edit")
 async def update_avistamento_form(registro: str, request: Request):
     """
-    Atualiza um avistamento via formulário HTML.
-    """
-    doc_ref = db.collection("avistamentos").document(registro)
-    doc = doc_ref.get()
-
-    if not doc.exists:
-        raise HTTPException(status_code=404, detail="Avistamento não encontrado")
+    Atualiza um avistamento via formulário HTML (templates/avistamentos/edit.html).
 
+    O formulário reenvia a data de registro original em campos ocultos
+    ({campo}_original); a data só é gravada se mudou, senão a atualização é
+    um único commit sem leitura.
+    """
     # Constrói o dicionário com os dados do formulário (apenas campos não vazios)
     form_data = await request.form()
     update_data = {}
     for key, value in form_data.items():
-        # Ignora campos vazios, "None" como string, e o campo registro (não deve ser atualizado)
-        if key != "registro" and value and value != "None" and value != "":
+        # Ignora campos vazios, "None" como string, o campo registro (não deve
+        # ser atualizado) e os valores originais da data
+        if key != "registro" and not key.endswith("_original") and value and value != "None" and value != "":
             update_data[key] = value
+    for field in DATE_FIELDS:
+        if field in update_data and update_data[field] == form_data.get(f"{field}_original"):
+            del update_data[field]
 
-    # Atualiza o documento apenas se houver dados para atualizar
-    if update_data:
-        doc_ref.update(update_data)
+    # Um único commit, exceto se a data de registro muda (contadores)
+    if not await run_blocking(patch_avistamento_doc, registro, update_data):
+        raise HTTPException(status_code=404, detail="Avistamento não encontrado")
 
     # Redireciona para a visualização
     return RedirectResponse(url=f"/avistamentos/{registro}", status_code=303)
@@ -260,22 +502,14 @@ async def delete_avistamento(
     - JSON: DELETE /avistamentos/{registro}?format=json
     - HTML: redireciona para a lista após excluir.
     """
-    doc_ref = db.collection("avistamentos").document(registro)
-    doc = doc_ref.get()
-
-    if not doc.exists:
+    if not await run_blocking(delete_avistamento_doc, registro):
         raise HTTPException(status_code=404, detail="Avistamento não encontrado")
 
-    doc_ref.delete()
-
-    # Decide o formato: JSON se format=json ou Accept contém application/json
-    return_json = (
-        format == "json"
-        or (accept and "application/json" in accept and "text/html" not in accept)
-    )
+    # Decide o formato: dados (JSON ou MessagePack) se pedidos em format ou Accept
+    return_json = is_api_request(format, accept)
 
     if return_json:
-        return JSONResponse({"message": "Avistamento deletado com sucesso", "registro": registro})
+        return api_response({"message": "Avistamento deletado com sucesso", "registro": registro}, accept, format)
 
     # Para HTML, redireciona para a lista
     return RedirectResponse(url="/avistamentos", status_code=303)
@@ -286,12 +520,7 @@ async def delete_avistamento_form(registro: str):
     """
     Remove um avistamento via formulário HTML (POST).
     """
-    doc_ref = db.collection("avistamentos").document(registro)
-    doc = doc_ref.get()
-
-    if not doc.exists:
+    if not await run_blocking(delete_avistamento_doc, registro):
         raise HTTPException(status_code=404, detail="Avistamento não encontrado")
 
-    doc_ref.delete()
-
     return RedirectResponse(url="/avistamentos", status_code=303)
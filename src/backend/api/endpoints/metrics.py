@@ -0,0 +1,50 @@
+from fastapi import APIRouter
+
+from services.heatmap import heatmap_cache, heatmap_points_cache
+from services.positions import position_index
+from services.query_cache import (
+    avistamentos_cache,
+    avistamentos_count_flight,
+    telemetria_cache,
+    telemetria_count_flight,
+)
+from services.serialization import APIResponse
+from services.storage import signed_url_cache
+from services.tile_cache import tile_cache
+from services.tiles import tile_data_cache
+from services.tracks import track_cache, track_points_cache
+from services.versions import versions_cache
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def metrics():
+    """
+    Cache statistics (size, hits, misses, hit ratio) for monitoring, and
+    how many calls of each list/count route were coalesced with an identical
+    in-flight one.
+    """
+    return APIResponse(
+        {
+            "query_cache": {
+                "avistamentos": avistamentos_cache.stats(),
+                "telemetria": telemetria_cache.stats(),
+                "tracks": track_cache.stats(),
+                "track_points": track_points_cache.stats(),
+                "heatmap": heatmap_cache.stats(),
+                "heatmap_points": heatmap_points_cache.stats(),
+                "tile_data": tile_data_cache.stats(),
+                "versions": versions_cache.stats(),
+            },
+            "coalesced": {
+                "avistamentos": avistamentos_cache.flight.stats(),
+                "avistamentos_count": avistamentos_count_flight.stats(),
+                "telemetria": telemetria_cache.flight.stats(),
+                "telemetria_count": telemetria_count_flight.stats(),
+            },
+            "signed_url_cache": signed_url_cache.stats(),
+            "position_index": position_index.stats(),
+            "tile_cache": tile_cache.stats(),
+        }
+    )
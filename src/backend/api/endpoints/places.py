@@ -0,0 +1,65 @@
+import math
+
+from fastapi import APIRouter, Header, HTTPException
+from typing import Dict, Any, Optional
+
+from services.places import get_place_index
+from services.serialization import api_response
+
+router = APIRouter()
+
+# Maximum number of points per batch lookup
+MAX_BATCH_POINTS = 100000
+
+
+def _place_index():
+    try:
+        return get_place_index()
+    except (OSError, ValueError) as e:
+        print(f"Error loading places: {e}")
+        raise HTTPException(status_code=503, detail="Places are not available")
+
+
+@router.get("/places/lookup")
+async def lookup_place(lat: float, lon: float, accept: Optional[str] = Header(None)):
+    """
+    Returns the name of the place (places.json polygon) containing the point,
+    or null if it is outside every place.
+    """
+    if not (math.isfinite(lat) and math.isfinite(lon)):
+        raise HTTPException(status_code=400, detail="lat and lon must be finite numbers")
+    name = _place_index().lookup(lat, lon)
+    return api_response({"lat": lat, "lon": lon, "name": name}, accept)
+
+
+@router.post("/places/lookup")
+async def lookup_places(body: Dict[str, Any], accept: Optional[str] = Header(None)):
+    """
+    Batch variant: resolves many points at once.
+
+    Body: {"points": [{"lat": -3.85, "lon": -32.42}, ...]}
+    """
+    points = body.get("points")
+    if not isinstance(points, list):
+        raise HTTPException(status_code=400, detail="Body must contain a 'points' list")
+    if len(points) > MAX_BATCH_POINTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_POINTS} points per request")
+
+    try:
+        lats = [float(p["lat"]) for p in points]
+        lons = [float(p["lon"]) for p in points]
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Each point needs numeric 'lat' and 'lon'")
+    if not all(math.isfinite(value) for value in lats + lons):
+        raise HTTPException(status_code=400, detail="lat and lon must be finite numbers")
+
+    names = _place_index().lookup_many(lats, lons)
+    return api_response(
+        {
+            "count": len(names),
+            "results": [
+                {"lat": lat, "lon": lon, "name": name} for lat, lon, name in zip(lats, lons, names)
+            ],
+        },
+        accept,
+    )
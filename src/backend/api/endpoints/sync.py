@@ -0,0 +1,73 @@
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse
+
+from config import SYNC_BUNDLE_PATH
+from services.etags import etag_matches, make_etag, not_modified, validator_headers
+from services.executor import run_blocking
+from services.serialization import api_response, wants_msgpack
+from services.sync import decode_watermark, places_version, sync_changes, telemetria_cutoff
+from services.versions import AVISTAMENTOS_VERSION, TELEMETRIA_VERSION, cached_version
+
+router = APIRouter()
+
+BUNDLE_MEDIA_TYPE = "application/gzip"
+
+
+@router.get("/sync")
+async def sync(
+    since: str,
+    format: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Sightings, deleted sightings, recent telemetry and places changed after
+    the watermark `since` (JSON, or MessagePack with
+    Accept: application/msgpack or ?format=msgpack).
+
+    The first watermark comes from the snapshot bundle (/sync/bundle); each
+    response carries the next one. While `has_more` is true, call again
+    right away with it.
+
+    The ETag comes from `since` and the dataset versions, so polling without
+    new data gets a 304 without querying Firestore.
+    """
+    try:
+        decode_watermark(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid watermark in since")
+
+    versions = [await run_blocking(cached_version, name) for name in (AVISTAMENTOS_VERSION, TELEMETRIA_VERSION)]
+    representation = "msgpack" if wants_msgpack(accept, format) else "json"
+    headers = validator_headers(
+        make_etag("sync", since, *versions, places_version(), telemetria_cutoff(), representation)
+    )
+    if etag_matches(if_none_match, headers["ETag"]):
+        return not_modified(headers)
+
+    changes = await run_blocking(sync_changes, since)
+    return api_response(changes, accept, format, headers=headers)
+
+
+@router.get("/sync/bundle")
+async def sync_bundle(if_none_match: Optional[str] = Header(None)):
+    """
+    Snapshot bundle for the initial sync, built by scripts/build_sync_bundle.py:
+    a gzipped MessagePack map with every sighting, the places, the recent
+    telemetry as little-endian columns (raw bytes, see `dtypes`) and the
+    `watermark` to pass to /sync afterwards.
+    """
+    try:
+        stat = os.stat(SYNC_BUNDLE_PATH)
+    except OSError:
+        raise HTTPException(status_code=404, detail="Sync bundle has not been built")
+
+    headers = {"ETag": make_etag("sync/bundle", stat.st_mtime_ns, stat.st_size), "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return not_modified(headers)
+    return FileResponse(
+        SYNC_BUNDLE_PATH, media_type=BUNDLE_MEDIA_TYPE, filename="sync_bundle.msgpack.gz", headers=headers
+    )
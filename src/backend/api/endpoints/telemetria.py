@@ -1,14 +1,97 @@
+import math
 from datetime import datetime
 
-from fastapi import APIRouter, Request, Header
-from fastapi.responses import JSONResponse
-from typing import Optional
+from fastapi import APIRouter, Request, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Tuple
 
-from services.telemetria import query_telemetria, build_telemetria_url, count_telemetria
+from services.telemetria import (
+    LIST_FIELDS,
+    query_telemetria,
+    build_telemetria_url,
+    count_telemetria,
+    export_telemetria,
+)
+from services.counters import count_headers
+from services.etags import etag_matches, make_etag, not_modified, validator_headers
+from services.export import EXPORT_EXTENSIONS, EXPORT_FORMATS, arrow_available
+from services.executor import run_blocking
+from services.serialization import api_response, response_format
+from services.geohash import MAX_PRECISION
+from services.pagination import InvalidCursor
+from services.heatmap import MAX_ZOOM, WEIGHT_COUNT, WEIGHTS, heatmap, zoom_cell_size
+from services.projection import parse_fields
+from services.positions import MAX_POSITION_OIDS, positions_at, positions_between
+from services.telemetria_analytics import all_movement_stats, movement_stats
+from services.tracks import DOUGLAS_PEUCKER, SIMPLIFY_METHODS, get_track
+from services.versions import TELEMETRIA_VERSION, cached_version
 from config import templates
 
 router = APIRouter()
 
+
+def _parse_date_param(date_str: Optional[str], is_end: bool = False) -> Optional[int]:
+    # Parse dates from string (handles empty strings from HTML forms)
+    if not date_str or not date_str.strip():
+        return None
+    # Try numeric timestamp first
+    try:
+        return int(date_str)
+    except ValueError:
+        pass
+
+    # Try YYYY-MM-DD
+    try:
+        dt = datetime.strptime(date_str, "%Y-%m-%d")
+        if is_end:
+             # Set to end of day
+             dt = dt.replace(hour=23, minute=59, second=59)
+        return int(dt.timestamp())
+    except ValueError:
+        return None
+
+
+def _check_coordinates(param: str, lat: float, lon: float):
+    if not (math.isfinite(lat) and math.isfinite(lon)):
+        raise HTTPException(status_code=400, detail=f"{param} must contain finite numbers")
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        raise HTTPException(
+            status_code=400, detail=f"{param} out of range: latitude in [-90, 90], longitude in [-180, 180]"
+        )
+
+
+def _parse_bbox(bbox: Optional[str]) -> Optional[Tuple[float, float, float, float]]:
+    if not bbox:
+        return None
+    try:
+        bounds = tuple(float(value) for value in bbox.split(","))
+    except ValueError:
+        bounds = ()
+    if len(bounds) != 4:
+        raise HTTPException(status_code=400, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+    min_lon, min_lat, max_lon, max_lat = bounds
+    _check_coordinates("bbox", min_lat, min_lon)
+    _check_coordinates("bbox", max_lat, max_lon)
+    if min_lon > max_lon or min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="bbox minimums must not exceed its maximums")
+    return bounds
+
+
+def _parse_near(near: Optional[str], radius: Optional[float]) -> Optional[Tuple[float, float, float]]:
+    if not near:
+        return None
+    try:
+        lat, lon = (float(value) for value in near.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="near must be lat,lon")
+    _check_coordinates("near", lat, lon)
+    if radius is None:
+        raise HTTPException(status_code=400, detail="near requires radius (meters)")
+    if not math.isfinite(radius):
+        raise HTTPException(status_code=400, detail="radius must be a finite number of meters")
+    return lat, lon, radius
+
+
 @router.get("/telemetria")
 async def list_telemetria(
     request: Request,
@@ -17,74 +100,115 @@ async def list_telemetria(
     oid: Optional[str] = None,
     date_start: Optional[str] = None,
     date_end: Optional[str] = None,
+    cursor: Optional[str] = None,
     format: Optional[str] = None,
     count: bool = False,
+    bbox: Optional[str] = None,
+    near: Optional[str] = None,
+    radius: Optional[float] = Query(None, gt=0),
+    fields: Optional[str] = None,
     accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
 ):
     """
     Returns paginated telemetry data in HTML or JSON.
 
+    Spatial filters (combined with oid and dates):
+    - bbox=min_lon,min_lat,max_lon,max_lat
+    - near=lat,lon&radius=meters
+
     For JSON, use:
     - ?format=json or
     - Header Accept: application/json
+
+    `fields=oid,date,latitude,longitude` returns only those fields (read
+    from Firestore with select). HTML defaults to the table columns.
+
+    Deep pages should be fetched with the `cursor` returned in
+    `next_cursor`/`prev_cursor`. The `page` parameter is kept for compatibility.
+
+    With `count=true` the total comes from the precomputed counters and the
+    response carries X-Counts-Updated-At.
+
+    The ETag comes from the telemetry version (versoes/telemetria, bumped by
+    every import) and the parameters; a matching If-None-Match gets a 304
+    without querying or rendering.
     """
-    # Parse dates from string (handles empty strings from HTML forms)
-    def parse_date_param(date_str: Optional[str], is_end: bool = False) -> Optional[int]:
-        if not date_str or not date_str.strip():
-            return None
-        # Try numeric timestamp first
-        try:
-            return int(date_str)
-        except ValueError:
-            pass
-        
-        # Try YYYY-MM-DD
-        try:
-            dt = datetime.strptime(date_str, "%Y-%m-%d")
-            if is_end:
-                 # Set to end of day
-                 dt = dt.replace(hour=23, minute=59, second=59)
-            return int(dt.timestamp())
-        except ValueError:
-            return None
-
-    d_start = parse_date_param(date_start)
-    d_end = parse_date_param(date_end, is_end=True)
+    d_start = _parse_date_param(date_start)
+    d_end = _parse_date_param(date_end, is_end=True)
 
     # Sanitize OID
     if oid is not None and not oid.strip():
         oid = None
 
+    area_bbox = _parse_bbox(bbox)
+    area_near = _parse_near(near, radius)
+    if area_bbox is not None and area_near is not None:
+        raise HTTPException(status_code=400, detail="Use only one of bbox or near")
+
+    try:
+        projection = parse_fields(fields)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid field names in fields")
+
+    representation = response_format(format, accept)
+    if projection is None and representation == "html":
+        projection = LIST_FIELDS
+    version = await run_blocking(cached_version, TELEMETRIA_VERSION)
+
     if count:
-        total = count_telemetria(
+        etag = make_etag("telemetria/count", version, representation, oid, d_start, d_end, area_bbox, area_near)
+        if etag_matches(if_none_match, etag):
+            return not_modified(validator_headers(etag))
+        total, updated_at = await run_blocking(
+            count_telemetria,
             oid=oid,
             date_start=d_start,
             date_end=d_end,
+            bbox=area_bbox,
+            near=area_near,
         )
-        return JSONResponse({"count": total})
+        return api_response({"count": total}, accept, format, headers=count_headers(etag, updated_at))
 
-    items, page, page_size, has_more = query_telemetria(
-        page=page,
-        page_size=page_size,
-        oid=oid,
-        date_start=d_start,
-        date_end=d_end,
+    headers = validator_headers(
+        make_etag(
+            "telemetria", version, representation, page, page_size, oid, d_start, d_end, cursor,
+            area_bbox, area_near, projection,
+        )
     )
+    if etag_matches(if_none_match, headers["ETag"]):
+        return not_modified(headers)
 
-    # Decide format: JSON if format=json or Accept contains application/json (and not preferring html)
-    return_json = (
-        format == "json"
-        or (accept and "application/json" in accept and "text/html" not in accept)
-    )
+    try:
+        items, page, page_size, has_more, next_cursor, prev_cursor = await run_blocking(
+            query_telemetria,
+            page=page,
+            page_size=page_size,
+            oid=oid,
+            date_start=d_start,
+            date_end=d_end,
+            cursor=cursor,
+            bbox=area_bbox,
+            near=area_near,
+            fields=projection,
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    if return_json:
-        return JSONResponse(
+    # Decide format: data (JSON or MessagePack) if asked in format or Accept, else HTML
+    if representation != "html":
+        return api_response(
             {
                 "page": page,
                 "page_size": page_size,
                 "count": len(items),
                 "items": items,
-            }
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
+            },
+            accept,
+            format,
+            headers=headers,
         )
     
     # Format dates for HTML template
@@ -98,22 +222,19 @@ async def list_telemetria(
         else:
             item["date_str"] = ""
 
-    # Return HTML
-    next_page = page + 1 if has_more else None
-    prev_page = page - 1 if page > 1 else None
-
+    # Return HTML (links carry the cursor; `page` is only used for display)
     next_page_url = (
         build_telemetria_url(
-            next_page, page_size, oid, date_start, date_end
+            page + 1, page_size, oid, date_start, date_end, next_cursor, bbox, near, radius
         )
-        if next_page
+        if next_cursor
         else None
     )
     prev_page_url = (
         build_telemetria_url(
-            prev_page, page_size, oid, date_start, date_end
+            max(page - 1, 1), page_size, oid, date_start, date_end, prev_cursor, bbox, near, radius
         )
-        if prev_page
+        if prev_cursor
         else None
     )
 
@@ -130,4 +251,165 @@ async def list_telemetria(
             "date_start": date_start,
             "date_end": date_end,
         },
+        headers=headers,
+    )
+
+
+@router.get("/telemetria/export")
+async def export_telemetria_endpoint(
+    format: str = "ndjson",
+    oid: Optional[str] = None,
+    date_start: Optional[str] = None,
+    date_end: Optional[str] = None,
+):
+    """
+    Streams every telemetry record matching the filters, ordered by date, as
+    NDJSON (default), CSV (`format=csv`) or Arrow IPC (`format=arrow`).
+    Documents are read and sent in chunks, so memory does not grow with the
+    size of the export.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format, use one of: {', '.join(EXPORT_FORMATS)}")
+    if format == "arrow" and not arrow_available():
+        raise HTTPException(status_code=501, detail="Arrow export requires pyarrow (requirements-optional.txt)")
+
+    if oid is not None and not oid.strip():
+        oid = None
+
+    body = export_telemetria(
+        format,
+        oid=oid,
+        date_start=_parse_date_param(date_start),
+        date_end=_parse_date_param(date_end, is_end=True),
+    )
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="telemetria.{EXPORT_EXTENSIONS[format]}"'},
+    )
+
+
+def _parse_oids(oids: str) -> List[str]:
+    parsed = list(dict.fromkeys(oid.strip() for oid in oids.split(",") if oid.strip()))
+    if not parsed:
+        raise HTTPException(status_code=400, detail="oids is required")
+    if len(parsed) > MAX_POSITION_OIDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_POSITION_OIDS} oids per request")
+    return parsed
+
+
+@router.get("/telemetria/positions")
+async def telemetria_positions(t: float, oids: str, accept: Optional[str] = Header(None)):
+    """
+    Returns the position of each animal (comma-separated `oids`) at time `t`
+    (epoch seconds), linearly interpolated between its two closest fixes.
+
+    lat/lon are null outside the period covered by the animal's telemetry;
+    `gap` is the time between the fixes used.
+    """
+    positions = await run_blocking(positions_at, _parse_oids(oids), t)
+    return api_response({"t": t, "positions": positions}, accept)
+
+
+@router.get("/telemetria/positions/range")
+async def telemetria_positions_range(
+    oids: str, start: float, end: float, step: float = 60, accept: Optional[str] = Header(None)
+):
+    """
+    Returns the positions of each animal every `step` seconds from `start`
+    to `end` (epoch seconds), for playback.
+    """
+    try:
+        result = await run_blocking(positions_between, _parse_oids(oids), start, end, step)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return api_response({"start": start, "end": end, "step": step, **result}, accept)
+
+
+@router.get("/telemetria/heatmap")
+async def telemetria_heatmap(
+    oid: Optional[str] = None,
+    date_start: Optional[str] = None,
+    date_end: Optional[str] = None,
+    weight: str = WEIGHT_COUNT,
+    zoom: Optional[int] = Query(None, ge=0, le=MAX_ZOOM),
+    cell: Optional[float] = Query(None, gt=0),
+    geohash: Optional[int] = Query(None, ge=1, le=MAX_PRECISION),
+    bbox: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+):
+    """
+    Returns telemetry density binned into cells, as the number of fixes
+    (`weight=count`) or seconds spent (`weight=dwell`) per cell.
+
+    - oid: one or more comma-separated animals (default: all)
+    - zoom: web map zoom level (grid of 16 cells per tile, default 12),
+      or cell: grid cell size in degrees, or geohash: geohash precision
+    - bbox: min_lon,min_lat,max_lon,max_lat of the cells returned
+    """
+    if weight not in WEIGHTS:
+        raise HTTPException(status_code=400, detail=f"Invalid weight, use one of: {', '.join(WEIGHTS)}")
+    if sum(param is not None for param in (zoom, cell, geohash)) > 1:
+        raise HTTPException(status_code=400, detail="Use only one of zoom, cell or geohash")
+    if cell is None and geohash is None:
+        cell = zoom_cell_size(12 if zoom is None else zoom)
+
+    result = await run_blocking(
+        heatmap,
+        oids=_parse_oids(oid) if oid and oid.strip() else None,
+        date_start=_parse_date_param(date_start),
+        date_end=_parse_date_param(date_end, is_end=True),
+        weight=weight,
+        cell=cell,
+        geohash_precision=geohash,
+        bbox=_parse_bbox(bbox),
     )
+    return api_response(result, accept)
+
+
+@router.get("/telemetria/{oid}/track")
+async def telemetria_track(
+    oid: str,
+    method: str = DOUGLAS_PEUCKER,
+    tolerance: Optional[float] = Query(None, ge=0),
+    max_points: Optional[int] = Query(None, ge=2),
+    accept: Optional[str] = Header(None),
+):
+    """
+    Returns the track of `oid` as a GeoJSON LineString Feature (a Point for
+    a single position), with the position times in `properties.times`.
+
+    - method: douglas-peucker (default) or visvalingam
+    - tolerance: simplification tolerance in meters
+    - max_points: maximum number of points of the line
+    """
+    if method not in SIMPLIFY_METHODS:
+        raise HTTPException(status_code=400, detail=f"Invalid method, use one of: {', '.join(SIMPLIFY_METHODS)}")
+
+    track = await run_blocking(get_track, oid, method, tolerance, max_points)
+    if track is None:
+        raise HTTPException(status_code=404, detail="No telemetry for this oid")
+    return api_response(track, accept, media_type="application/geo+json")
+
+
+@router.get("/telemetria/stats")
+async def telemetria_stats_all(accept: Optional[str] = Header(None)):
+    """
+    Returns the movement statistics of every tagged animal
+    (see /telemetria/{oid}/stats).
+    """
+    items = await run_blocking(all_movement_stats)
+    return api_response({"count": len(items), "items": items}, accept)
+
+
+@router.get("/telemetria/{oid}/stats")
+async def telemetria_stats(oid: str, accept: Optional[str] = Header(None)):
+    """
+    Returns movement statistics of one animal: number of fixes, total
+    distance (m), mean and max speed (m/s), and seconds spent inside each
+    place of places.json (`residency`) or outside all of them (`outside`).
+    """
+    stats = await run_blocking(movement_stats, oid)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="No telemetry for this oid")
+    return api_response(stats, accept)
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, HTTPException, Path
+from fastapi.responses import Response
+
+from config import TILE_MAX_ZOOM
+from services.executor import run_blocking
+from services.tiles import LAYERS, get_tile
+
+router = APIRouter()
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+
+@router.get("/tiles/{layer}/{z}/{x}/{y}.mvt")
+async def vector_tile(
+    layer: str,
+    z: int = Path(..., ge=0, le=TILE_MAX_ZOOM),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+):
+    """
+    Mapbox vector tile z/x/y (web mercator, XYZ scheme) of a layer:
+    - telemetria: telemetry fixes, clustered per tile
+    - places: places.json polygons
+    - avistamentos: number of sightings per place, clustered per tile
+
+    Tiles are rendered on demand and kept in a bounded on-disk cache
+    (see scripts/seed_tiles.py to render them in advance).
+    """
+    if layer not in LAYERS:
+        raise HTTPException(status_code=404, detail=f"Unknown layer, use one of: {', '.join(LAYERS)}")
+    if x >= 1 << z or y >= 1 << z:
+        raise HTTPException(status_code=400, detail=f"x and y must be below {1 << z} at zoom {z}")
+
+    try:
+        tile = await run_blocking(get_tile, layer, z, x, y)
+    except (OSError, ValueError) as e:
+        print(f"Error rendering tile {layer}/{z}/{x}/{y}: {e}")
+        raise HTTPException(status_code=503, detail="Tile is not available")
+    return Response(content=tile, media_type=MVT_MEDIA_TYPE, headers={"Cache-Control": "public, max-age=60"})
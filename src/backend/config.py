@@ -1,7 +1,111 @@
+import os
+
 from fastapi.templating import Jinja2Templates
 
 # Initialize templates
 # Assuming templates directory is in the root of the backend folder
 templates = Jinja2Templates(directory="templates")
 
+# Static files (services/static_assets.py): URLs built by static_url() carry a
+# hash of the file contents, and responses to them are immutable for STATIC_MAX_AGE seconds
+STATIC_DIR = "static"
+STATIC_MAX_AGE = 31536000
+
 GCP_BUCKET_NAME = "avistamentos"
+
+# Google Cloud credentials (the Firestore emulator ignores them)
+SERVICE_ACCOUNT_PATH = os.environ.get("SERVICE_ACCOUNT_PATH", "./serviceAccountKey.json")
+GCP_PROJECT = os.environ.get("GCP_PROJECT", "mergulho-virtual")
+
+# Signed URL cache: URLs expire on SIGNED_URL_EXPIRY_BUCKET boundaries and are
+# re-signed once less than SIGNED_URL_MIN_REMAINING seconds of validity are left
+SIGNED_URL_CACHE_SIZE = 4096
+SIGNED_URL_EXPIRY_BUCKET = 900
+SIGNED_URL_MIN_REMAINING = 600
+
+# Maximum number of blocking Firestore/Storage calls running at the same time
+# per worker (see services/executor.py)
+FIRESTORE_MAX_WORKERS = int(os.environ.get("FIRESTORE_MAX_WORKERS", "32"))
+
+# Places polygons generated by scripts/kml_to_json.py (shared with the Unity client)
+PLACES_JSON_PATH = os.environ.get(
+    "PLACES_JSON_PATH",
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..", "app", "MergulhoVirtual", "Assets", "Resources", "places.json",
+    ),
+)
+# Size (degrees) of the grid cells of the places index, and maximum number of
+# cells a polygon is registered in (larger polygons are checked on every lookup)
+PLACES_GRID_CELL = 0.01
+PLACES_GRID_MAX_CELLS = 10000
+
+# Seconds between background rebuilds of the count rollups (services/counters.py);
+# 0 disables them (run scripts/reconcile_counts.py instead). Workers share a
+# lease, so one rebuild runs per interval however many workers there are
+COUNTS_RECONCILE_INTERVAL = int(os.environ.get("COUNTS_RECONCILE_INTERVAL", "21600"))
+# Seconds a "rollups not built yet" answer is kept before contagens_meta is read again
+ROLLUPS_CHECK_INTERVAL = float(os.environ.get("ROLLUPS_CHECK_INTERVAL", "60"))
+
+# Read-through cache of list query results (services/query_cache.py): entries
+# per collection and seconds an entry is served. Writes made by this process
+# invalidate it at once; writes from other workers or scripts show up after the TTL
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.environ.get("QUERY_CACHE_TTL", "30"))
+
+# Documents read from Firestore per query by the export endpoints
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "1000"))
+
+# Simplified telemetry tracks (services/tracks.py): cached entries and seconds
+# each is kept; imports bump versoes/telemetria_{oid}, which invalidates them sooner
+TRACK_CACHE_SIZE = int(os.environ.get("TRACK_CACHE_SIZE", "256"))
+TRACK_CACHE_TTL = float(os.environ.get("TRACK_CACHE_TTL", "3600"))
+
+# Position playback index (services/positions.py): animals kept in memory,
+# seconds between version checks of an animal, and seconds after which its
+# positions are reloaded from scratch (to pick up out-of-order imports)
+POSITIONS_MAX_OIDS = int(os.environ.get("POSITIONS_MAX_OIDS", "512"))
+POSITIONS_REFRESH_INTERVAL = float(os.environ.get("POSITIONS_REFRESH_INTERVAL", "60"))
+POSITIONS_FULL_RELOAD = float(os.environ.get("POSITIONS_FULL_RELOAD", "3600"))
+
+# Telemetry analytics (services/telemetria_analytics.py): seconds the list of
+# animals and the stats of every animal are kept; imports bump
+# versoes/telemetria, which invalidates them sooner
+TELEMETRIA_STATS_CACHE_TTL = float(os.environ.get("TELEMETRIA_STATS_CACHE_TTL", "3600"))
+
+# Telemetry heatmap (services/heatmap.py): a fix's dwell time never counts a
+# gap between fixes longer than HEATMAP_MAX_DWELL_GAP seconds; aggregated grids
+# are kept HEATMAP_CACHE_TTL seconds (HEATMAP_CACHE_SIZE entries)
+HEATMAP_MAX_DWELL_GAP = int(os.environ.get("HEATMAP_MAX_DWELL_GAP", "21600"))
+HEATMAP_CACHE_SIZE = int(os.environ.get("HEATMAP_CACHE_SIZE", "256"))
+HEATMAP_CACHE_TTL = float(os.environ.get("HEATMAP_CACHE_TTL", "3600"))
+
+# Vector tiles (services/tiles.py): on-disk cache location and size bound,
+# tile extent and buffer (tile units), size of the point clustering cells
+# (tile units), seconds between checks of the data versions and seconds a
+# layer's data stays in memory before it is reloaded
+TILE_CACHE_DIR = os.environ.get(
+    "TILE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tile_cache")
+)
+TILE_CACHE_MAX_BYTES = int(os.environ.get("TILE_CACHE_MAX_BYTES", str(512 * 2**20)))
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+TILE_CLUSTER_CELL = 64
+TILE_MAX_ZOOM = 20
+VERSION_CHECK_INTERVAL = float(os.environ.get("VERSION_CHECK_INTERVAL", "30"))
+TILE_DATA_TTL = float(os.environ.get("TILE_DATA_TTL", "3600"))
+
+# Telemetry spatial queries (services/telemetria.py): characters of the
+# geohash stored on each telemetry document, and maximum number of geohash
+# range queries a bbox/near filter is split into
+TELEMETRIA_GEOHASH_PRECISION = 9
+TELEMETRIA_MAX_GEOHASH_RANGES = int(os.environ.get("TELEMETRIA_MAX_GEOHASH_RANGES", "8"))
+
+# Delta sync of the Unity client (services/sync.py): documents per collection
+# in a /sync response, days of telemetry sent (0: all of it) and location of
+# the snapshot bundle built by scripts/build_sync_bundle.py
+SYNC_PAGE_SIZE = int(os.environ.get("SYNC_PAGE_SIZE", "1000"))
+SYNC_TELEMETRY_DAYS = int(os.environ.get("SYNC_TELEMETRY_DAYS", "90"))
+SYNC_BUNDLE_PATH = os.environ.get(
+    "SYNC_BUNDLE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sync_bundle.msgpack.gz")
+)
@@ -1,4 +1,120 @@
-from google.cloud import firestore
+import os
+import threading
+from typing import Any, Callable, Optional
 
-# Initialize Firestore client
-db = firestore.Client.from_service_account_json('./serviceAccountKey.json')
+from google.cloud import firestore, storage
+
+from config import SERVICE_ACCOUNT_PATH, GCP_PROJECT
+
+
+def _default_firestore_factory() -> firestore.Client:
+    # Local emulator: the client picks FIRESTORE_EMULATOR_HOST up by itself
+    if os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        from google.auth.credentials import AnonymousCredentials
+
+        return firestore.Client(project=GCP_PROJECT, credentials=AnonymousCredentials())
+    return firestore.Client.from_service_account_json(SERVICE_ACCOUNT_PATH)
+
+
+def _default_storage_factory() -> storage.Client:
+    return storage.Client.from_service_account_json(SERVICE_ACCOUNT_PATH)
+
+
+class ClientRegistry:
+    """
+    Process-wide registry of the Google Cloud clients.
+
+    Clients are created lazily on first use and shared by every request of the
+    worker. Factories can be swapped (tests, local emulator) with `override`.
+    """
+
+    def __init__(
+        self,
+        firestore_factory: Callable[[], Any] = _default_firestore_factory,
+        storage_factory: Callable[[], Any] = _default_storage_factory,
+    ):
+        self._factories = {"firestore": firestore_factory, "storage": storage_factory}
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str):
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = self._factories[name]()
+                    self._clients[name] = client
+        return client
+
+    @property
+    def firestore(self) -> firestore.Client:
+        return self._get("firestore")
+
+    @property
+    def storage(self) -> storage.Client:
+        return self._get("storage")
+
+    def override(self, firestore: Optional[Any] = None, storage: Optional[Any] = None):
+        """
+        Replaces the clients used by the registry with the given instances
+        (e.g. mocks in tests). The previous clients are closed.
+        """
+        replacements = {"firestore": firestore, "storage": storage}
+        with self._lock:
+            for name, client in replacements.items():
+                if client is None:
+                    continue
+                self._close_one(name)
+                self._clients[name] = client
+
+    def set_factory(self, name: str, factory: Callable[[], Any]):
+        """
+        Changes how a client is built the next time it is needed.
+        """
+        with self._lock:
+            self._close_one(name)
+            self._factories[name] = factory
+
+    def warm(self):
+        """
+        Creates all clients ahead of the first request.
+        """
+        self._get("firestore")
+        self._get("storage")
+
+    def close(self):
+        """
+        Closes and forgets all clients. They are recreated on next use.
+        """
+        with self._lock:
+            for name in list(self._clients):
+                self._close_one(name)
+
+    def _close_one(self, name: str):
+        client = self._clients.pop(name, None)
+        if client is not None and hasattr(client, "close"):
+            try:
+                client.close()
+            except Exception as e:
+                print(f"Erro ao fechar cliente {name}: {e}")
+
+
+registry = ClientRegistry()
+
+
+class _LazyFirestoreClient:
+    """
+    Stand-in for the Firestore client that resolves it from the registry on
+    each attribute access, so importing modules does not load credentials.
+    """
+
+    def __getattr__(self, name):
+        return getattr(registry.firestore, name)
+
+    def __repr__(self):
+        return "<lazy firestore client>"
+
+
+# Firestore client (created on first use)
+db = _LazyFirestoreClient()
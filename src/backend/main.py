@@ -1,11 +1,70 @@
+import asyncio
+import os
+import socket
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 
 from api.api import api_router
+from config import COUNTS_RECONCILE_INTERVAL, STATIC_DIR, templates
+from database import registry
+from services import executor
+from services.counters import acquire_reconcile_lease, reconcile_counts, rollups_ready
+from services.places import get_place_index
+from services.serialization import APIResponse
+from services.static_assets import FingerprintedStaticFiles, static_url
+
+
+async def reconcile_counts_periodically(interval: int):
+    # Rebuilds the count rollups every `interval` seconds, correcting any drift
+    # of the incremental updates; right away if they were never built. Each
+    # round only runs in the worker holding the reconcile lease.
+    holder = f"{socket.gethostname()}:{os.getpid()}"
+    try:
+        built = await executor.run_blocking(
+            lambda: rollups_ready("avistamentos") and rollups_ready("telemetria")
+        )
+    except Exception as e:
+        print(f"Could not check the count rollups: {e}")
+        built = True
+    if built:
+        await asyncio.sleep(interval)
+    while True:
+        try:
+            if await executor.run_blocking(acquire_reconcile_lease, holder, interval):
+                await executor.run_blocking(reconcile_counts)
+        except Exception as e:
+            print(f"Could not reconcile counts: {e}")
+        await asyncio.sleep(interval)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Creates the shared clients before the first request; if credentials are
+    # not available they are created lazily (and fail) on first use instead.
+    try:
+        registry.warm()
+    except Exception as e:
+        print(f"Could not initialize Google Cloud clients: {e}")
+    try:
+        get_place_index()
+    except (OSError, ValueError) as e:
+        print(f"Could not load places: {e}")
+
+    reconcile_task = None
+    if COUNTS_RECONCILE_INTERVAL > 0:
+        reconcile_task = asyncio.create_task(reconcile_counts_periodically(COUNTS_RECONCILE_INTERVAL))
+    yield
+    if reconcile_task is not None:
+        reconcile_task.cancel()
+    executor.shutdown()
+    registry.close()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=APIResponse)
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", FingerprintedStaticFiles(directory=STATIC_DIR), name="static")
+templates.env.globals["static_url"] = static_url
 
 app.include_router(api_router)
 
@@ -0,0 +1,83 @@
+import argparse
+import sys
+from pathlib import Path
+
+from tqdm import tqdm
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+from bulk_writer import MAX_BATCH_SIZE
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # points to `backend/`
+SERVICE_ACCOUNT_PATH = BASE_DIR / "serviceAccountKey.json"
+
+
+# Initialize Firebase app only once
+if not firebase_admin._apps:
+    cred = credentials.Certificate(str(SERVICE_ACCOUNT_PATH))
+    firebase_admin.initialize_app(cred)
+
+db = firestore.client()
+
+
+def backfill_data_registro(batch_size: int = MAX_BATCH_SIZE, dry_run: bool = False):
+    """
+    Write the `data_registro` timestamp used by the date range filters on the
+    sightings whose value is missing or stale, computed from dia/mes/ano_registro
+    with the backend's services/counters.py. Sightings with an invalid date
+    lose the field.
+    """
+    sys.path.insert(0, str(BASE_DIR))
+    from database import registry
+    from services.counters import avistamento_date
+    from services import versions
+
+    registry.override(firestore=db)
+
+    fields = ["dia_registro", "mes_registro", "ano_registro", "data_registro"]
+    batch, pending, updated, invalid, scanned = db.batch(), 0, 0, 0, 0
+    with tqdm(desc="Lendo avistamentos", unit=" docs") as progress:
+        for snapshot in db.collection("avistamentos").select(fields).stream():
+            scanned += 1
+            progress.update()
+            data = snapshot.to_dict() or {}
+            date = avistamento_date(data)
+            if date is None:
+                invalid += 1
+            if data.get("data_registro") == date:
+                continue
+            updated += 1
+            if dry_run:
+                continue
+            value = firestore.DELETE_FIELD if date is None else date
+            batch.update(snapshot.reference, {"data_registro": value})
+            pending += 1
+            if pending >= batch_size:
+                batch.commit()
+                batch, pending = db.batch(), 0
+        if updated and not dry_run:
+            # Cached pages, counts and ETags of the date queries are stale now
+            versions.bump_version(batch, versions.AVISTAMENTOS_VERSION)
+            pending += 1
+        if pending:
+            batch.commit()
+
+    action = "a atualizar" if dry_run else "atualizados"
+    print(f"\n{updated} de {scanned} avistamentos {action} ({invalid} com data inválida)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Grava o campo data_registro (filtros por intervalo de datas) nos avistamentos existentes."
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=MAX_BATCH_SIZE,
+        help=f"Escritas por commit (padrão/máximo: {MAX_BATCH_SIZE}).",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Apenas conta os documentos a atualizar.")
+    args = parser.parse_args()
+    backfill_data_registro(min(args.batch_size, MAX_BATCH_SIZE), args.dry_run)
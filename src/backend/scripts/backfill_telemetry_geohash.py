@@ -0,0 +1,81 @@
+import argparse
+import sys
+from pathlib import Path
+
+from tqdm import tqdm
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+from bulk_writer import MAX_BATCH_SIZE
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # points to `backend/`
+SERVICE_ACCOUNT_PATH = BASE_DIR / "serviceAccountKey.json"
+
+
+# Initialize Firebase app only once
+if not firebase_admin._apps:
+    cred = credentials.Certificate(str(SERVICE_ACCOUNT_PATH))
+    firebase_admin.initialize_app(cred)
+
+db = firestore.client()
+
+
+def backfill_geohash(batch_size: int = MAX_BATCH_SIZE, dry_run: bool = False):
+    """
+    Add the `geohash` field used by the bbox/near queries to the telemetry
+    documents that miss it (or store one of another precision), computed
+    with the backend's services/telemetria.py.
+    """
+    sys.path.insert(0, str(BASE_DIR))
+    from database import registry
+    from services.telemetria import telemetria_geohash
+    from services import versions
+
+    registry.override(firestore=db)
+
+    fields = ["latitude", "longitude", "geohash"]
+    batch, pending, updated, scanned = db.batch(), 0, 0, 0
+    with tqdm(desc="Scanning telemetry", unit=" docs") as progress:
+        for snapshot in db.collection("telemetria").select(fields).stream():
+            scanned += 1
+            progress.update()
+            data = snapshot.to_dict() or {}
+            if data.get("latitude") is None or data.get("longitude") is None:
+                continue
+            value = telemetria_geohash(float(data["latitude"]), float(data["longitude"]))
+            if data.get("geohash") == value:
+                continue
+            updated += 1
+            if dry_run:
+                continue
+            batch.update(snapshot.reference, {"geohash": value})
+            pending += 1
+            if pending >= batch_size:
+                batch.commit()
+                batch, pending = db.batch(), 0
+        if updated and not dry_run:
+            # Cached pages, counts and ETags of the bbox/near queries are stale now
+            versions.bump_version(batch, versions.TELEMETRIA_VERSION)
+            pending += 1
+        if pending:
+            batch.commit()
+
+    action = "would be updated" if dry_run else "updated"
+    print(f"\n{updated} of {scanned} telemetry documents {action}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Adds the geohash field used by spatial queries to existing telemetry documents."
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=MAX_BATCH_SIZE,
+        help=f"Updates per batch commit (default/maximum: {MAX_BATCH_SIZE}).",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Only count the documents to update.")
+    args = parser.parse_args()
+    backfill_geohash(min(args.batch_size, MAX_BATCH_SIZE), args.dry_run)
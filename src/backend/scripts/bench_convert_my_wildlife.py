@@ -0,0 +1,99 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs one conversion in a fresh process so peak RSS is measured in isolation
+CHILD = r"""
+import json, resource, sys, time
+sys.path.insert(0, {scripts_dir!r})
+import convert_my_wildlife_to_csv as conv
+
+mode, input_path, output_path, output_format = sys.argv[1:5]
+start = time.perf_counter()
+if mode == "json.load":
+    # Previous implementation: whole document and row list in memory
+    with open(input_path) as f:
+        data = json.load(f)
+    rows = [
+        {{"oid": d.get("_id", {{}}).get("$oid"), "title": d.get("title"), "date": loc.get("date"),
+          "latitude": loc.get("latitude"), "longitude": loc.get("longitude"), "notes": loc.get("notes")}}
+        for d in data.get("deployments", []) for loc in d.get("locations", [])
+    ]
+    count = conv.write_csv(iter(rows), output_path)
+else:
+    count = conv.convert(input_path, output_path, output_format)
+elapsed = time.perf_counter() - start
+peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"rows": count, "seconds": elapsed, "peak_rss_mb": peak_kb / 1024}}))
+"""
+
+
+def write_synthetic_export(path, deployments, locations):
+    random.seed(42)
+    with open(path, "w") as f:
+        f.write('{"deployments": [')
+        for d in range(deployments):
+            if d:
+                f.write(",")
+            f.write(json.dumps({"_id": {"$oid": f"{d:024x}"}, "title": f"Shark {d}"})[:-1])
+            f.write(', "locations": [')
+            for i in range(locations):
+                if i:
+                    f.write(",")
+                f.write(json.dumps({
+                    "date": 1600000000 + i * 3600,
+                    "latitude": -3.85 + random.uniform(-0.5, 0.5),
+                    "longitude": -32.42 + random.uniform(-0.5, 0.5),
+                    "notes": "",
+                }))
+            f.write("]}")
+        f.write("]}")
+
+
+def run(mode, input_path, output_path, output_format="csv"):
+    code = CHILD.format(scripts_dir=SCRIPTS_DIR)
+    out = subprocess.run(
+        [sys.executable, "-c", code, mode, input_path, output_path, output_format],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark convert_my_wildlife_to_csv (rows/s and peak RSS).")
+    parser.add_argument("-d", "--deployments", type=int, default=20)
+    parser.add_argument("-l", "--locations", type=int, default=50000, help="Locations per deployment.")
+    parser.add_argument("--formats", nargs="+", default=["csv", "csv.gz", "parquet"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "export.json")
+        write_synthetic_export(input_path, args.deployments, args.locations)
+        size_mb = os.path.getsize(input_path) / 2**20
+        print(f"Input: {args.deployments * args.locations} locations, {size_mb:.1f} MB")
+
+        cases = [("json.load", "csv")] + [("stream", fmt) for fmt in args.formats]
+        for mode, fmt in cases:
+            output_path = os.path.join(tmp, f"out.{fmt}")
+            try:
+                result = run(mode, input_path, output_path, fmt)
+            except subprocess.CalledProcessError as e:
+                print(f"{mode:>10} {fmt:>8}: failed ({e.stderr.strip().splitlines()[-1]})")
+                continue
+            rate = result["rows"] / result["seconds"]
+            print(
+                f"{mode:>10} {fmt:>8}: {rate:12,.0f} rows/s  "
+                f"peak RSS {result['peak_rss_mb']:7.1f} MB  "
+                f"output {os.path.getsize(output_path) / 2**20:6.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
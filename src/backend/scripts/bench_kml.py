@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Each run happens in a fresh process so peak RSS is measured in isolation
+CHILD = r"""
+import json, resource, sys, time
+import xml.etree.ElementTree as ET
+sys.path.insert(0, {scripts_dir!r})
+from kml_parser import iter_placemarks
+
+def legacy(kml_path):
+    # Previous implementation: whole tree in memory, per-vertex split(',')
+    root = ET.parse(kml_path).getroot()
+    ns = {{'kml': 'http://www.opengis.net/kml/2.2'}}
+    vertices = 0
+    for folder in root.findall('.//kml:Folder', ns):
+        if folder.get('id') != 'results':
+            continue
+        for pm in folder.findall('.//kml:Placemark', ns):
+            ring = pm.find('kml:MultiGeometry', ns).find('kml:LinearRing', ns)
+            for vertex in ring.find('kml:coordinates', ns).text.strip().split():
+                parts = vertex.split(',')
+                if len(parts) >= 2:
+                    lon, lat = float(parts[0]), float(parts[1])
+                    vertices += 1
+    return vertices
+
+def streaming(kml_path):
+    return sum(len(coords) for _, coords in iter_placemarks(kml_path))
+
+mode, kml_path = sys.argv[1:3]
+start = time.perf_counter()
+vertices = legacy(kml_path) if mode == "legacy" else streaming(kml_path)
+elapsed = time.perf_counter() - start
+peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"vertices": vertices, "seconds": elapsed, "peak_rss_mb": peak_kb / 1024}}))
+"""
+
+
+def write_synthetic_kml(path, placemarks, vertices_per_placemark):
+    random.seed(42)
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<kml xmlns="http://www.opengis.net/kml/2.2"><Document><Folder id="results">\n')
+        for p in range(placemarks):
+            lon0, lat0 = -32.4 + random.uniform(-1, 1), -3.85 + random.uniform(-1, 1)
+            coords = " ".join(
+                f"{lon0 + random.uniform(-0.01, 0.01):.12f},{lat0 + random.uniform(-0.01, 0.01):.12f},0"
+                for _ in range(vertices_per_placemark)
+            )
+            f.write(
+                f"<Placemark><name>Zone {p}</name><MultiGeometry><LinearRing>"
+                f"<coordinates>{coords}</coordinates></LinearRing></MultiGeometry></Placemark>\n"
+            )
+        f.write("</Folder></Document></kml>\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark KML parsing (legacy ET.parse vs streaming iterparse).")
+    parser.add_argument("-p", "--placemarks", type=int, default=10000)
+    parser.add_argument("-v", "--vertices", type=int, default=100, help="Vertices per placemark.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        kml_path = os.path.join(tmp, "synthetic.kml")
+        write_synthetic_kml(kml_path, args.placemarks, args.vertices)
+        size_mb = os.path.getsize(kml_path) / 2**20
+        print(f"Input: {args.placemarks * args.vertices:,} vertices, {size_mb:.1f} MB")
+
+        code = CHILD.format(scripts_dir=SCRIPTS_DIR)
+        for mode in ("legacy", "streaming"):
+            out = subprocess.run(
+                [sys.executable, "-c", code, mode, kml_path], check=True, capture_output=True, text=True
+            )
+            result = json.loads(out.stdout)
+            print(
+                f"{mode:>10}: {result['seconds']:6.2f} s  "
+                f"{result['vertices'] / result['seconds']:12,.0f} vertices/s  "
+                f"peak RSS {result['peak_rss_mb']:7.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # points to `backend/`
+sys.path.insert(0, str(BASE_DIR))
+
+from services.serialization import default, dumps_json, dumps_msgpack  # noqa: E402
+
+
+def telemetry_page(rows):
+    # Shape of a /telemetria JSON page (floats dominate)
+    random.seed(42)
+    return {
+        "page": 1,
+        "page_size": rows,
+        "count": rows,
+        "items": [
+            {
+                "oid": "5f1e0c2a9d3e4b0017a1b2c3",
+                "title": "Tubarão-tigre 12",
+                "date": 1700000000 + 600 * i,
+                "latitude": -3.85 + random.uniform(-0.1, 0.1),
+                "longitude": -32.42 + random.uniform(-0.1, 0.1),
+                "notes": None,
+                "place": "Baía do Sancho",
+                "geohash": "7r2fn4k8q",
+            }
+            for i in range(rows)
+        ],
+        "next_cursor": "eyJ2IjpbMTcwMDAwMDAwMCwiYSJdLCJkIjoibmV4dCJ9",
+        "prev_cursor": None,
+    }
+
+
+def stdlib_json(content):
+    # Previous implementation (starlette JSONResponse.render)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+                      default=default).encode("utf-8")
+
+
+def measure(encode, content, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = encode(content)
+        best = min(best, time.perf_counter() - start)
+    return best, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response encoders (stdlib json, orjson, MessagePack).")
+    parser.add_argument("-r", "--rows", type=int, nargs="+", default=[100, 10000, 100000], help="Items per response.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per encoder (best time is reported).")
+    args = parser.parse_args()
+
+    encoders = (("json", stdlib_json), ("orjson", dumps_json), ("msgpack", dumps_msgpack))
+    for rows in args.rows:
+        content = telemetry_page(rows)
+        print(f"{rows:,} items")
+        baseline = None
+        for name, encode in encoders:
+            seconds, size = measure(encode, content, args.repeat)
+            baseline = baseline or seconds
+            print(
+                f"  {name:>8}: {seconds * 1000:9.2f} ms  {baseline / seconds:5.1f}x  "
+                f"{size / 1024:10.1f} KiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # points to `backend/`
+sys.path.insert(0, str(BASE_DIR))
+
+from main import app  # noqa: E402
+from database import registry  # noqa: E402
+from services.counters import MAX_BATCH_SIZE  # noqa: E402
+
+# GAPIC methods that are one round trip each
+RPC_METHODS = ("batch_get_documents", "commit", "begin_transaction", "rollback", "run_query", "batch_write")
+
+
+class RpcCounter:
+    """
+    Counts the Firestore RPCs made through `client` by wrapping its GAPIC methods.
+    """
+
+    def __init__(self, client):
+        self.counts = Counter()
+        api = client._firestore_api
+        for name in RPC_METHODS:
+            setattr(api, name, self._wrap(name, getattr(api, name)))
+
+    def _wrap(self, name, method):
+        def counted(*args, **kwargs):
+            self.counts[name] += 1
+            return method(*args, **kwargs)
+        return counted
+
+    def take(self) -> Counter:
+        counts, self.counts = self.counts, Counter()
+        return counts
+
+
+# Previous handlers: existence check, write, and (PUT) a read of the result
+def legacy_put(db, registro, data):
+    doc_ref = db.collection("avistamentos").document(registro)
+    if not doc_ref.get().exists:
+        return None
+    doc_ref.update(data)
+    return doc_ref.get().to_dict()
+
+
+def legacy_form(db, registro, data):
+    doc_ref = db.collection("avistamentos").document(registro)
+    if not doc_ref.get().exists:
+        return False
+    doc_ref.update(data)
+    return True
+
+
+def legacy_delete(db, registro):
+    doc_ref = db.collection("avistamentos").document(registro)
+    if not doc_ref.get().exists:
+        return False
+    doc_ref.delete()
+    return True
+
+
+# Fields posted by templates/avistamentos/edit.html for a seeded sighting,
+# with only `local` changed (the date is resent unchanged, as in the browser)
+EDIT_FORM = {
+    "nome_popular": "Tubarão-limão", "nome_cientifico": "", "observador": "", "classificacao_observador": "",
+    "dia_registro": "1", "mes_registro": "9", "ano_registro": "2024",
+    "dia_registro_original": "1", "mes_registro_original": "9", "ano_registro_original": "2024",
+    "local": "Baía", "quantidade": "", "comportamento": "", "tamanho_estimado": "", "sexo": "",
+    "interacao": "", "modo_registro": "", "link_instagram": "", "dia_anotacao": "", "mes_anotacao": "",
+    "ano_anotacao": "", "responsavel_anotacao": "", "operadora_empresa_foto": "", "recebido_por": "",
+    "observacao": "", "outra_ID": "", "concatenado": "",
+}
+
+
+def edit_form_fields(form):
+    """
+    Fields the previous form handler wrote: every non-empty field except
+    `registro` (the hidden *_original fields did not exist then).
+    """
+    return {key: value for key, value in form.items() if value and not key.endswith("_original")}
+
+
+def seed(db, prefix, count):
+    for start in range(0, count, MAX_BATCH_SIZE):
+        batch = db.batch()
+        for i in range(start, min(start + MAX_BATCH_SIZE, count)):
+            batch.set(
+                db.collection("avistamentos").document(f"{prefix}{i}"),
+                {"registro": f"{prefix}{i}", "ano_registro": "2024", "mes_registro": "9", "dia_registro": "1"},
+            )
+        batch.commit()
+
+
+def report(name, counter, timings):
+    total = sum(counter.values())
+    detail = ", ".join(f"{method}={n / len(timings):.1f}" for method, n in sorted(counter.items()))
+    print(
+        f"{name:>16}: {total / len(timings):4.1f} RPCs/request  "
+        f"{sum(timings) / len(timings) * 1000:7.2f} ms/request  ({detail})"
+    )
+
+
+async def run(requests: int):
+    db = registry.firestore
+    rpcs = RpcCounter(db)
+    seed(db, "bench-legacy-", requests)
+    seed(db, "bench-", requests)
+    rpcs.take()
+
+    legacy = {
+        "PUT (json)": lambda i: legacy_put(db, f"bench-legacy-{i}", {"local": "Sueste"}),
+        "POST form": lambda i: legacy_form(db, f"bench-legacy-{i}", edit_form_fields(EDIT_FORM)),
+        "DELETE": lambda i: legacy_delete(db, f"bench-legacy-{i}"),
+    }
+    print("Before (get + write [+ get]):")
+    for name, call in legacy.items():
+        timings = []
+        for i in range(requests):
+            start = time.perf_counter()
+            call(i)
+            timings.append(time.perf_counter() - start)
+        report(name, rpcs.take(), timings)
+
+    current = {
+        "PUT (json)": lambda client, i: client.put(
+            f"/avistamentos/bench-{i}?format=json", json={"local": "Sueste"}
+        ),
+        "PUT (redirect)": lambda client, i: client.put(f"/avistamentos/bench-{i}", json={"local": "Porto"}),
+        "POST form": lambda client, i: client.post(
+            f"/avistamentos/bench-{i}/edit", data={"registro": f"bench-{i}", **EDIT_FORM}
+        ),
+        "DELETE": lambda client, i: client.delete(f"/avistamentos/bench-{i}?format=json"),
+    }
+    # Only the form and the redirecting PUT are a single commit; the JSON PUT
+    # and DELETE still read the document first (counters need its old date)
+    print("After (form and redirecting PUT: commit; JSON PUT and DELETE: get + commit):")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, call in current.items():
+            timings = []
+            for i in range(requests):
+                start = time.perf_counter()
+                response = await call(client, i)
+                timings.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    raise SystemExit(f"{name} failed: {response.status_code} {response.text}")
+            report(name, rpcs.take(), timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Count the Firestore RPCs of the sighting write handlers (before/after) on the local emulator."
+    )
+    parser.add_argument("-n", "--requests", type=int, default=50, help="Requests per handler.")
+    args = parser.parse_args()
+
+    if not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        raise SystemExit("Set FIRESTORE_EMULATOR_HOST (e.g. localhost:8080) to run against the emulator")
+
+    asyncio.run(run(args.requests))
+    registry.close()
+
+
+if __name__ == "__main__":
+    main()
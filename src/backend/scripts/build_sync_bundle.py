@@ -0,0 +1,51 @@
+import argparse
+import sys
+from pathlib import Path
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # points to `backend/`
+SERVICE_ACCOUNT_PATH = BASE_DIR / "serviceAccountKey.json"
+
+
+# Initialize Firebase app only once
+if not firebase_admin._apps:
+    cred = credentials.Certificate(str(SERVICE_ACCOUNT_PATH))
+    firebase_admin.initialize_app(cred)
+
+db = firestore.client()
+
+
+def build(path=None):
+    """
+    Build the snapshot bundle served by /sync/bundle, using the backend's
+    services/sync.py through this script's Firestore client.
+    """
+    sys.path.insert(0, str(BASE_DIR))
+    from config import SYNC_BUNDLE_PATH
+    from database import registry
+    from services import sync
+
+    registry.override(firestore=db)
+    path = path or SYNC_BUNDLE_PATH
+    counts = sync.build_bundle(path)
+    print(
+        f"{path}: {counts['avistamentos']} sightings, {counts['telemetria']} telemetry fixes, "
+        f"{counts['bytes'] / 2**20:.1f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Builds the snapshot bundle the Unity client downloads before using /sync."
+    )
+    parser.add_argument(
+        "path",
+        nargs="?",
+        default=None,
+        help="Output file (default: config.SYNC_BUNDLE_PATH).",
+    )
+    args = parser.parse_args()
+    build(args.path)
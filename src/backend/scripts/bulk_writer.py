@@ -0,0 +1,198 @@
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from google.api_core import exceptions
+
+
+# Firestore limit of writes per commit
+MAX_BATCH_SIZE = 500
+
+# Errors worth retrying: contention and transient backend failures
+RETRYABLE_ERRORS = (
+    exceptions.Aborted,
+    exceptions.DeadlineExceeded,
+    exceptions.InternalServerError,
+    exceptions.ResourceExhausted,
+    exceptions.ServiceUnavailable,
+)
+
+
+def document_id(*parts) -> str:
+    """
+    Firestore document ID made of `parts` joined by "_". "/" would split the
+    path, so it is escaped as "%2F" (and "%" as "%25", to keep IDs distinct).
+    """
+    return "_".join(str(part).replace("%", "%25").replace("/", "%2F") for part in parts)
+
+
+class Checkpoint:
+    """
+    Number of source rows already committed, stored in a small JSON file so an
+    interrupted import can resume where it stopped.
+    """
+
+    def __init__(self, path: Optional[Path], source: str):
+        self.path = path
+        self.source = source
+
+    def load(self) -> int:
+        if self.path is None or not self.path.exists():
+            return 0
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return 0
+        if data.get("source") != self.source:
+            return 0
+        return int(data.get("rows_done", 0))
+
+    def save(self, rows_done: int):
+        if self.path is None:
+            return
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps({"source": self.source, "rows_done": rows_done}))
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if self.path is not None and self.path.exists():
+            self.path.unlink()
+
+
+class BulkImporter:
+    """
+    Writes documents to a Firestore collection in WriteBatch chunks of up to
+    500 operations, with several batches committed in parallel.
+
+    Failed commits are retried with exponential backoff. Progress is recorded
+    in a checkpoint after every contiguous run of committed batches; since
+    every write is a `set` with a deterministic document ID, re-running the
+    last uncommitted rows after a crash only upserts them again.
+
+    `extra_writes(batch, docs)`, if given, is called on every commit attempt
+    to add more operations (e.g. counter increments) to the same batch; the
+    batch size is then halved to leave room for them, and a chunk whose writes
+    still go over the limit is split in two.
+
+    `version_writes(batch, docs)`, if given, adds operations that only need to
+    happen once per checkpoint (e.g. cache version bumps). They are committed
+    in their own batch, from a single thread, with the documents committed
+    since the last checkpoint, before the checkpoint is saved.
+    """
+
+    def __init__(
+        self,
+        db,
+        collection: str,
+        checkpoint: Optional[Checkpoint] = None,
+        batch_size: int = MAX_BATCH_SIZE,
+        max_in_flight: int = 4,
+        max_retries: int = 6,
+        base_delay: float = 0.5,
+        extra_writes: Optional[Callable[[object, List[Tuple[str, Dict]]], None]] = None,
+        version_writes: Optional[Callable[[object, List[Tuple[str, Dict]]], None]] = None,
+    ):
+        self.db = db
+        self.collection_ref = db.collection(collection)
+        self.checkpoint = checkpoint
+        max_batch_size = MAX_BATCH_SIZE // 2 if extra_writes else MAX_BATCH_SIZE
+        self.batch_size = max(1, min(batch_size, max_batch_size))
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.extra_writes = extra_writes
+        self.version_writes = version_writes
+
+    def _document_writes(self, batch, docs: List[Tuple[str, Dict]]):
+        for doc_id, data in docs:
+            batch.set(self.collection_ref.document(doc_id), data)
+        if self.extra_writes:
+            self.extra_writes(batch, docs)
+
+    def _commit(self, docs: List[Tuple[str, Dict]], add_writes: Optional[Callable] = None):
+        add_writes = add_writes or self._document_writes
+        attempt = 0
+        while True:
+            batch = self.db.batch()
+            add_writes(batch, docs)
+            if len(batch) > MAX_BATCH_SIZE and len(docs) > 1:
+                # Too many extra writes for one commit: split the documents
+                middle = len(docs) // 2
+                self._commit(docs[:middle], add_writes)
+                self._commit(docs[middle:], add_writes)
+                return
+            try:
+                batch.commit()
+                return
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = self.base_delay * (2 ** (attempt - 1))
+                delay = delay * (0.5 + random.random())  # jitter
+                print(f"\nCommit failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def run(self, docs: Iterable[Tuple[str, Dict]], progress: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Imports (doc_id, data) pairs, skipping those already covered by the
+        checkpoint. Returns the total number of rows committed.
+        """
+        rows_done = self.checkpoint.load() if self.checkpoint else 0
+        skip = rows_done
+        if skip:
+            print(f"Resuming after {skip} rows already imported")
+
+        pending = {}  # future -> (batch index, documents)
+        finished = {}  # batch index -> documents, waiting for earlier batches
+        next_to_record = 0
+        batch_index = 0
+
+        def collect(done):
+            nonlocal rows_done, next_to_record
+            for future in done:
+                index, chunk = pending.pop(future)
+                future.result()  # re-raises the commit error, if any
+                finished[index] = chunk
+                if progress:
+                    progress(len(chunk))
+            recorded = []
+            while next_to_record in finished:
+                recorded.extend(finished.pop(next_to_record))
+                next_to_record += 1
+            if not recorded:
+                return
+            if self.version_writes:
+                self._commit(recorded, self.version_writes)
+            rows_done += len(recorded)
+            if self.checkpoint:
+                self.checkpoint.save(rows_done)
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            chunk = []
+            for position, doc in enumerate(docs):
+                if position < skip:
+                    continue
+                chunk.append(doc)
+                if len(chunk) < self.batch_size:
+                    continue
+                if len(pending) >= self.max_in_flight:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending[executor.submit(self._commit, chunk)] = (batch_index, chunk)
+                batch_index += 1
+                chunk = []
+
+            if chunk:
+                pending[executor.submit(self._commit, chunk)] = (batch_index, chunk)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        if self.checkpoint:
+            self.checkpoint.clear()
+        return rows_done
@@ -1,78 +1,197 @@
-import json
-import csv
-import os
-
-import json
 import csv
+import gzip
 import os
 import argparse
 
+import ijson
+
+FIELDNAMES = ['oid', 'title', 'date', 'latitude', 'longitude', 'notes']
+
+# 'parquet' needs pyarrow, an optional dependency (requirements-optional.txt)
+FORMATS = ('csv', 'csv.gz', 'parquet')
+
+# Rows buffered per Parquet row group
+PARQUET_ROW_GROUP = 65536
+
+LOCATIONS_PREFIX = 'deployments.item.locations.item'
+LOCATION_FIELDS = frozenset(['date', 'latitude', 'longitude', 'notes'])
+
+
+def iter_locations(f):
+    """
+    Incrementally parses a My Wildlife export and yields one flat row per
+    `deployments[].locations[]` entry, without loading the whole document.
+
+    Rows are emitted as soon as each location is parsed. If a deployment lists
+    its `locations` before its `_id`/`title`, that deployment's rows are held
+    back until the end of the deployment.
+    """
+    oid = None
+    title = None
+    pending = None  # rows waiting for the deployment metadata
+    location = None
+    key_start = len(LOCATIONS_PREFIX) + 1
+
+    for prefix, event, value in ijson.parse(f, use_float=True):
+        # Location fields are by far the most frequent events: test them first
+        if location is not None and event != 'end_map':
+            key = prefix[key_start:]
+            if key in LOCATION_FIELDS:
+                location[key] = value
+        elif prefix == 'deployments.item' and event == 'start_map':
+            oid, title, pending = None, None, []
+        elif prefix == 'deployments.item' and event == 'end_map':
+            for row in pending:
+                row['oid'], row['title'] = oid, title
+                yield row
+            pending = None
+        elif prefix == 'deployments.item._id.$oid':
+            oid = value
+        elif prefix == 'deployments.item.title':
+            title = value
+        elif prefix == LOCATIONS_PREFIX and event == 'start_map':
+            location = {}
+        elif prefix == LOCATIONS_PREFIX and event == 'end_map':
+            row = {
+                'oid': oid,
+                'title': title,
+                'date': location.get('date'),
+                'latitude': location.get('latitude'),
+                'longitude': location.get('longitude'),
+                'notes': location.get('notes')
+            }
+            location = None
+            if oid is None or title is None:
+                pending.append(row)
+            else:
+                yield row
+
+
+def _normalize_number(value):
+    # ijson returns whole numbers in float fields as floats; keep `date` an int
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def write_csv(rows, output_file_path, compress=False):
+    opener = gzip.open if compress else open
+    count = 0
+    with opener(output_file_path, 'wt', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for row in rows:
+            row['date'] = _normalize_number(row['date'])
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_parquet(rows, output_file_path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet output requires pyarrow (pip install -r requirements-optional.txt)")
+
+    schema = pa.schema([
+        ('oid', pa.string()),
+        ('title', pa.string()),
+        ('date', pa.int64()),
+        ('latitude', pa.float64()),
+        ('longitude', pa.float64()),
+        ('notes', pa.string()),
+    ])
+
+    def to_table(chunk):
+        columns = {name: [row[name] for row in chunk] for name in FIELDNAMES}
+        columns['date'] = [None if d is None else int(d) for d in columns['date']]
+        return pa.Table.from_pydict(columns, schema=schema)
+
+    count = 0
+    with pq.ParquetWriter(output_file_path, schema) as writer:
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= PARQUET_ROW_GROUP:
+                writer.write_table(to_table(chunk))
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            writer.write_table(to_table(chunk))
+            count += len(chunk)
+    return count
+
+
+def detect_format(output_file_path):
+    if output_file_path.endswith('.parquet'):
+        return 'parquet'
+    if output_file_path.endswith('.gz'):
+        return 'csv.gz'
+    return 'csv'
+
+
+def convert(input_file_path, output_file_path, output_format='csv'):
+    """
+    Streams the JSON export at `input_file_path` into `output_file_path`.
+    Returns the number of rows written.
+    """
+    with open(input_file_path, 'rb') as f:
+        rows = iter_locations(f)
+        if output_format == 'parquet':
+            return write_parquet(rows, output_file_path)
+        return write_csv(rows, output_file_path, compress=output_format == 'csv.gz')
+
+
 def convert_my_wildlife_to_csv():
     """
-    Converts a wildlife JSON file to a flattened CSV.
+    Converts a wildlife JSON file to a flattened CSV (optionally gzip
+    compressed) or Parquet file, keeping memory usage flat.
     """
     parser = argparse.ArgumentParser(description='Convert wildlife JSON to CSV.')
     parser.add_argument('input_file', help='Path to the input JSON file')
-    parser.add_argument('-o', '--output', help='Path to the output CSV file')
+    parser.add_argument('-o', '--output', help='Path to the output file')
+    parser.add_argument(
+        '-f', '--format',
+        choices=FORMATS,
+        help='Output format (default: inferred from the output extension, else csv)'
+    )
 
     args = parser.parse_args()
 
     input_file_path = args.input_file
-    
+    output_format = args.format
+
     if args.output:
         output_file_path = args.output
     else:
-        # Default output: replace extension with .csv
+        # Default output: replace extension with the format's extension
         base, _ = os.path.splitext(input_file_path)
-        output_file_path = f"{base}.csv"
+        output_file_path = f"{base}.{output_format or 'csv'}"
+
+    if output_format is None:
+        output_format = detect_format(output_file_path)
 
     print(f"Reading from: {input_file_path}")
-    
+    print(f"Writing {output_format} to: {output_file_path}")
+
     try:
-        with open(input_file_path, 'r') as f:
-            data = json.load(f)
+        count = convert(input_file_path, output_file_path, output_format)
     except FileNotFoundError:
         print(f"Error: File not found at {input_file_path}")
         return
-    except json.JSONDecodeError:
+    except ijson.JSONError:
         print(f"Error: Failed to decode JSON from {input_file_path}")
         return
-
-    deployments = data.get('deployments', [])
-    flattened_data = []
-
-    for deployment in deployments:
-        oid = deployment.get('_id', {}).get('$oid')
-        title = deployment.get('title')
-        locations = deployment.get('locations', [])
-
-        for loc in locations:
-            row = {
-                'oid': oid,
-                'title': title,
-                'date': loc.get('date'),
-                'latitude': loc.get('latitude'),
-                'longitude': loc.get('longitude'),
-                'notes': loc.get('notes')
-            }
-            flattened_data.append(row)
-
-    if not flattened_data:
-        print("No data found to write to CSV.")
+    except (IOError, RuntimeError) as e:
+        print(f"Error writing to file {output_file_path}: {e}")
         return
 
-    print(f"Writing {len(flattened_data)} rows to: {output_file_path}")
-
-    fieldnames = ['oid', 'title', 'date', 'latitude', 'longitude', 'notes']
+    if not count:
+        print("No data found to write.")
+        return
 
-    try:
-        with open(output_file_path, 'w', newline='') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(flattened_data)
-        print("Conversion complete.")
-    except IOError as e:
-        print(f"Error writing to file {output_file_path}: {e}")
+    print(f"Conversion complete: {count} rows written.")
 
 if __name__ == "__main__":
     convert_my_wildlife_to_csv()
@@ -1,5 +1,7 @@
 import argparse
 import csv
+import sys
+from collections import Counter
 from pathlib import Path
 
 from tqdm import tqdm
@@ -7,6 +9,8 @@ from tqdm import tqdm
 import firebase_admin
 from firebase_admin import credentials, firestore
 
+from bulk_writer import BulkImporter, Checkpoint, MAX_BATCH_SIZE
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent  # points to `backend/`
 SERVICE_ACCOUNT_PATH = BASE_DIR / "serviceAccountKey.json"
@@ -115,23 +119,105 @@ def row_to_avistamento(row: dict) -> Avistamento:
     )
 
 
-def import_avistamentos(csv_path: Path = CSV_PATH, max_linhas: int | None = None):
+def read_avistamentos(csv_path: Path, max_linhas: int | None = None, date_of=None):
     """
-    Read the CSV and import each line as a Sighting document into Firestore.
+    Yield (doc_id, data) pairs for each CSV line. With `date_of`, each document
+    gets the `data_registro` timestamp computed from its dia/mes/ano_registro.
     """
-    avistamentos_ref = db.collection("avistamentos")
-
     with csv_path.open(mode="r", encoding="utf-8", newline="") as f:
         reader = csv.DictReader(f)
-        count = 0
-        for row in tqdm(reader, desc="Importando avistamentos", unit=""):
-            avistamento = row_to_avistamento(row)
-            # Use `registro` as the document ID so re-running the script upserts.
-            doc_id = str(avistamento.registro)
-            avistamentos_ref.document(doc_id).set(avistamento.to_dict())
-            count += 1
+        for count, row in enumerate(reader):
             if max_linhas is not None and count >= max_linhas:
                 break
+            avistamento = row_to_avistamento(row)
+            data = avistamento.to_dict()
+            if date_of is not None:
+                date = date_of(data)
+                if date is not None:
+                    data["data_registro"] = date
+            # Delta sync watermark (services/sync.py)
+            data["updated_at"] = firestore.SERVER_TIMESTAMP
+            # Use `registro` as the document ID so re-running the script upserts.
+            yield str(avistamento.registro), data
+
+
+def load_backend_services():
+    """
+    Load the backend's count rollups (services/counters.py) and dataset
+    versions (services/versions.py), writing through this script's Firestore client.
+    """
+    sys.path.insert(0, str(BASE_DIR))
+    from database import registry
+    from services import counters, versions
+
+    registry.override(firestore=db)
+    return counters, versions
+
+
+def import_writes(counters):
+    """
+    Build the BulkImporter hook that adds to each batch the rollup increments
+    of its documents, compared with their currently stored versions.
+    """
+    fields = ["ano_registro", "mes_registro", "dia_registro"]
+
+    def add_writes(batch, docs):
+        refs = [db.collection("avistamentos").document(doc_id) for doc_id, _ in docs]
+        current = {
+            snapshot.id: snapshot.to_dict()
+            for snapshot in db.get_all(refs, field_paths=fields)
+            if snapshot.exists
+        }
+        deltas = Counter()
+        for doc_id, data in docs:
+            deltas.update(counters.avistamento_deltas(current.get(doc_id), data))
+            current[doc_id] = data
+        counters.add_avistamento_counts(batch, deltas)
+
+    return add_writes
+
+
+def version_writes(versions):
+    """
+    Build the BulkImporter hook run once per checkpoint: a bump of the
+    sightings version (vector tiles).
+    """
+    def add_writes(batch, docs):
+        versions.bump_version(batch, versions.AVISTAMENTOS_VERSION)
+
+    return add_writes
+
+
+def import_avistamentos(
+    csv_path: Path = CSV_PATH,
+    max_linhas: int | None = None,
+    batch_size: int = MAX_BATCH_SIZE,
+    in_flight: int = 4,
+    checkpoint_path: Path | None = None,
+):
+    """
+    Read the CSV and import each line as a Sighting document into Firestore.
+
+    Writes go in batches of `batch_size` with `in_flight` batches committed in
+    parallel; progress is saved to `checkpoint_path` to resume interrupted imports.
+    The count rollups are updated in the same commits, and the sightings
+    version once per checkpoint.
+    """
+    counters, versions = load_backend_services()
+    checkpoint = Checkpoint(checkpoint_path, source=str(csv_path.resolve())) if checkpoint_path else None
+    importer = BulkImporter(
+        db,
+        "avistamentos",
+        checkpoint=checkpoint,
+        batch_size=batch_size,
+        max_in_flight=in_flight,
+        extra_writes=import_writes(counters),
+        version_writes=version_writes(versions),
+    )
+
+    with tqdm(desc="Importando avistamentos", unit="") as progress:
+        rows = read_avistamentos(csv_path, max_linhas, counters.avistamento_date)
+        count = importer.run(rows, progress=progress.update)
 
     print(f"\nImportados {count} avistamentos de {csv_path}")
 
@@ -153,7 +239,39 @@ if __name__ == "__main__":
         default=None,
         help="Número máximo de linhas do CSV a importar (padrão: importa todas).",
     )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=MAX_BATCH_SIZE,
+        help=f"Escritas por commit (padrão/máximo: {MAX_BATCH_SIZE}).",
+    )
+    parser.add_argument(
+        "--in-flight",
+        type=int,
+        default=4,
+        help="Número de lotes enviados em paralelo (padrão: 4).",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="Arquivo de checkpoint para retomar uma importação interrompida (padrão: <csv_path>.checkpoint).",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Ignora o checkpoint existente e importa desde a primeira linha.",
+    )
     args = parser.parse_args()
 
     csv_arg = Path(args.csv_path)
-    import_avistamentos(csv_path=csv_arg, max_linhas=args.num_linhas)
+    checkpoint_arg = Path(args.checkpoint) if args.checkpoint else csv_arg.with_name(csv_arg.name + ".checkpoint")
+    if args.restart and checkpoint_arg.exists():
+        checkpoint_arg.unlink()
+
+    import_avistamentos(
+        csv_path=csv_arg,
+        max_linhas=args.num_linhas,
+        batch_size=args.batch_size,
+        in_flight=args.in_flight,
+        checkpoint_path=checkpoint_arg,
+    )
@@ -1,5 +1,7 @@
 import argparse
 import csv
+import sys
+from collections import Counter
 from pathlib import Path
 
 from tqdm import tqdm
@@ -7,6 +9,8 @@ from tqdm import tqdm
 import firebase_admin
 from firebase_admin import credentials, firestore
 
+from bulk_writer import BulkImporter, Checkpoint, MAX_BATCH_SIZE, document_id
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent  # points to `backend/`
 SERVICE_ACCOUNT_PATH = BASE_DIR / "serviceAccountKey.json"
@@ -57,28 +61,143 @@ def row_to_telemetry(row: dict) -> Telemetry:
     )
 
 
-def import_telemetry(csv_path: Path = CSV_PATH, max_linhas: int | None = None):
+def telemetry_doc_id(telemetry: Telemetry) -> str:
     """
-    Read the CSV and import each line as a document into 'telemetria' collection in Firestore.
+    Deterministic document ID (oid + date), so re-running an import upserts
+    the same documents instead of duplicating them. An oid containing "/"
+    is escaped (see bulk_writer.document_id).
     """
-    collection_ref = db.collection("telemetria")
+    return document_id(telemetry.oid, telemetry.date)
 
-    if not csv_path.exists():
-        print(f"Error: CSV file not found at {csv_path}")
-        return
 
+def load_place_index():
+    """
+    Load the backend's places index (services/places.py) to label each
+    position with the place containing it.
+    """
+    sys.path.insert(0, str(BASE_DIR))
+    from services.places import get_place_index
+
+    return get_place_index()
+
+
+def load_geohash_encoder():
+    """
+    Load the backend's encoder of the `geohash` field (services/telemetria.py)
+    used by the bbox/near queries.
+    """
+    sys.path.insert(0, str(BASE_DIR))
+    from services.telemetria import telemetria_geohash
+
+    return telemetria_geohash
+
+
+def load_backend_services():
+    """
+    Load the backend's count rollups (services/counters.py) and dataset
+    versions (services/versions.py), writing through this script's Firestore client.
+    """
+    sys.path.insert(0, str(BASE_DIR))
+    from database import registry
+    from services import counters, versions
+
+    registry.override(firestore=db)
+    return counters, versions
+
+
+def import_writes(counters):
+    """
+    Build the BulkImporter hook that adds to each batch the (oid, day) rollup
+    increments of the documents that do not exist yet (document IDs are
+    derived from oid and date, so an overwrite never moves a record).
+    """
+    def add_writes(batch, docs):
+        refs = [db.collection("telemetria").document(doc_id) for doc_id, _ in docs]
+        existing = {snapshot.id for snapshot in db.get_all(refs, field_paths=["oid"]) if snapshot.exists}
+        deltas = Counter()
+        for doc_id, data in docs:
+            if doc_id not in existing:
+                deltas[counters.telemetria_bucket(data)] += 1
+                existing.add(doc_id)
+        counters.add_telemetria_counts(batch, deltas)
+
+    return add_writes
+
+
+def version_writes(versions):
+    """
+    Build the BulkImporter hook run once per checkpoint: a bump of the version
+    of every oid imported since the last one, so the backend's cached tracks
+    of those animals are rebuilt, and of the whole telemetry (vector tiles).
+    """
+    def add_writes(batch, docs):
+        for oid in dict.fromkeys(data["oid"] for _, data in docs):
+            versions.bump_version(batch, versions.telemetria_version_name(oid))
+        versions.bump_version(batch, versions.TELEMETRIA_VERSION)
+
+    return add_writes
+
+
+def read_telemetry(csv_path: Path, max_linhas: int | None = None, place_index=None, encode_geohash=None):
+    """
+    Yield (doc_id, data) pairs for each CSV line.
+    """
     with csv_path.open(mode="r", encoding="utf-8", newline="") as f:
         reader = csv.DictReader(f)
-        count = 0
-        
-        # Use tqdm for progress bar
-        for row in tqdm(reader, desc="Importing telemetry", unit=""):
-            telemetry = row_to_telemetry(row)
-            # Create a new document reference with an auto-generated ID
-            collection_ref.add(telemetry.to_dict())
-            count += 1
+        for count, row in enumerate(reader):
             if max_linhas is not None and count >= max_linhas:
                 break
+            telemetry = row_to_telemetry(row)
+            data = telemetry.to_dict()
+            if place_index is not None:
+                data["place"] = place_index.lookup(telemetry.latitude, telemetry.longitude)
+            if encode_geohash is not None:
+                data["geohash"] = encode_geohash(telemetry.latitude, telemetry.longitude)
+            # Delta sync watermark (services/sync.py)
+            data["updated_at"] = firestore.SERVER_TIMESTAMP
+            yield telemetry_doc_id(telemetry), data
+
+
+def import_telemetry(
+    csv_path: Path = CSV_PATH,
+    max_linhas: int | None = None,
+    batch_size: int = MAX_BATCH_SIZE,
+    in_flight: int = 4,
+    checkpoint_path: Path | None = None,
+    label_places: bool = False,
+):
+    """
+    Read the CSV and import each line as a document into 'telemetria' collection in Firestore.
+
+    Writes go in batches of `batch_size` with `in_flight` batches committed in
+    parallel. Progress is saved to `checkpoint_path` so an interrupted import
+    resumes where it stopped. With `label_places`, each document gets a
+    `place` field with the name of the place containing the position. Every
+    document gets the `geohash` of its position (spatial queries).
+    The count rollups are updated in the same commits, and the telemetry
+    versions once per checkpoint.
+    """
+    if not csv_path.exists():
+        print(f"Error: CSV file not found at {csv_path}")
+        return
+
+    counters, versions = load_backend_services()
+    checkpoint = Checkpoint(checkpoint_path, source=str(csv_path.resolve())) if checkpoint_path else None
+    importer = BulkImporter(
+        db,
+        "telemetria",
+        checkpoint=checkpoint,
+        batch_size=batch_size,
+        max_in_flight=in_flight,
+        extra_writes=import_writes(counters),
+        version_writes=version_writes(versions),
+    )
+
+    # Use tqdm for progress bar
+    with tqdm(desc="Importing telemetry", unit="") as progress:
+        place_index = load_place_index() if label_places else None
+        rows = read_telemetry(csv_path, max_linhas, place_index, load_geohash_encoder())
+        count = importer.run(rows, progress=progress.update)
 
     print(f"\nImported {count} telemetry records from {csv_path}")
 
@@ -100,6 +219,33 @@ if __name__ == "__main__":
         default=None,
         help="Maximum number of lines to import (default: all).",
     )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=MAX_BATCH_SIZE,
+        help=f"Writes per batch commit (default/maximum: {MAX_BATCH_SIZE}).",
+    )
+    parser.add_argument(
+        "--in-flight",
+        type=int,
+        default=4,
+        help="Number of batches committed in parallel (default: 4).",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="Checkpoint file used to resume an interrupted import (default: <csv_path>.checkpoint).",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Ignore an existing checkpoint and import from the first line.",
+    )
+    parser.add_argument(
+        "--label-places",
+        action="store_true",
+        help="Store in each document the name of the place (places.json) containing it.",
+    )
     args = parser.parse_args()
 
     csv_arg = Path(args.csv_path)
@@ -107,4 +253,15 @@ if __name__ == "__main__":
     # The script uses absolute paths for defaults, user input might be relative.
     # We will assume user input paths are correct as is or relative to CWD.
     
-    import_telemetry(csv_path=csv_arg, max_linhas=args.num_lines)
+    checkpoint_arg = Path(args.checkpoint) if args.checkpoint else csv_arg.with_name(csv_arg.name + ".checkpoint")
+    if args.restart and checkpoint_arg.exists():
+        checkpoint_arg.unlink()
+
+    import_telemetry(
+        csv_path=csv_arg,
+        max_linhas=args.num_lines,
+        batch_size=args.batch_size,
+        in_flight=args.in_flight,
+        checkpoint_path=checkpoint_arg,
+        label_places=args.label_places,
+    )
@@ -0,0 +1,98 @@
+import xml.etree.ElementTree as ET
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+
+def local_name(tag: str) -> str:
+    """
+    Tag name without its namespace ('{http://www.opengis.net/kml/2.2}Placemark' -> 'Placemark').
+    KML files may or may not declare the namespace, so tags are always compared this way.
+    """
+    return tag.rsplit('}', 1)[-1]
+
+
+def find_child(element: ET.Element, name: str) -> Optional[ET.Element]:
+    for child in element:
+        if local_name(child.tag) == name:
+            return child
+    return None
+
+
+def parse_coordinates(text: str) -> np.ndarray:
+    """
+    Parses a KML <coordinates> string ("lon,lat[,alt] lon,lat[,alt] ...") into
+    an (n, 2) float array of [lon, lat] in one vectorized conversion.
+    Vertices with fewer than two values are skipped.
+    """
+    vertices = text.split()
+    vertex_count = len(vertices)
+    if not vertex_count:
+        return np.empty((0, 2))
+
+    # Fast path: every vertex has the same number of values
+    comma_counts = {vertex.count(',') for vertex in vertices}
+    if len(comma_counts) == 1:
+        dims = comma_counts.pop() + 1
+        values = np.fromstring(text.replace(',', ' '), dtype=np.float64, sep=' ')
+        if dims >= 2 and values.size == dims * vertex_count:
+            return values.reshape(-1, dims)[:, :2]
+
+    # Mixed tuple sizes (e.g. some vertices with altitude): parse per vertex
+    points = [vertex.split(',')[:2] for vertex in vertices]
+    return np.array([p for p in points if len(p) == 2], dtype=np.float64).reshape(-1, 2)
+
+
+def _placemark_ring(placemark: ET.Element) -> Optional[ET.Element]:
+    # We look for LinearRing inside MultiGeometry or fallback to direct LinearRing
+    multi_geo = find_child(placemark, 'MultiGeometry')
+    if multi_geo is not None:
+        return find_child(multi_geo, 'LinearRing')
+    return find_child(placemark, 'LinearRing')
+
+
+def iter_placemarks(kml_path, folder_id: str = "results") -> Iterator[Tuple[str, np.ndarray]]:
+    """
+    Streams the Placemarks inside the <Folder id="{folder_id}"> folders of a
+    KML file, yielding (name, coordinates) as each one is parsed, where
+    coordinates is an (n, 2) array of [lon, lat].
+
+    Elements are cleared once handled, so memory does not grow with the file.
+    """
+    folder_depth = 0  # > 0 while inside a target folder
+    in_placemark = False
+    parents = []
+
+    for event, elem in ET.iterparse(kml_path, events=('start', 'end')):
+        name = local_name(elem.tag)
+
+        if event == 'start':
+            parents.append(elem)
+            if name == 'Folder' and (folder_depth or elem.get('id') == folder_id):
+                folder_depth += 1
+            elif name == 'Placemark':
+                in_placemark = True
+            continue
+
+        parents.pop()
+
+        if name == 'Folder' and folder_depth:
+            folder_depth -= 1
+        elif name == 'Placemark':
+            in_placemark = False
+            if folder_depth:
+                name_elem = find_child(elem, 'name')
+                linear_ring = _placemark_ring(elem)
+                if name_elem is not None and name_elem.text and linear_ring is not None:
+                    coord_elem = find_child(linear_ring, 'coordinates')
+                    if coord_elem is not None and coord_elem.text:
+                        coords = parse_coordinates(coord_elem.text)
+                        if len(coords):
+                            yield name_elem.text.strip(), coords
+
+        # Children of a Placemark are kept until the Placemark itself ends;
+        # everything else is dropped as soon as it is handled
+        if not in_placemark:
+            elem.clear()
+            if parents and len(parents[-1]) and parents[-1][-1] is elem:
+                parents[-1].remove(elem)
@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # points to `backend/`
+sys.path.insert(0, str(BASE_DIR))
+
+from main import app  # noqa: E402
+from database import registry  # noqa: E402
+
+
+class SlowQuery:
+    """
+    Stand-in for a Firestore query that blocks for `latency` seconds on each
+    round trip, like a real network call would.
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def __getattr__(self, name):
+        # order_by, where, offset, limit, start_after... return the query itself
+        return lambda *args, **kwargs: self
+
+    def stream(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return iter([])
+
+    def get(self, *args, **kwargs):
+        return list(self.stream())
+
+
+class SlowFirestore:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def collection(self, name):
+        return SlowQuery(self.latency)
+
+    def close(self):
+        pass
+
+
+async def _inline(func, *args, **kwargs):
+    # Previous behaviour: the blocking call runs on the event loop itself
+    return func(*args, **kwargs)
+
+
+async def run_load(path: str, clients: int, requests_per_client: int) -> float:
+    async def client_loop(client):
+        for _ in range(requests_per_client):
+            response = await client.get(path)
+            response.raise_for_status()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load-test") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[client_loop(client) for _ in range(clients)])
+        elapsed = time.perf_counter() - start
+
+    return clients * requests_per_client / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measures API throughput under concurrent clients with a simulated Firestore latency."
+    )
+    parser.add_argument("--path", default="/avistamentos?format=json", help="Route to request.")
+    parser.add_argument("-c", "--clients", type=int, default=20, help="Concurrent clients.")
+    parser.add_argument("-r", "--requests", type=int, default=5, help="Requests per client.")
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Simulated Firestore round trip, in seconds."
+    )
+    args = parser.parse_args()
+
+    registry.override(firestore=SlowFirestore(args.latency))
+
+    modules = ["api.endpoints.avistamentos", "api.endpoints.telemetria"]
+    patches = [patch(f"{module}.run_blocking", _inline) for module in modules]
+    for p in patches:
+        p.start()
+    blocking = asyncio.run(run_load(args.path, args.clients, args.requests))
+    for p in patches:
+        p.stop()
+
+    executor = asyncio.run(run_load(args.path, args.clients, args.requests))
+
+    print(f"{args.clients} clients x {args.requests} requests, {args.latency * 1000:.0f} ms per round trip")
+    print(f"Blocking on the event loop: {blocking:8.1f} req/s")
+    print(f"Bounded executor:           {executor:8.1f} req/s ({executor / blocking:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
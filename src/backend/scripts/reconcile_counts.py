@@ -0,0 +1,49 @@
+import argparse
+import sys
+from pathlib import Path
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # points to `backend/`
+SERVICE_ACCOUNT_PATH = BASE_DIR / "serviceAccountKey.json"
+
+
+# Initialize Firebase app only once
+if not firebase_admin._apps:
+    cred = credentials.Certificate(str(SERVICE_ACCOUNT_PATH))
+    firebase_admin.initialize_app(cred)
+
+db = firestore.client()
+
+
+def reconcile(collections):
+    """
+    Rebuild the count rollups of `collections` from a full scan, using the
+    backend's services/counters.py through this script's Firestore client.
+    """
+    sys.path.insert(0, str(BASE_DIR))
+    from database import registry
+    from services import counters
+
+    registry.override(firestore=db)
+    if "avistamentos" in collections:
+        print(f"avistamentos: {counters.reconcile_avistamentos_counts()} buckets")
+    if "telemetria" in collections:
+        print(f"telemetria: {counters.reconcile_telemetria_counts()} buckets")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rebuilds the precomputed counts used by ?count=true."
+    )
+    parser.add_argument(
+        "collections",
+        nargs="*",
+        choices=["avistamentos", "telemetria"],
+        default=["avistamentos", "telemetria"],
+        help="Collections whose counts are rebuilt (default: both).",
+    )
+    args = parser.parse_args()
+    reconcile(args.collections)
@@ -0,0 +1,110 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from tqdm import tqdm
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # points to `backend/`
+SERVICE_ACCOUNT_PATH = BASE_DIR / "serviceAccountKey.json"
+
+sys.path.insert(0, str(BASE_DIR))
+
+# Fernando de Noronha archipelago: min_lon,min_lat,max_lon,max_lat
+DEFAULT_BBOX = "-32.55,-3.95,-32.35,-3.80"
+
+# Set in each worker process by _init_worker
+_worker = {}
+
+
+def load_tiles_service():
+    """
+    Load the backend's services/tiles.py, reading through this script's
+    Firestore client. Firebase is initialized here rather than at import
+    time, so worker processes never connect.
+    """
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    from database import registry
+    from services import tiles
+
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(str(SERVICE_ACCOUNT_PATH))
+        firebase_admin.initialize_app(cred)
+    registry.override(firestore=firestore.client())
+    return tiles
+
+
+def _init_worker(layer, version, data, cache_dir, max_bytes):
+    from services import tiles
+    from services.tile_cache import DiskTileCache
+
+    _worker.update(
+        tiles=tiles,
+        layer=layer,
+        version=version,
+        data=data,
+        cache=DiskTileCache(cache_dir, max_bytes),
+    )
+
+
+def _render(tile):
+    z, x, y = tile
+    tiles = _worker["tiles"]
+    content = tiles.render_tile(_worker["layer"], _worker["data"], z, x, y)
+    _worker["cache"].put(tiles.tile_key(_worker["layer"], _worker["version"], z, x, y), content)
+    return len(content)
+
+
+def seed_tiles(layers, min_zoom, max_zoom, bbox, workers):
+    """
+    Render every tile of `layers` covering `bbox` from `min_zoom` to
+    `max_zoom` into the backend's on-disk tile cache, in `workers` processes.
+    Layer data is loaded once here and handed to the workers.
+    """
+    tiles = load_tiles_service()
+    from services.tile_cache import tile_cache
+
+    todo = [(z, x, y) for z in range(min_zoom, max_zoom + 1) for x, y in tiles.tiles_in_bbox(bbox, z)]
+    for layer in layers:
+        version = tiles.layer_version(layer)
+        data = tiles.load_layer_data(layer)
+        initargs = (layer, version, data, str(tile_cache.directory), tile_cache.max_bytes)
+        total_bytes = 0
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            with tqdm(total=len(todo), desc=f"{layer} ({version})", unit=" tiles") as progress:
+                for size in pool.map(_render, todo, chunksize=64):
+                    total_bytes += size
+                    progress.update()
+        print(f"{layer}: {len(todo)} tiles, {total_bytes / 2**20:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Renders vector tiles in advance into the backend's tile cache."
+    )
+    parser.add_argument(
+        "layers",
+        nargs="*",
+        choices=["telemetria", "places", "avistamentos"],
+        default=["telemetria", "places", "avistamentos"],
+        help="Layers to render (default: all).",
+    )
+    parser.add_argument("--min-zoom", type=int, default=0)
+    parser.add_argument("--max-zoom", type=int, default=14)
+    parser.add_argument(
+        "--bbox",
+        default=DEFAULT_BBOX,
+        help=f"Area to cover, min_lon,min_lat,max_lon,max_lat (default: {DEFAULT_BBOX}).",
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=os.cpu_count(), help="Worker processes (default: CPU count)."
+    )
+    args = parser.parse_args()
+
+    bbox = tuple(float(value) for value in args.bbox.split(","))
+    if len(bbox) != 4:
+        parser.error("--bbox needs four comma-separated numbers")
+    seed_tiles(args.layers, args.min_zoom, args.max_zoom, bbox, args.workers)
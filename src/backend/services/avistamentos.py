@@ -1,7 +1,51 @@
+import datetime
+from collections import Counter
 from typing import Optional, List, Tuple, Dict, Any
+from google.api_core import exceptions
 from google.cloud import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
 from database import db
+from services.counters import (
+    add_avistamento_counts,
+    avistamento_date,
+    avistamento_deltas,
+    count_avistamentos_rollup,
+    rollups_ready,
+)
+from services.export import encode, iter_chunks
+from services.pagination import paginate, DOCUMENT_ID
+from services.projection import Fields, project, select_fields
+from services.query_cache import avistamentos_cache, avistamentos_count_flight
+from services.versions import AVISTAMENTOS_VERSION, bump_version, versions_cache
 
+# Chave de ordenação da listagem (registro + id do documento como desempate)
+ORDER_FIELDS = ["registro", DOCUMENT_ID]
+# Com filtro de intervalo de datas o Firestore exige ordenar primeiro pela data
+DATE_ORDER_FIELDS = ["data_registro", "registro", DOCUMENT_ID]
+
+# Projeção padrão da listagem HTML: só os campos exibidos em list.html
+LIST_FIELDS = (
+    "registro", "nome_popular", "nome_cientifico", "dia_registro", "mes_registro", "ano_registro", "local",
+)
+
+# Campos de onde vem `data_registro` (timestamp Unix da meia-noite UTC)
+DATE_FIELDS = ("dia_registro", "mes_registro", "ano_registro")
+
+# Tentativas de escrita quando o documento muda entre a leitura e o commit
+MAX_WRITE_ATTEMPTS = 5
+
+# Escritas em lote: avistamentos por requisição e por commit. Cada avistamento
+# gera até 4 escritas (documento, marca de remoção e dois contadores) e o
+# commit ainda leva a nova versão: 120 * 4 + 1 = 481, abaixo do limite de 500
+# escritas por commit (com 125 ou mais, um bloco no pior caso passaria dele)
+MAX_BATCH_DOCS = 500
+DOCS_PER_COMMIT = 120
+
+# Marcas de remoção ({registro, updated_at}) lidas pelo /sync (services/sync.py)
+TOMBSTONES = "avistamentos_removidos"
+# Campos mantidos pelo servidor: ignorados nos dados enviados pelos clientes
+SERVER_FIELDS = ("data_registro", "updated_at")
+_CONTENTION_ERRORS = (exceptions.Aborted, exceptions.Conflict, exceptions.FailedPrecondition)
 
 
 def query_avistamentos(
@@ -10,26 +54,49 @@ def query_avistamentos(
     dia_registro: Optional[int] = None,
     mes_registro: Optional[int] = None,
     ano_registro: Optional[int] = None,
-) -> Tuple[List[Dict[str, Any]], int, int, bool]:
+    cursor: Optional[str] = None,
+    date_start: Optional[int] = None,
+    date_end: Optional[int] = None,
+    fields: Optional[Fields] = None,
+) -> Tuple[List[Dict[str, Any]], int, int, bool, Optional[str], Optional[str]]:
     """
     Função comum para buscar avistamentos do Firestore com paginação e filtros.
-    Retorna uma tupla: (items, page, page_size, has_more)
+
+    `date_start`/`date_end` (timestamps Unix, inclusivos) filtram pelo campo
+    `data_registro`; nesse caso a listagem é ordenada por data.
+
+    Com `fields` (ver services/projection.py) só esses campos são lidos do
+    Firestore (mais os da ordenação, usados pelos cursores) e retornados.
+
+    Com `cursor` a página é lida com start_after/end_before a partir da chave de
+    ordenação, sem ler os documentos anteriores. Sem cursor, usa `page` (offset)
+    por compatibilidade.
+
+    As páginas ficam no cache `avistamentos_cache` (chave: parâmetros já
+    normalizados), invalidado pelas escritas deste módulo.
+
+    Retorna uma tupla: (items, page, page_size, has_more, next_cursor, prev_cursor)
     """
     # Sanitiza parâmetros básicos
     page = max(page, 1)
     page_size = max(min(page_size, 100), 1)  # limita page_size entre 1 e 100
 
-    offset = (page - 1) * page_size
+    order_fields = _order_fields(date_start, date_end)
+
+    def load():
+        query = _build_query(dia_registro, mes_registro, ano_registro, date_start, date_end)
+        if fields is not None:
+            query = query.select(select_fields(fields, order_fields))
+        docs, has_more, next_cursor, prev_cursor = paginate(query, order_fields, page, page_size, cursor=cursor)
+        return [doc.to_dict() for doc in docs], has_more, next_cursor, prev_cursor
 
-    query = _build_query(dia_registro, mes_registro, ano_registro)
-    
-    query = query.offset(offset).limit(page_size)
-    docs = query.stream()
-    items = [doc.to_dict() for doc in docs]
+    key = (page, page_size, dia_registro, mes_registro, ano_registro, cursor, date_start, date_end, fields)
+    items, has_more, next_cursor, prev_cursor = avistamentos_cache.get_or_load(key, load)
 
-    has_more = len(items) == page_size
+    # Cópias: quem chama pode alterar os itens (ex.: image_url) sem afetar o cache
+    items = [project(item, fields) for item in items]
 
-    return items, page, page_size, has_more
+    return items, page, page_size, has_more, next_cursor, prev_cursor
 
 
 def build_avistamentos_url(
@@ -38,6 +105,9 @@ def build_avistamentos_url(
     dia_registro: Optional[int] = None,
     mes_registro: Optional[int] = None,
     ano_registro: Optional[int] = None,
+    cursor: Optional[str] = None,
+    date_start: Optional[str] = None,
+    date_end: Optional[str] = None,
 ) -> str:
     """
     Constrói a URL para a lista de avistamentos com os parâmetros de query.
@@ -51,6 +121,12 @@ def build_avistamentos_url(
         params.append(f"mes_registro={mes_registro}")
     if ano_registro is not None:
         params.append(f"ano_registro={ano_registro}")
+    if cursor is not None:
+        params.append(f"cursor={cursor}")
+    if date_start is not None:
+        params.append(f"date_start={date_start}")
+    if date_end is not None:
+        params.append(f"date_end={date_end}")
 
     return "/avistamentos?" + "&".join(params)
 
@@ -59,25 +135,303 @@ def count_avistamentos(
     dia_registro: Optional[int] = None,
     mes_registro: Optional[int] = None,
     ano_registro: Optional[int] = None,
-) -> int:
+    date_start: Optional[int] = None,
+    date_end: Optional[int] = None,
+) -> Tuple[int, Optional[datetime.datetime]]:
     """
     Conta o número total de avistamentos que correspondem aos filtros.
+
+    Usa os contadores pré-calculados por (ano, mes, dia) de services/counters.py;
+    enquanto eles não foram reconciliados, conta direto na coleção. Contagens
+    iguais simultâneas compartilham a mesma consulta.
+
+    Retorna uma tupla: (total, updated_at do contador mais recente ou None)
+    """
+    def load():
+        if rollups_ready("avistamentos"):
+            return count_avistamentos_rollup(dia_registro, mes_registro, ano_registro, date_start, date_end)
+
+        query = _build_query(dia_registro, mes_registro, ano_registro, date_start, date_end)
+        aggregate_query = query.count()
+        results = aggregate_query.get()
+        return results[0][0].value, None
+
+    key = (avistamentos_cache.generation, dia_registro, mes_registro, ano_registro, date_start, date_end)
+    return avistamentos_count_flight.do(key, load)
+
+
+def export_avistamentos(
+    export_format: str,
+    dia_registro: Optional[int] = None,
+    mes_registro: Optional[int] = None,
+    ano_registro: Optional[int] = None,
+    date_start: Optional[int] = None,
+    date_end: Optional[int] = None,
+):
+    """
+    Exporta todos os avistamentos que correspondem aos filtros, em ordem de
+    registro (ou de data, com intervalo de datas), no formato `export_format`
+    (ver services/export.py). As colunas são os campos do primeiro bloco lido.
+
+    Retorna um iterador assíncrono de bytes.
+    """
+    query = _build_query(dia_registro, mes_registro, ano_registro, date_start, date_end)
+    chunks = iter_chunks(query, _order_fields(date_start, date_end))
+    return encode(chunks, export_format)
+
+
+def _write_avistamento(registro: str, apply, must_exist: bool):
+    """
+    Lê o avistamento, aplica `apply(batch, doc_ref, snapshot, antigo)` (que
+    retorna o novo conteúdo, ou None se removido) e grava no mesmo commit os
+    incrementos dos contadores e a nova versão dos avistamentos (usada pelos
+    tiles).
+
+    As escritas em documentos existentes usam a data da última atualização
+    como pré-condição; se o documento mudou no meio, lê e tenta de novo.
+
+    Retorna uma tupla (antigo, novo), ou None se `must_exist` e o documento
+    não existe.
+    """
+    doc_ref = db.collection("avistamentos").document(registro)
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        snapshot = doc_ref.get()
+        old = snapshot.to_dict() if snapshot.exists else None
+        if old is None and must_exist:
+            return None
+
+        batch = db.batch()
+        new = apply(batch, doc_ref, snapshot, old)
+        add_avistamento_counts(batch, avistamento_deltas(old, new))
+        bump_version(batch, AVISTAMENTOS_VERSION)
+        try:
+            batch.commit()
+            _invalidate_caches()
+            return old, new
+        except (exceptions.AlreadyExists,) + _CONTENTION_ERRORS:
+            if attempt == MAX_WRITE_ATTEMPTS - 1:
+                raise
+
+
+def _invalidate_caches():
+    avistamentos_cache.invalidate()
+    versions_cache.invalidate()
+
+
+def _precondition(snapshot):
+    return db.write_option(last_update_time=snapshot.update_time)
+
+
+def with_data_registro(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Cópia de `data` com o campo `data_registro` calculado a partir de
+    dia/mes/ano_registro (sem o campo, se a data é incompleta ou inválida).
+    """
+    data = dict(data)
+    data.pop("data_registro", None)
+    date = avistamento_date(data)
+    if date is not None:
+        data["data_registro"] = date
+    return data
+
+
+def create_avistamento_doc(registro: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Cria (ou substitui) o avistamento `registro` com `data`.
+    Retorna o avistamento gravado (com `data_registro`).
     """
-    query = _build_query(dia_registro, mes_registro, ano_registro)
-    aggregate_query = query.count()
-    results = aggregate_query.get()
-    return results[0][0].value
+    data = with_data_registro({key: value for key, value in data.items() if key != "updated_at"})
+
+    def apply(batch, doc_ref, snapshot, old):
+        if old is None:
+            batch.create(doc_ref, {**data, "updated_at": firestore.SERVER_TIMESTAMP})
+        else:
+            # Substitui o documento: campos antigos ausentes em `data` são removidos
+            fields = {FieldPath(key).to_api_repr(): value for key, value in data.items()}
+            for key in old.keys() - data.keys() - {"updated_at"}:
+                fields[FieldPath(key).to_api_repr()] = firestore.DELETE_FIELD
+            fields["updated_at"] = firestore.SERVER_TIMESTAMP
+            batch.update(doc_ref, fields, option=_precondition(snapshot))
+        # Um registro recriado deixa de constar como removido no /sync
+        batch.delete(db.collection(TOMBSTONES).document(doc_ref.id))
+        return data
+
+    _write_avistamento(registro, apply, must_exist=False)
+    return data
+
+
+def _apply_update(data: Dict[str, Any]):
+    # `apply` de _write_avistamento(s) que atualiza os campos `data`
+    def apply(batch, doc_ref, snapshot, old):
+        fields = {key: value for key, value in data.items() if key not in SERVER_FIELDS}
+        new = {**old, **fields}
+        if any(field in fields for field in DATE_FIELDS):
+            # A data mudou: recalcula `data_registro` (ou remove, se inválida)
+            new = with_data_registro(new)
+            fields["data_registro"] = new.get("data_registro", firestore.DELETE_FIELD)
+        if fields:
+            fields["updated_at"] = firestore.SERVER_TIMESTAMP
+            batch.update(doc_ref, fields, option=_precondition(snapshot))
+        return new
+
+    return apply
+
+
+def _apply_delete(batch, doc_ref, snapshot, old):
+    batch.delete(doc_ref, option=_precondition(snapshot))
+    batch.set(
+        db.collection(TOMBSTONES).document(doc_ref.id),
+        {"registro": doc_ref.id, "updated_at": firestore.SERVER_TIMESTAMP},
+    )
+    return None
+
+
+def update_avistamento_doc(registro: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Atualiza os campos `data` do avistamento `registro`: uma leitura e um
+    commit (2 RPCs), pois os contadores e a resposta usam o documento.
+    Retorna o avistamento atualizado, ou None se ele não existe.
+    """
+    result = _write_avistamento(registro, _apply_update(data), must_exist=True)
+    return None if result is None else result[1]
+
+
+def patch_avistamento_doc(registro: str, data: Dict[str, Any]) -> bool:
+    """
+    Atualiza os campos `data` do avistamento `registro` sem lê-lo antes: um
+    único commit, com a pré-condição de que o documento existe. Para quem não
+    precisa do documento atualizado (formulários, redirecionamentos).
+
+    Os contadores dependem da data antiga: se a data de registro muda (ou não
+    há campos), passa por update_avistamento_doc (leitura + commit).
+
+    Retorna False se o avistamento não existe.
+    """
+    fields = {key: value for key, value in data.items() if key not in SERVER_FIELDS}
+    if not fields or any(field in fields for field in DATE_FIELDS):
+        return update_avistamento_doc(registro, fields) is not None
+
+    batch = db.batch()
+    batch.update(
+        db.collection("avistamentos").document(registro),
+        {**fields, "updated_at": firestore.SERVER_TIMESTAMP},
+        option=db.write_option(exists=True),
+    )
+    bump_version(batch, AVISTAMENTOS_VERSION)
+    try:
+        batch.commit()
+    except exceptions.NotFound:
+        return False
+    _invalidate_caches()
+    return True
+
+
+def delete_avistamento_doc(registro: str) -> bool:
+    """
+    Remove o avistamento `registro`: uma leitura (a data antiga, para os
+    contadores) e um commit (2 RPCs). Retorna False se ele não existe.
+    """
+    return _write_avistamento(registro, _apply_delete, must_exist=True) is not None
+
+
+def get_avistamentos(registros: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Lê vários avistamentos em uma única chamada (get_all).
+    Retorna {registro: avistamento ou None se não existe}, na ordem de `registros`.
+    """
+    registros = list(dict.fromkeys(registros))
+    refs = [db.collection("avistamentos").document(registro) for registro in registros]
+    found = {snapshot.id: snapshot.to_dict() for snapshot in db.get_all(refs) if snapshot.exists}
+    return {registro: found.get(registro) for registro in registros}
+
+
+def update_avistamentos(changes: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Atualiza vários avistamentos ({registro: campos}) em poucos commits.
+    Retorna {registro: "updated" ou "not_found"}.
+    """
+    return _write_avistamentos(
+        {registro: _apply_update(data) for registro, data in changes.items()}, "updated"
+    )
+
+
+def delete_avistamentos(registros: List[str]) -> Dict[str, str]:
+    """
+    Remove vários avistamentos em poucos commits.
+    Retorna {registro: "deleted" ou "not_found"}.
+    """
+    return _write_avistamentos({registro: _apply_delete for registro in registros}, "deleted")
+
+
+def _write_avistamentos(applies: Dict[str, Any], status: str) -> Dict[str, str]:
+    """
+    Versão em lote de _write_avistamento: para cada bloco de DOCS_PER_COMMIT
+    avistamentos, uma leitura (get_all) e um commit com as escritas, a soma
+    dos incrementos dos contadores e a nova versão.
+
+    Cada bloco é atômico: se um documento mudou no meio, o bloco inteiro é
+    lido e gravado de novo. Retorna {registro: `status` ou "not_found"}.
+    """
+    results = {}
+    registros = list(applies)
+    for start in range(0, len(registros), DOCS_PER_COMMIT):
+        chunk = registros[start:start + DOCS_PER_COMMIT]
+        refs = [db.collection("avistamentos").document(registro) for registro in chunk]
+        for attempt in range(MAX_WRITE_ATTEMPTS):
+            snapshots = {snapshot.id: snapshot for snapshot in db.get_all(refs)}
+            batch = db.batch()
+            deltas = Counter()
+            chunk_results = {}
+            for registro, doc_ref in zip(chunk, refs):
+                snapshot = snapshots.get(registro)
+                if snapshot is None or not snapshot.exists:
+                    chunk_results[registro] = "not_found"
+                    continue
+                old = snapshot.to_dict()
+                new = applies[registro](batch, doc_ref, snapshot, old)
+                deltas.update(avistamento_deltas(old, new))
+                chunk_results[registro] = status
+            if status not in chunk_results.values():
+                results.update(chunk_results)
+                break
+            add_avistamento_counts(batch, deltas)
+            bump_version(batch, AVISTAMENTOS_VERSION)
+            try:
+                batch.commit()
+                _invalidate_caches()
+                results.update(chunk_results)
+                break
+            except _CONTENTION_ERRORS:
+                if attempt == MAX_WRITE_ATTEMPTS - 1:
+                    raise
+    return results
+
+
+def _order_fields(date_start: Optional[int], date_end: Optional[int]) -> List[str]:
+    if date_start is None and date_end is None:
+        return ORDER_FIELDS
+    return DATE_ORDER_FIELDS
 
 
 def _build_query(
     dia_registro: Optional[int] = None,
     mes_registro: Optional[int] = None,
     ano_registro: Optional[int] = None,
+    date_start: Optional[int] = None,
+    date_end: Optional[int] = None,
 ):
     """
     Helper para construir a query base com filtros.
     """
-    query = db.collection("avistamentos").order_by("registro")
+    query = db.collection("avistamentos")
+    for field in _order_fields(date_start, date_end):
+        query = query.order_by(field)
+
+    # Intervalo de datas: uma varredura do índice (data_registro, registro)
+    if date_start is not None:
+        query = query.where(filter=firestore.FieldFilter("data_registro", ">=", int(date_start)))
+    if date_end is not None:
+        query = query.where(filter=firestore.FieldFilter("data_registro", "<=", int(date_end)))
 
     # Filtros opcionais por data de registro (valores vêm como int; no Firestore são strings)
     if dia_registro is not None:
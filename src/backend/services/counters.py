@@ -0,0 +1,372 @@
+import datetime
+import threading
+import time
+from collections import Counter
+from typing import Optional, Dict, Any, Iterable, List, Tuple
+
+from google.api_core import exceptions
+from google.cloud import firestore
+
+from config import ROLLUPS_CHECK_INTERVAL
+from database import db
+from services.etags import validator_headers
+from services.versions import AVISTAMENTOS_VERSION, TELEMETRIA_VERSION, bump_version, versions_cache
+
+# Rollup collections: one document per (ano, mes, dia) / (oid, day) bucket
+AVISTAMENTOS_COUNTERS = "contagens_avistamentos"
+TELEMETRIA_COUNTERS = "contagens_telemetria"
+# contagens_meta/{avistamentos,telemetria} exists once the rollups were reconciled;
+# contagens_meta/reconcile is the lease of the worker running the periodic reconcile
+COUNTERS_META = "contagens_meta"
+RECONCILE_LEASE = "reconcile"
+
+DAY = 86400
+
+# Firestore limit of writes per commit
+MAX_BATCH_SIZE = 500
+
+_ready = set()
+_ready_lock = threading.Lock()
+# name -> monotonic time before which rollups_ready(name) is False without a read
+_not_ready_until: Dict[str, float] = {}
+
+
+# --- Sightings -------------------------------------------------------------
+
+def avistamento_bucket(data: Optional[Dict[str, Any]]) -> Optional[Tuple[str, str, str]]:
+    """
+    Rollup bucket (ano, mes, dia) of a sighting, with values as stored (strings).
+    """
+    if data is None:
+        return None
+    return tuple(
+        "" if data.get(field) is None else str(data.get(field))
+        for field in ("ano_registro", "mes_registro", "dia_registro")
+    )
+
+
+def avistamento_date(data: Optional[Dict[str, Any]]) -> Optional[int]:
+    """
+    Date of a sighting (dia/mes/ano_registro, stored as strings such as "2" or
+    "02") as the Unix timestamp of its midnight UTC, or None if incomplete or
+    invalid. Stored as `data_registro` for range queries.
+    """
+    if data is None:
+        return None
+    try:
+        date = datetime.datetime(
+            int(data.get("ano_registro")),
+            int(data.get("mes_registro")),
+            int(data.get("dia_registro")),
+            tzinfo=datetime.timezone.utc,
+        )
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return int(date.timestamp())
+
+
+def _telemetria_counter_id(oid: Any, day: Optional[int]) -> str:
+    # Same escaping as scripts/bulk_writer.document_id: "/" would split the path
+    parts = (oid, "none" if day is None else day)
+    return "_".join(str(part).replace("%", "%25").replace("/", "%2F") for part in parts)
+
+
+def _avistamento_counter_ref(bucket: Tuple[str, str, str]):
+    return db.collection(AVISTAMENTOS_COUNTERS).document("_".join(bucket))
+
+
+def add_avistamento_counts(batch, deltas: Dict[Tuple[str, str, str], int]):
+    """
+    Adds to `batch` the increments of the sightings rollups.
+    """
+    for bucket, delta in deltas.items():
+        if not delta:
+            continue
+        ano, mes, dia = bucket
+        batch.set(
+            _avistamento_counter_ref(bucket),
+            {
+                "ano_registro": ano,
+                "mes_registro": mes,
+                "dia_registro": dia,
+                "count": firestore.Increment(delta),
+                "updated_at": firestore.SERVER_TIMESTAMP,
+            },
+            merge=True,
+        )
+
+
+def avistamento_deltas(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> Dict:
+    """
+    Rollup changes caused by replacing `old` by `new` (either may be None).
+    """
+    deltas = Counter()
+    old_bucket, new_bucket = avistamento_bucket(old), avistamento_bucket(new)
+    if old_bucket != new_bucket:
+        if old_bucket is not None:
+            deltas[old_bucket] -= 1
+        if new_bucket is not None:
+            deltas[new_bucket] += 1
+    return deltas
+
+
+def count_avistamentos_rollup(
+    dia_registro: Optional[int] = None,
+    mes_registro: Optional[int] = None,
+    ano_registro: Optional[int] = None,
+    date_start: Optional[int] = None,
+    date_end: Optional[int] = None,
+) -> Tuple[int, Optional[datetime.datetime]]:
+    """
+    Sums the rollups matching the filters. The date range (on the
+    `data_registro` timestamps) is applied to the date of each bucket.
+    Returns a tuple: (total, updated_at of the most recent rollup read)
+    """
+    query = db.collection(AVISTAMENTOS_COUNTERS)
+    if dia_registro is not None:
+        query = query.where(filter=firestore.FieldFilter("dia_registro", "==", str(dia_registro)))
+    if mes_registro is not None:
+        query = query.where(filter=firestore.FieldFilter("mes_registro", "==", str(mes_registro)))
+    if ano_registro is not None:
+        query = query.where(filter=firestore.FieldFilter("ano_registro", "==", str(ano_registro)))
+    snapshots = query.stream()
+    if date_start is not None or date_end is not None:
+        snapshots = (
+            snapshot for snapshot in snapshots
+            if _in_range(avistamento_date(snapshot.to_dict()), date_start, date_end)
+        )
+    return _sum_counters(snapshots)
+
+
+def _in_range(value: Optional[int], start: Optional[int], end: Optional[int]) -> bool:
+    if value is None:
+        return False
+    return (start is None or value >= start) and (end is None or value <= end)
+
+
+# --- Telemetry -------------------------------------------------------------
+
+def telemetria_bucket(data: Optional[Dict[str, Any]]) -> Optional[Tuple[str, Optional[int]]]:
+    """
+    Rollup bucket (oid, day) of a telemetry record; day is the UTC day start.
+    """
+    if data is None:
+        return None
+    date = data.get("date")
+    return data.get("oid"), None if date is None else int(date) - int(date) % DAY
+
+
+def add_telemetria_counts(batch, deltas: Dict[Tuple[str, Optional[int]], int]):
+    """
+    Adds to `batch` the increments of the telemetry rollups.
+    """
+    for (oid, day), delta in deltas.items():
+        if not delta:
+            continue
+        batch.set(
+            db.collection(TELEMETRIA_COUNTERS).document(_telemetria_counter_id(oid, day)),
+            {
+                "oid": oid,
+                "day": day,
+                "count": firestore.Increment(delta),
+                "updated_at": firestore.SERVER_TIMESTAMP,
+            },
+            merge=True,
+        )
+
+
+def count_telemetria_rollup(
+    oid: Optional[str],
+    date_start: Optional[int],
+    date_end: Optional[int],
+    count_raw,
+) -> Tuple[int, Optional[datetime.datetime]]:
+    """
+    Counts telemetry from the (oid, day) rollups. Whole days come from the
+    rollups; the partial days at the edges of the range are counted on the
+    raw collection with `count_raw(date_start, date_end)`.
+
+    Returns a tuple: (total, updated_at of the most recent rollup read)
+    """
+    query = db.collection(TELEMETRIA_COUNTERS)
+    if oid is not None:
+        query = query.where(filter=firestore.FieldFilter("oid", "==", oid))
+
+    if date_start is None and date_end is None:
+        return _sum_counters(query.stream())
+
+    # Whole days inside [date_start, date_end]
+    first_day = None if date_start is None else -(-int(date_start) // DAY) * DAY
+    last_day = None if date_end is None else (int(date_end) + 1) // DAY * DAY - DAY
+    if first_day is not None and last_day is not None and first_day > last_day:
+        return count_raw(date_start, date_end), None
+
+    if first_day is not None:
+        query = query.where(filter=firestore.FieldFilter("day", ">=", first_day))
+    if last_day is not None:
+        query = query.where(filter=firestore.FieldFilter("day", "<=", last_day))
+    total, updated_at = _sum_counters(query.stream())
+
+    # Partial days at the edges
+    if date_start is not None and first_day > date_start:
+        total += count_raw(date_start, first_day - 1)
+    if date_end is not None and last_day + DAY - 1 < date_end:
+        total += count_raw(last_day + DAY, date_end)
+
+    return total, updated_at
+
+
+# --- Common ----------------------------------------------------------------
+
+def _sum_counters(snapshots: Iterable) -> Tuple[int, Optional[datetime.datetime]]:
+    total = 0
+    updated_at = None
+    for snapshot in snapshots:
+        data = snapshot.to_dict() or {}
+        total += int(data.get("count") or 0)
+        if data.get("updated_at") and (updated_at is None or data["updated_at"] > updated_at):
+            updated_at = data["updated_at"]
+    return total, updated_at
+
+
+def count_headers(etag: str, updated_at: Optional[datetime.datetime]) -> Dict[str, str]:
+    """
+    Headers of a count response: its ETag (see services/etags.py) and the
+    freshness of the rollups it was read from.
+    """
+    headers = validator_headers(etag)
+    if updated_at:
+        headers["X-Counts-Updated-At"] = updated_at.isoformat()
+    return headers
+
+
+def rollups_ready(name: str) -> bool:
+    """
+    True once the rollups of `name` ("avistamentos" or "telemetria") were built
+    by a reconcile; before that counts must come from the raw collection.
+    A True answer is kept for good; a False one for ROLLUPS_CHECK_INTERVAL seconds.
+    """
+    if name in _ready:
+        return True
+    if time.monotonic() < _not_ready_until.get(name, 0):
+        return False
+    if db.collection(COUNTERS_META).document(name).get().exists:
+        with _ready_lock:
+            _ready.add(name)
+        return True
+    _not_ready_until[name] = time.monotonic() + ROLLUPS_CHECK_INTERVAL
+    return False
+
+
+def acquire_reconcile_lease(holder: str, duration: float) -> bool:
+    """
+    Takes contagens_meta/reconcile for `duration` seconds, so that of all the
+    workers only one rebuilds the rollups per interval. Returns False if
+    another holder's lease has not expired, or if another worker took it
+    first (the write is conditioned on the lease read).
+    """
+    ref = db.collection(COUNTERS_META).document(RECONCILE_LEASE)
+    snapshot = ref.get()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    lease = {"holder": holder, "expires_at": now + datetime.timedelta(seconds=duration)}
+    try:
+        if not snapshot.exists:
+            ref.create(lease)
+        else:
+            expires_at = (snapshot.to_dict() or {}).get("expires_at")
+            if expires_at is not None and expires_at > now:
+                return False
+            ref.update(lease, option=db.write_option(last_update_time=snapshot.update_time))
+    except (exceptions.AlreadyExists, exceptions.FailedPrecondition):
+        return False
+    return True
+
+
+def _rewrite_counters(collection: str, counters: Dict[str, Dict[str, Any]], meta: str, version: str):
+    """
+    Replaces the documents of a rollup collection by `counters` (doc id -> data)
+    and marks the rollups as ready. If any count changed, the dataset
+    `version` is bumped, so count ETags built from it change too.
+    """
+    writes: List[Tuple[str, Any]] = []
+    existing = {
+        doc.id: (doc.to_dict() or {}).get("count")
+        for doc in db.collection(collection).select(["count"]).stream()
+    }
+    for doc_id, data in counters.items():
+        writes.append(("set", (db.collection(collection).document(doc_id), data)))
+    for doc_id in existing.keys() - counters.keys():
+        writes.append(("delete", (db.collection(collection).document(doc_id),)))
+    changed = existing.keys() != counters.keys() or any(
+        existing[doc_id] != data["count"] for doc_id, data in counters.items()
+    )
+
+    for start in range(0, len(writes), MAX_BATCH_SIZE):
+        batch = db.batch()
+        for operation, args in writes[start:start + MAX_BATCH_SIZE]:
+            getattr(batch, operation)(*args)
+        batch.commit()
+
+    if changed:
+        batch = db.batch()
+        bump_version(batch, version)
+        batch.commit()
+        versions_cache.invalidate()
+
+    db.collection(COUNTERS_META).document(meta).set({"reconciled_at": firestore.SERVER_TIMESTAMP})
+    with _ready_lock:
+        _ready.add(meta)
+        _not_ready_until.pop(meta, None)
+
+
+def reconcile_avistamentos_counts() -> int:
+    """
+    Rebuilds the sightings rollups from a full scan of the collection.
+    Returns the number of buckets written.
+    """
+    fields = ["ano_registro", "mes_registro", "dia_registro"]
+    totals = Counter(
+        avistamento_bucket(doc.to_dict()) for doc in db.collection("avistamentos").select(fields).stream()
+    )
+    counters = {}
+    for bucket, count in totals.items():
+        ano, mes, dia = bucket
+        counters["_".join(bucket)] = {
+            "ano_registro": ano,
+            "mes_registro": mes,
+            "dia_registro": dia,
+            "count": count,
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }
+    _rewrite_counters(AVISTAMENTOS_COUNTERS, counters, "avistamentos", AVISTAMENTOS_VERSION)
+    return len(counters)
+
+
+def reconcile_telemetria_counts() -> int:
+    """
+    Rebuilds the telemetry rollups from a full scan of the collection.
+    Returns the number of buckets written.
+    """
+    totals = Counter(
+        telemetria_bucket(doc.to_dict()) for doc in db.collection("telemetria").select(["oid", "date"]).stream()
+    )
+    counters = {}
+    for (oid, day), count in totals.items():
+        counters[_telemetria_counter_id(oid, day)] = {
+            "oid": oid,
+            "day": day,
+            "count": count,
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }
+    _rewrite_counters(TELEMETRIA_COUNTERS, counters, "telemetria", TELEMETRIA_VERSION)
+    return len(counters)
+
+
+def reconcile_counts():
+    """
+    Rebuilds all rollups. Writes that happen during the scan may be missed
+    until the next reconcile.
+    """
+    avistamentos = reconcile_avistamentos_counts()
+    telemetria = reconcile_telemetria_counts()
+    print(f"Counts reconciled: {avistamentos} sighting buckets, {telemetria} telemetry buckets")
@@ -0,0 +1,49 @@
+"""
+Conditional GET: strong ETags built from what a response depends on
+(document update times, dataset versions, request parameters), so
+If-None-Match can be answered with 304 before running the query, rendering
+the template or encoding the body.
+"""
+import hashlib
+from typing import Any, Dict, Optional
+
+from fastapi.responses import Response
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Strong ETag of `parts` (anything with a stable str()).
+    """
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match check, with the weak comparison RFC 9110 requires for it:
+    W/ prefixes are ignored; a list of ETags or "*" are accepted.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def validator_headers(etag: str) -> Dict[str, str]:
+    """
+    Headers of a revalidated response: clients (and proxies) may store it but
+    must check the ETag before reusing it. The body depends on Accept.
+    """
+    return {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
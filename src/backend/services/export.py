@@ -0,0 +1,139 @@
+import csv
+import io
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from config import EXPORT_CHUNK_SIZE
+from services.executor import run_blocking
+from services.pagination import cursor_values
+from services.serialization import dumps_json
+
+# Export format -> media type. "arrow" needs pyarrow, an optional dependency
+# listed in requirements-optional.txt; without it the endpoints answer 501
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+EXPORT_EXTENSIONS = {"ndjson": "ndjson", "csv": "csv", "arrow": "arrows"}
+
+
+async def iter_chunks(
+    query, order_fields: List[str], chunk_size: int = EXPORT_CHUNK_SIZE
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Yields every document matching `query` in chunks of `chunk_size`, each
+    chunk read with start_after on the order key of the previous one, so only
+    one chunk is held in memory.
+
+    The query must be ordered by `order_fields` (see services/pagination.py).
+    """
+    key = None
+    while True:
+        chunk_query = query if key is None else query.start_after(key)
+        snapshots = await run_blocking(lambda: list(chunk_query.limit(chunk_size).stream()))
+        if not snapshots:
+            return
+        yield [snapshot.to_dict() for snapshot in snapshots]
+        if len(snapshots) < chunk_size:
+            return
+        key = dict(zip(order_fields, cursor_values(snapshots[-1], order_fields)))
+
+
+async def encode_ndjson(chunks: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    async for chunk in chunks:
+        # Same encoding as the JSON responses (timestamps as ISO 8601)
+        yield b"".join(dumps_json(row) + b"\n" for row in chunk)
+
+
+async def encode_csv(
+    chunks: AsyncIterator[List[Dict[str, Any]]], fieldnames: Optional[List[str]] = None
+) -> AsyncIterator[bytes]:
+    """
+    CSV with the columns `fieldnames`; if not given, the fields of the first
+    chunk (in order of appearance). Fields missing from a row are left empty.
+    """
+    writer = None
+    buffer = io.StringIO()
+    async for chunk in chunks:
+        if writer is None:
+            if fieldnames is None:
+                fieldnames = list(dict.fromkeys(field for row in chunk for field in row))
+            writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+            writer.writeheader()
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if writer is None and fieldnames:
+        yield (",".join(fieldnames) + "\r\n").encode("utf-8")
+
+
+async def encode_arrow(
+    chunks: AsyncIterator[List[Dict[str, Any]]],
+    fieldnames: Optional[List[str]] = None,
+    types: Optional[Dict[str, str]] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Arrow IPC stream with one record batch per chunk. Columns are `fieldnames`
+    (or the fields of the first chunk), typed by `types` (field -> Arrow type
+    name, e.g. "int64"); other columns are strings.
+    """
+    import pyarrow as pa
+
+    types = types or {}
+    sink = io.BytesIO()
+    schema = None
+    writer = None
+
+    def flush():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    async for chunk in chunks:
+        if schema is None:
+            if fieldnames is None:
+                fieldnames = list(dict.fromkeys(field for row in chunk for field in row))
+            schema = pa.schema([(name, types.get(name, "string")) for name in fieldnames])
+            writer = pa.ipc.new_stream(sink, schema)
+        columns = {}
+        for field in schema:
+            values = [row.get(field.name) for row in chunk]
+            if pa.types.is_string(field.type):
+                values = [None if value is None else str(value) for value in values]
+            columns[field.name] = values
+        writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+        yield flush()
+
+    if writer is None:
+        schema = pa.schema([(name, types.get(name, "string")) for name in fieldnames or []])
+        writer = pa.ipc.new_stream(sink, schema)
+    writer.close()
+    yield flush()
+
+
+def arrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def encode(
+    chunks: AsyncIterator[List[Dict[str, Any]]],
+    export_format: str,
+    fieldnames: Optional[List[str]] = None,
+    types: Optional[Dict[str, str]] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Encodes the chunks of `iter_chunks` as `export_format` (a key of
+    EXPORT_FORMATS). `types` only applies to Arrow.
+    """
+    if export_format == "csv":
+        return encode_csv(chunks, fieldnames)
+    if export_format == "arrow":
+        return encode_arrow(chunks, fieldnames, types)
+    return encode_ndjson(chunks)
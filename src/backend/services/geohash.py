@@ -0,0 +1,152 @@
+from typing import List, Tuple
+
+import numpy as np
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_BASE32_ARRAY = np.array(list(BASE32))
+_DECODE = {char: index for index, char in enumerate(BASE32)}
+
+MAX_PRECISION = 12
+
+
+def _bits(precision: int) -> Tuple[int, int]:
+    # Geohash interleaves longitude bits (first) with latitude bits
+    total = 5 * precision
+    return (total + 1) // 2, total // 2
+
+
+def _interleave(lon_int, lat_int, precision: int):
+    # Works on ints and on integer arrays alike
+    lon_bits, lat_bits = _bits(precision)
+    code = lon_int * 0
+    for bit in range(5 * precision):
+        # Even positions (from the most significant) take longitude bits
+        if bit % 2 == 0:
+            value = (lon_int >> (lon_bits - 1 - bit // 2)) & 1
+        else:
+            value = (lat_int >> (lat_bits - 1 - bit // 2)) & 1
+        code = (code << 1) | value
+    return code
+
+
+def _check_precision(precision: int):
+    if not 1 <= precision <= MAX_PRECISION:
+        raise ValueError(f"Geohash precision must be between 1 and {MAX_PRECISION}")
+
+
+def _to_string(code: int, precision: int) -> str:
+    return "".join(BASE32[(code >> (5 * (precision - 1 - i))) & 31] for i in range(precision))
+
+
+def encode_many(lats, lons, precision: int) -> np.ndarray:
+    """
+    Geohashes of `precision` characters for arrays of points, computed with
+    integer bit interleaving over the whole array.
+    """
+    _check_precision(precision)
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    lon_bits, lat_bits = _bits(precision)
+
+    lon_int = np.clip(((lons + 180.0) / 360.0 * (1 << lon_bits)).astype(np.int64), 0, (1 << lon_bits) - 1)
+    lat_int = np.clip(((lats + 90.0) / 180.0 * (1 << lat_bits)).astype(np.int64), 0, (1 << lat_bits) - 1)
+    code = _interleave(lon_int, lat_int, precision)
+
+    chars = [_BASE32_ARRAY[(code >> (5 * (precision - 1 - i))) & 31] for i in range(precision)]
+    if not chars:
+        return np.array([], dtype=str)
+    result = chars[0].astype(object)
+    for column in chars[1:]:
+        result = result + column
+    return result.astype(str)
+
+
+def _cell(lat: float, lon: float, precision: int) -> Tuple[int, int]:
+    # Integer longitude and latitude of the cell containing the point
+    lon_bits, lat_bits = _bits(precision)
+    lon_int = min(max(int((lon + 180.0) / 360.0 * (1 << lon_bits)), 0), (1 << lon_bits) - 1)
+    lat_int = min(max(int((lat + 90.0) / 180.0 * (1 << lat_bits)), 0), (1 << lat_bits) - 1)
+    return lon_int, lat_int
+
+
+def encode(lat: float, lon: float, precision: int) -> str:
+    # Scalar version of encode_many; cheaper than NumPy for a single point
+    _check_precision(precision)
+    lon_int, lat_int = _cell(lat, lon, precision)
+    return _to_string(_interleave(lon_int, lat_int, precision), precision)
+
+
+def covering_ranges(
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    max_ranges: int = 8,
+    max_cells: int = 4096,
+) -> List[Tuple[str, str]]:
+    """
+    Ranges [start, end) of geohash strings whose union contains the geohash
+    (of any precision) of every point of the box, for `>=`/`<` queries on a
+    stored geohash field.
+
+    Uses the finest precision whose cells covering the box (at most
+    `max_cells`) merge into at most `max_ranges` runs of consecutive cells;
+    the finer the cells, the fewer documents outside the box are read.
+    An empty or inverted box (or NaN bounds) has no ranges.
+    """
+    if not min_lat <= max_lat or not min_lon <= max_lon:
+        return []
+    # "~" sorts after every geohash character: [g, g + "~") holds all of g's children
+    ranges = [("", "~")]
+    for precision in range(1, MAX_PRECISION + 1):
+        x0, y0 = _cell(min_lat, min_lon, precision)
+        x1, y1 = _cell(max_lat, max_lon, precision)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > max_cells:
+            break
+        xs, ys = np.meshgrid(np.arange(x0, x1 + 1, dtype=np.int64), np.arange(y0, y1 + 1, dtype=np.int64))
+        codes = np.unique(_interleave(xs.ravel(), ys.ravel(), precision))
+        if not len(codes):
+            return []
+        breaks = np.flatnonzero(np.diff(codes) != 1) + 1
+        if len(breaks) + 1 > max_ranges:
+            break
+        starts = codes[np.r_[0, breaks]]
+        ends = codes[np.r_[breaks - 1, len(codes) - 1]]
+        ranges = [
+            (_to_string(int(start), precision), _to_string(int(end), precision) + "~")
+            for start, end in zip(starts, ends)
+        ]
+    return ranges
+
+
+def bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """
+    (min_lat, min_lon, max_lat, max_lon) of a geohash cell.
+    Raises ValueError on invalid characters.
+    """
+    try:
+        code = 0
+        for char in geohash:
+            code = (code << 5) | _DECODE[char]
+    except KeyError:
+        raise ValueError(f"Invalid geohash: {geohash}")
+    lon_bits, lat_bits = _bits(len(geohash))
+
+    lon_int = lat_int = 0
+    for bit in range(5 * len(geohash)):
+        value = (code >> (5 * len(geohash) - 1 - bit)) & 1
+        if bit % 2 == 0:
+            lon_int = (lon_int << 1) | value
+        else:
+            lat_int = (lat_int << 1) | value
+
+    lat_size = 180.0 / (1 << lat_bits)
+    lon_size = 360.0 / (1 << lon_bits)
+    min_lat = -90.0 + lat_int * lat_size
+    min_lon = -180.0 + lon_int * lon_size
+    return min_lat, min_lon, min_lat + lat_size, min_lon + lon_size
+
+
+def center(geohash: str) -> Tuple[float, float]:
+    min_lat, min_lon, max_lat, max_lon = bounds(geohash)
+    return (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
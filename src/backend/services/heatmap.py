@@ -0,0 +1,159 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import HEATMAP_CACHE_SIZE, HEATMAP_CACHE_TTL, HEATMAP_MAX_DWELL_GAP
+from services import geohash
+from services.positions import position_index
+from services.query_cache import QueryCache
+from services.telemetria_analytics import telemetria_oids
+
+WEIGHT_COUNT = "count"
+WEIGHT_DWELL = "dwell"
+WEIGHTS = (WEIGHT_COUNT, WEIGHT_DWELL)
+
+GRID = "grid"
+GEOHASH = "geohash"
+
+# Grid cells per 256-pixel map tile at each zoom level
+CELLS_PER_TILE = 16
+MAX_ZOOM = 20
+
+# (filters, data versions) -> positions and weights
+heatmap_points_cache = QueryCache("heatmap_points", maxsize=HEATMAP_CACHE_SIZE, ttl=HEATMAP_CACHE_TTL)
+# (filters, data versions, kind, level) -> aggregated cells
+heatmap_cache = QueryCache("heatmap", maxsize=HEATMAP_CACHE_SIZE, ttl=HEATMAP_CACHE_TTL)
+
+
+def zoom_cell_size(zoom: int) -> float:
+    """
+    Grid cell size (degrees of longitude) at a web map zoom level.
+    """
+    return 360.0 / (1 << zoom) / CELLS_PER_TILE
+
+
+def dwell_times(dates: np.ndarray, max_gap: float = HEATMAP_MAX_DWELL_GAP) -> np.ndarray:
+    """
+    Time (seconds) attributed to each fix: half of the interval to each
+    neighbouring fix, ignoring intervals longer than `max_gap`.
+    """
+    if len(dates) < 2:
+        return np.zeros(len(dates))
+    intervals = np.diff(dates).astype(np.float64)
+    intervals[intervals > max_gap] = 0.0
+    weights = np.zeros(len(dates))
+    weights[:-1] += intervals / 2
+    weights[1:] += intervals / 2
+    return weights
+
+
+def _select(oids: Optional[Sequence[str]], date_start: Optional[int], date_end: Optional[int]):
+    # Positions of the animals from the positions index, clipped to the date range;
+    # every animal is the oid list cached per telemetry version
+    tracks = []
+    for oid in oids if oids is not None else telemetria_oids():
+        track = position_index.get(oid)
+        dates, lats, lons, _ = track.data
+        first = 0 if date_start is None else int(np.searchsorted(dates, date_start))
+        last = len(dates) if date_end is None else int(np.searchsorted(dates, date_end, side="right"))
+        tracks.append((oid, track.version, len(dates), dates, lats, lons, first, last))
+    return tracks
+
+
+def _points(tracks, weight: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    lats, lons, weights = [], [], []
+    for _, _, _, dates, track_lats, track_lons, first, last in tracks:
+        if first >= last:
+            continue
+        lats.append(track_lats[first:last])
+        lons.append(track_lons[first:last])
+        if weight == WEIGHT_DWELL:
+            weights.append(dwell_times(dates[first:last]))
+        else:
+            weights.append(np.ones(last - first))
+    if not lats:
+        return np.empty(0), np.empty(0), np.empty(0)
+    return np.concatenate(lats), np.concatenate(lons), np.concatenate(weights)
+
+
+def aggregate_grid(lats, lons, weights, cell: float) -> Dict[str, np.ndarray]:
+    """
+    Sums `weights` per lat/lon grid cell of `cell` degrees.
+    """
+    ix = np.floor(np.asarray(lons) / cell).astype(np.int64)
+    iy = np.floor(np.asarray(lats) / cell).astype(np.int64)
+    cells, inverse = np.unique(np.stack([ix, iy], axis=1), axis=0, return_inverse=True)
+    values = np.bincount(inverse.ravel(), weights=weights, minlength=len(cells))
+    return {
+        "lat": (cells[:, 1] + 0.5) * cell,
+        "lon": (cells[:, 0] + 0.5) * cell,
+        "value": values,
+    }
+
+
+def aggregate_geohash(lats, lons, weights, precision: int) -> Dict[str, np.ndarray]:
+    """
+    Sums `weights` per geohash cell of `precision` characters.
+    """
+    codes = geohash.encode_many(lats, lons, precision)
+    cells, inverse = np.unique(codes, return_inverse=True)
+    values = np.bincount(inverse.ravel(), weights=weights, minlength=len(cells))
+    centers = np.array([geohash.center(code) for code in cells.tolist()]).reshape(-1, 2)
+    return {"geohash": cells, "lat": centers[:, 0], "lon": centers[:, 1], "value": values}
+
+
+def heatmap(
+    oids: Optional[Sequence[str]] = None,
+    date_start: Optional[int] = None,
+    date_end: Optional[int] = None,
+    weight: str = WEIGHT_COUNT,
+    cell: Optional[float] = None,
+    geohash_precision: Optional[int] = None,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+) -> Dict[str, Any]:
+    """
+    Telemetry density of `oids` (every animal if None) between the dates, as
+    the count of fixes (`weight="count"`) or the time spent (`"dwell"`) in
+    each grid cell of `cell` degrees, or each geohash of `geohash_precision`.
+
+    The positions come from the in-memory positions index, and the grid of
+    each filter combination and level is cached, so repeated requests (e.g.
+    while panning, with a different `bbox` of min_lon, min_lat, max_lon,
+    max_lat) only filter the cached cells.
+    """
+    tracks = _select(oids, date_start, date_end)
+    versions = tuple((oid, version, size) for oid, version, size, *_ in tracks)
+    filters = (versions, date_start, date_end, weight)
+
+    if geohash_precision is not None:
+        kind, level = GEOHASH, geohash_precision
+    else:
+        kind, level = GRID, cell
+
+    def load_points():
+        return _points(tracks, weight)
+
+    def load_cells():
+        lats, lons, weights = heatmap_points_cache.get_or_load(filters, load_points)
+        if kind == GEOHASH:
+            return aggregate_geohash(lats, lons, weights, level)
+        return aggregate_grid(lats, lons, weights, level)
+
+    cells = heatmap_cache.get_or_load(filters + (kind, level), load_cells)
+
+    mask = np.ones(len(cells["value"]), dtype=bool)
+    if bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        mask = (
+            (cells["lon"] >= min_lon) & (cells["lon"] <= max_lon)
+            & (cells["lat"] >= min_lat) & (cells["lat"] <= max_lat)
+        )
+
+    result: Dict[str, Any] = {"kind": kind, "level": level, "weight": weight}
+    items: List[Dict[str, Any]] = []
+    columns = {name: values[mask].tolist() for name, values in cells.items()}
+    for index in range(int(mask.sum())):
+        items.append({name: values[index] for name, values in columns.items()})
+    result["cells"] = items
+    result["max"] = max((item["value"] for item in items), default=0)
+    return result
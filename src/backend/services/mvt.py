@@ -0,0 +1,171 @@
+"""
+Minimal Mapbox Vector Tile (MVT 2.1) encoder.
+
+Writes the protobuf wire format of vector_tile.proto directly: a tile is a
+list of layers, each with features made of integer tile coordinates
+(0..extent), a geometry type and key/value properties.
+"""
+import struct
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+POINT = 1
+LINESTRING = 2
+POLYGON = 3
+
+_MOVE_TO = 1
+_LINE_TO = 2
+_CLOSE_PATH = 7
+
+_VARINT = 0
+_FIXED64 = 1
+_LENGTH = 2
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _field(number: int, wire_type: int) -> bytes:
+    return _varint((number << 3) | wire_type)
+
+
+def _bytes_field(number: int, data: bytes) -> bytes:
+    return _field(number, _LENGTH) + _varint(len(data)) + data
+
+
+def _uint_field(number: int, value: int) -> bytes:
+    return _field(number, _VARINT) + _varint(value)
+
+
+def _packed(number: int, values: Iterable[int]) -> bytes:
+    return _bytes_field(number, b"".join(_varint(value) for value in values))
+
+
+def _command(command: int, count: int) -> int:
+    return (command & 0x7) | (count << 3)
+
+
+def _encode_value(value: Any) -> bytes:
+    # vector_tile.proto Value: string=1, double=3, uint=5, sint=6, bool=7
+    if isinstance(value, bool):
+        return _uint_field(7, int(value))
+    if isinstance(value, (int, np.integer)):
+        value = int(value)
+        if value >= 0:
+            return _uint_field(5, value)
+        return _uint_field(6, _zigzag(value))
+    if isinstance(value, (float, np.floating)):
+        return _field(3, _FIXED64) + struct.pack("<d", float(value))
+    return _bytes_field(1, str(value).encode("utf-8"))
+
+
+def ring_area(ring: np.ndarray) -> float:
+    """
+    Surveyor's formula in tile coordinates (y down); positive for an
+    exterior ring as defined by the MVT spec.
+    """
+    x, y = ring[:, 0], ring[:, 1]
+    return 0.5 * float(np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y))
+
+
+def _geometry(geometry_type: int, parts: Sequence[np.ndarray]) -> List[int]:
+    commands: List[int] = []
+    cursor_x = cursor_y = 0
+    for part in parts:
+        points = np.asarray(part, dtype=np.int64).reshape(-1, 2)
+        if not len(points):
+            continue
+        deltas = np.diff(points, axis=0, prepend=[[cursor_x, cursor_y]])
+        cursor_x, cursor_y = (int(v) for v in points[-1])
+        encoded = [(_zigzag(int(dx)), _zigzag(int(dy))) for dx, dy in deltas]
+        if geometry_type == POINT:
+            commands.append(_command(_MOVE_TO, len(encoded)))
+            for pair in encoded:
+                commands.extend(pair)
+            continue
+        commands.append(_command(_MOVE_TO, 1))
+        commands.extend(encoded[0])
+        commands.append(_command(_LINE_TO, len(encoded) - 1))
+        for pair in encoded[1:]:
+            commands.extend(pair)
+        if geometry_type == POLYGON:
+            commands.append(_command(_CLOSE_PATH, 1))
+    return commands
+
+
+class Layer:
+    """
+    One layer of a tile. Features are added with integer tile coordinates:
+    - POINT: parts is a list with one (n, 2) array of points
+    - LINESTRING: one (n, 2) array per line
+    - POLYGON: rings without the closing vertex (exterior rings with a
+      positive ring_area, interior rings negative)
+    """
+
+    def __init__(self, name: str, extent: int = 4096):
+        self.name = name
+        self.extent = extent
+        self._features: List[bytes] = []
+        self._keys: Dict[str, int] = {}
+        self._values: Dict[Tuple[type, Any], int] = {}
+
+    def __len__(self):
+        return len(self._features)
+
+    def _tags(self, properties: Dict[str, Any]) -> List[int]:
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            key_index = self._keys.setdefault(key, len(self._keys))
+            value_key = (type(value), value)
+            value_index = self._values.setdefault(value_key, len(self._values))
+            tags.extend((key_index, value_index))
+        return tags
+
+    def add_feature(self, geometry_type: int, parts: Sequence[np.ndarray], properties=None, feature_id=None):
+        commands = _geometry(geometry_type, parts)
+        if not commands:
+            return
+        data = b""
+        if feature_id is not None:
+            data += _uint_field(1, int(feature_id))
+        tags = self._tags(properties or {})
+        if tags:
+            data += _packed(2, tags)
+        data += _uint_field(3, geometry_type)
+        data += _packed(4, commands)
+        self._features.append(data)
+
+    def encode(self) -> bytes:
+        data = _uint_field(15, 2)  # version
+        data += _bytes_field(1, self.name.encode("utf-8"))
+        for feature in self._features:
+            data += _bytes_field(2, feature)
+        for key in self._keys:
+            data += _bytes_field(3, key.encode("utf-8"))
+        for _, value in self._values:
+            data += _bytes_field(4, _encode_value(value))
+        data += _uint_field(5, self.extent)
+        return data
+
+
+def encode_tile(layers: Iterable[Layer]) -> bytes:
+    """
+    Serializes a tile; empty layers are left out.
+    """
+    return b"".join(_bytes_field(3, layer.encode()) for layer in layers if len(layer))
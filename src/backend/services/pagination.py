@@ -0,0 +1,105 @@
+import base64
+import json
+from typing import Optional, List, Tuple, Any
+
+from google.cloud.firestore_v1.field_path import FieldPath
+
+
+DOCUMENT_ID = FieldPath.document_id()  # "__name__"
+
+CURSOR_NEXT = "next"
+CURSOR_PREV = "prev"
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised when a cursor token is malformed or does not match the query's order.
+    """
+
+
+def encode_cursor(values: List[Any], direction: str = CURSOR_NEXT) -> str:
+    """
+    Encodes the order key values of a document into an opaque cursor token.
+    """
+    payload = json.dumps({"v": values, "d": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[List[Any], str]:
+    """
+    Decodes a cursor token produced by encode_cursor.
+    Raises InvalidCursor if the token is malformed.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        values = payload["v"]
+        direction = payload.get("d", CURSOR_NEXT)
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {token}") from e
+
+    if not isinstance(values, list) or direction not in (CURSOR_NEXT, CURSOR_PREV):
+        raise InvalidCursor(f"Invalid cursor: {token}")
+
+    return values, direction
+
+
+def cursor_values(snapshot, order_fields: List[str]) -> List[Any]:
+    """
+    Extracts the values of the order fields from a document snapshot.
+    """
+    data = snapshot.to_dict() or {}
+    return [snapshot.id if field == DOCUMENT_ID else data.get(field) for field in order_fields]
+
+
+def paginate(
+    query,
+    order_fields: List[str],
+    page: int,
+    page_size: int,
+    cursor: Optional[str] = None,
+) -> Tuple[list, bool, Optional[str], Optional[str]]:
+    """
+    Runs a query page using keyset pagination (start_after/end_before) when a
+    cursor is given, or offset pagination for the legacy `page` parameter.
+
+    The query must already be ordered by `order_fields`, and those fields must
+    uniquely identify a document (include DOCUMENT_ID as a tie-breaker otherwise).
+
+    Returns a tuple: (snapshots, has_more, next_cursor, prev_cursor)
+    """
+    # Fetches one extra document to know whether there is another page
+    if cursor:
+        values, direction = decode_cursor(cursor)
+        if len(values) != len(order_fields):
+            raise InvalidCursor(f"Invalid cursor: {cursor}")
+        key = dict(zip(order_fields, values))
+
+        if direction == CURSOR_PREV:
+            snapshots = list(query.end_before(key).limit_to_last(page_size + 1).get())
+            has_prev = len(snapshots) > page_size
+            snapshots = snapshots[-page_size:]
+            has_more = True
+        else:
+            snapshots = list(query.start_after(key).limit(page_size + 1).stream())
+            has_more = len(snapshots) > page_size
+            snapshots = snapshots[:page_size]
+            has_prev = True
+    else:
+        offset = (page - 1) * page_size
+        if offset:
+            query = query.offset(offset)
+        snapshots = list(query.limit(page_size + 1).stream())
+        has_more = len(snapshots) > page_size
+        snapshots = snapshots[:page_size]
+        has_prev = page > 1
+
+    next_cursor = None
+    prev_cursor = None
+    if snapshots:
+        if has_more:
+            next_cursor = encode_cursor(cursor_values(snapshots[-1], order_fields))
+        if has_prev:
+            prev_cursor = encode_cursor(cursor_values(snapshots[0], order_fields), CURSOR_PREV)
+
+    return snapshots, has_more, next_cursor, prev_cursor
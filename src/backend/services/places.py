@@ -0,0 +1,150 @@
+import heapq
+import json
+import math
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import PLACES_JSON_PATH, PLACES_GRID_CELL, PLACES_GRID_MAX_CELLS
+
+
+def _points_in_polygon(lons: np.ndarray, lats: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """
+    Vectorized ray casting (even-odd rule), same as ReverseGeocoding.IsPointInQuadrilateral
+    in the Unity client, for many points against one polygon of [lon, lat] vertices.
+    """
+    inside = np.zeros(lons.shape, dtype=bool)
+    xi, yi = polygon[:, 0], polygon[:, 1]
+    xj, yj = np.roll(xi, 1), np.roll(yi, 1)
+    for x1, y1, x2, y2 in zip(xi, yi, xj, yj):
+        crosses = (y1 > lats) != (y2 > lats)
+        if not crosses.any():
+            continue
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_at = (x2 - x1) * (lats - y1) / (y2 - y1) + x1
+        inside ^= crosses & (lons < x_at)
+    return inside
+
+
+def _point_in_polygon(lon: float, lat: float, vertices: Sequence[Tuple[float, float]]) -> bool:
+    # Scalar version of _points_in_polygon; cheaper than NumPy for a single point
+    inside = False
+    x2, y2 = vertices[-1]
+    for x1, y1 in vertices:
+        if (y1 > lat) != (y2 > lat) and lon < (x2 - x1) * (lat - y1) / (y2 - y1) + x1:
+            inside = not inside
+        x2, y2 = x1, y1
+    return inside
+
+
+class PlaceIndex:
+    """
+    Point-in-polygon index over the places produced by scripts/kml_to_json.py.
+
+    Bounding boxes are precomputed and polygons are registered in a uniform
+    lat/lon grid, so a lookup only ray-casts the few polygons whose box
+    contains the point. When polygons overlap, the first one in the file wins
+    (as in the Unity client).
+    """
+
+    def __init__(self, places: Sequence[Dict], cell_size: float = PLACES_GRID_CELL):
+        self.cell_size = cell_size
+        self.names: List[str] = []
+        self.polygons: List[np.ndarray] = []  # (n, 2) arrays of [lon, lat]
+        for place in places:
+            points = place.get("points") or []
+            if len(points) < 3:
+                continue
+            self.names.append(place["name"])
+            self.polygons.append(np.array([[p["lon"], p["lat"]] for p in points], dtype=np.float64))
+        self.vertices = [[tuple(v) for v in polygon.tolist()] for polygon in self.polygons]
+
+        if self.polygons:
+            self.bboxes = np.array(
+                [[poly[:, 0].min(), poly[:, 1].min(), poly[:, 0].max(), poly[:, 1].max()] for poly in self.polygons]
+            )
+        else:
+            self.bboxes = np.empty((0, 4))
+
+        # Grid cell -> indexes of the polygons whose bounding box touches it.
+        # Polygons whose box spans more than PLACES_GRID_MAX_CELLS cells are
+        # kept in `oversized` instead and checked on every lookup
+        self.grid: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self.oversized: List[int] = []
+        for index, (min_lon, min_lat, max_lon, max_lat) in enumerate(self.bboxes):
+            cells_x = self._cell(max_lon) - self._cell(min_lon) + 1
+            cells_y = self._cell(max_lat) - self._cell(min_lat) + 1
+            if cells_x * cells_y > PLACES_GRID_MAX_CELLS:
+                self.oversized.append(index)
+                continue
+            for cx in range(self._cell(min_lon), self._cell(max_lon) + 1):
+                for cy in range(self._cell(min_lat), self._cell(max_lat) + 1):
+                    self.grid[(cx, cy)].append(index)
+
+    @classmethod
+    def from_file(cls, path=PLACES_JSON_PATH) -> "PlaceIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _cell(self, value: float) -> int:
+        return math.floor(value / self.cell_size)
+
+    def __len__(self):
+        return len(self.names)
+
+    def lookup(self, lat: float, lon: float) -> Optional[str]:
+        """
+        Name of the place containing the point, or None (also for NaN or
+        infinite coordinates).
+        """
+        if not (math.isfinite(lat) and math.isfinite(lon)):
+            return None
+        candidates = self.grid.get((self._cell(lon), self._cell(lat)), ())
+        if self.oversized:
+            # Both lists are in file order, so the first match still wins
+            candidates = heapq.merge(candidates, self.oversized)
+        for index in candidates:
+            min_lon, min_lat, max_lon, max_lat = self.bboxes[index]
+            if not (min_lon <= lon <= max_lon and min_lat <= lat <= max_lat):
+                continue
+            if _point_in_polygon(lon, lat, self.vertices[index]):
+                return self.names[index]
+        return None
+
+    def lookup_many(self, lats: Sequence[float], lons: Sequence[float]) -> List[Optional[str]]:
+        """
+        Names of the places containing each point (None where there is none),
+        computed polygon by polygon over all points at once.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        result = np.full(lats.shape, -1, dtype=np.int64)
+
+        for index, (min_lon, min_lat, max_lon, max_lat) in enumerate(self.bboxes):
+            candidates = np.flatnonzero(
+                (result < 0) & (lons >= min_lon) & (lons <= max_lon) & (lats >= min_lat) & (lats <= max_lat)
+            )
+            if candidates.size == 0:
+                continue
+            inside = _points_in_polygon(lons[candidates], lats[candidates], self.polygons[index])
+            result[candidates[inside]] = index
+
+        return [self.names[i] if i >= 0 else None for i in result.tolist()]
+
+
+_index: Optional[PlaceIndex] = None
+_lock = threading.Lock()
+
+
+def get_place_index() -> PlaceIndex:
+    """
+    Shared PlaceIndex, loaded from PLACES_JSON_PATH on first use.
+    """
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = PlaceIndex.from_file()
+    return _index
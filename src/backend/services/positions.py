@@ -0,0 +1,210 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config import POSITIONS_FULL_RELOAD, POSITIONS_MAX_OIDS, POSITIONS_REFRESH_INTERVAL
+from services.tracks import load_positions
+from services.versions import get_version, telemetria_version_name
+
+# Maximum number of animals per request and of time steps of a range request
+MAX_POSITION_OIDS = 50
+MAX_POSITION_STEPS = 10000
+
+
+class OidPositions:
+    """
+    Positions of one animal as arrays sorted by date, interpolated with
+    binary search (np.searchsorted / np.interp) over all requested times at once.
+
+    The arrays are replaced as a whole on every merge, so readers always see
+    a consistent snapshot without locking.
+    """
+
+    def __init__(self, dates: np.ndarray, lats: np.ndarray, lons: np.ndarray, version: int, now: float):
+        self.version = version
+        self.loaded_at = now
+        self.checked_at = now
+        self.lock = threading.Lock()
+        self._set(dates, lats, lons)
+
+    def _set(self, dates, lats, lons):
+        # Longitudes are unwrapped so crossing the antimeridian interpolates the short way
+        unwrapped = np.degrees(np.unwrap(np.radians(lons))) if len(lons) else lons
+        self.data = (dates.astype(np.float64), lats, lons, unwrapped)
+
+    def __len__(self):
+        return len(self.data[0])
+
+    @property
+    def last_date(self) -> Optional[int]:
+        dates = self.data[0]
+        return int(dates[-1]) if len(dates) else None
+
+    def merge(self, dates: np.ndarray, lats: np.ndarray, lons: np.ndarray):
+        """
+        Adds newer positions. Positions with an already known date replace it.
+        """
+        if not len(dates):
+            return
+        old_dates, old_lats, old_lons, _ = self.data
+        if not len(old_dates) or dates[0] > old_dates[-1]:
+            self._set(
+                np.concatenate([old_dates, dates]),
+                np.concatenate([old_lats, lats]),
+                np.concatenate([old_lons, lons]),
+            )
+            return
+        all_dates = np.concatenate([old_dates, dates])
+        # Keeps the last occurrence of each date (the newly loaded one)
+        _, last = np.unique(all_dates[::-1], return_index=True)
+        keep = len(all_dates) - 1 - last
+        self._set(all_dates[keep], np.concatenate([old_lats, lats])[keep], np.concatenate([old_lons, lons])[keep])
+
+    def interpolate(self, times: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Positions at `times` (seconds). `valid` is False outside the tracked
+        period; `gap` is the time between the two fixes used (0 on a fix).
+        """
+        dates, lats, lons, unwrapped = self.data
+        times = np.asarray(times, dtype=np.float64)
+        if not len(dates):
+            empty = np.full(times.shape, np.nan)
+            return {"lat": empty, "lon": empty, "gap": empty, "valid": np.zeros(times.shape, dtype=bool)}
+
+        valid = (times >= dates[0]) & (times <= dates[-1])
+        lat = np.interp(times, dates, lats)
+        lon = (np.interp(times, dates, unwrapped) + 180.0) % 360.0 - 180.0
+
+        last = len(dates) - 1
+        on_fix = dates[np.clip(np.searchsorted(dates, times), 0, last)] == times
+        if last == 0:
+            gap = np.where(on_fix, 0.0, np.nan)
+        else:
+            after = np.clip(np.searchsorted(dates, times, side="right"), 1, last)
+            gap = np.where(on_fix, 0.0, dates[after] - dates[after - 1])
+        return {"lat": lat, "lon": lon, "gap": gap, "valid": valid}
+
+
+class PositionIndex:
+    """
+    In-memory positions of the most recently requested animals (LRU, up to
+    `max_oids`), loaded on first use.
+
+    At most every `refresh_interval` seconds the animal's telemetry version
+    (bumped by the import script) is checked; when it changed, only the
+    records dated after the last known one are read and merged. Every
+    `full_reload` seconds the animal is reloaded from scratch, which also
+    picks up records imported out of date order.
+    """
+
+    def __init__(
+        self,
+        max_oids: int = POSITIONS_MAX_OIDS,
+        refresh_interval: float = POSITIONS_REFRESH_INTERVAL,
+        full_reload: float = POSITIONS_FULL_RELOAD,
+    ):
+        self.max_oids = max_oids
+        self.refresh_interval = refresh_interval
+        self.full_reload = full_reload
+        self._tracks: "OrderedDict[str, OidPositions]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.refreshes = 0
+
+    def get(self, oid: str, now: Optional[float] = None) -> OidPositions:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            track = self._tracks.get(oid)
+            if track is not None:
+                self._tracks.move_to_end(oid)
+
+        if track is None or now - track.loaded_at >= self.full_reload:
+            # The version is read first: an import racing with the load is seen on the next check
+            version = get_version(telemetria_version_name(oid))
+            track = OidPositions(*load_positions(oid), version=version, now=now)
+            with self._lock:
+                self.loads += 1
+                self._tracks[oid] = track
+                self._tracks.move_to_end(oid)
+                while len(self._tracks) > self.max_oids:
+                    self._tracks.popitem(last=False)
+            return track
+
+        if now - track.checked_at >= self.refresh_interval:
+            with track.lock:
+                if now - track.checked_at >= self.refresh_interval:
+                    version = get_version(telemetria_version_name(oid))
+                    if version != track.version:
+                        track.merge(*load_positions(oid, after=track.last_date))
+                        track.version = version
+                        self.refreshes += 1
+                    track.checked_at = now
+        return track
+
+    def clear(self):
+        with self._lock:
+            self._tracks.clear()
+            self.loads = self.refreshes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "oids": len(self._tracks),
+                "max_oids": self.max_oids,
+                "positions": sum(len(track) for track in self._tracks.values()),
+                "loads": self.loads,
+                "refreshes": self.refreshes,
+            }
+
+
+position_index = PositionIndex()
+
+
+def _value(value: float, valid: bool) -> Optional[float]:
+    return float(value) if valid else None
+
+
+def positions_at(oids: Sequence[str], t: float) -> List[Dict[str, Any]]:
+    """
+    Interpolated position of each animal at time `t`; lat/lon are None
+    outside the period covered by its telemetry.
+    """
+    positions = []
+    for oid in oids:
+        result = position_index.get(oid).interpolate(np.array([t]))
+        valid = bool(result["valid"][0])
+        positions.append(
+            {
+                "oid": oid,
+                "lat": _value(result["lat"][0], valid),
+                "lon": _value(result["lon"][0], valid),
+                "gap": _value(result["gap"][0], valid),
+            }
+        )
+    return positions
+
+
+def positions_between(oids: Sequence[str], start: float, end: float, step: float) -> Dict[str, Any]:
+    """
+    Positions of each animal every `step` seconds from `start` to `end`.
+    Raises ValueError if the window is invalid or has too many steps.
+    """
+    if step <= 0 or end < start:
+        raise ValueError("end must not be before start and step must be positive")
+    steps = int((end - start) // step) + 1
+    if steps > MAX_POSITION_STEPS:
+        raise ValueError(f"At most {MAX_POSITION_STEPS} steps per request")
+
+    times = start + np.arange(steps) * step
+    tracks = {}
+    for oid in oids:
+        result = position_index.get(oid).interpolate(times)
+        valid = result["valid"].tolist()
+        tracks[oid] = {
+            "lat": [lat if ok else None for lat, ok in zip(result["lat"].tolist(), valid)],
+            "lon": [lon if ok else None for lon, ok in zip(result["lon"].tolist(), valid)],
+        }
+    return {"times": times.tolist(), "tracks": tracks}
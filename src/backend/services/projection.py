@@ -0,0 +1,47 @@
+"""
+Field projections (`fields=` parameter): the requested fields become a
+Firestore select(), so only they are read from Firestore and sent to clients.
+"""
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from services.pagination import DOCUMENT_ID
+
+# Top-level field names only (the documents have no nested maps)
+FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+MAX_FIELDS = 64
+
+Fields = Tuple[str, ...]
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Fields]:
+    """
+    Field names of a `fields` parameter ("registro,local"), sorted and without
+    repetitions, or None (every field) if it is missing or empty.
+    Raises ValueError on an invalid name.
+    """
+    if not fields or not fields.strip():
+        return None
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    if len(names) > MAX_FIELDS or not all(FIELD_NAME.match(name) for name in names):
+        raise ValueError(f"Invalid fields: {fields}")
+    return tuple(sorted(names)) or None
+
+
+def select_fields(fields: Optional[Fields], required: Iterable[str] = ()) -> Optional[List[str]]:
+    """
+    Fields to select(): `fields` plus the ones the query itself needs (order
+    keys for the cursors, coordinates for spatial filters), or None for all.
+    """
+    if fields is None:
+        return None
+    return sorted(set(fields) | {field for field in required if field != DOCUMENT_ID})
+
+
+def project(data: Dict[str, Any], fields: Optional[Fields]) -> Dict[str, Any]:
+    """
+    Copy of `data` with only `fields` (all of them if None).
+    """
+    if fields is None:
+        return dict(data)
+    return {field: data[field] for field in fields if field in data}
@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from config import QUERY_CACHE_SIZE, QUERY_CACHE_TTL
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: while `do(key, fn)` runs for a key,
+    other callers with the same key wait for it and share its result (or
+    exception) instead of calling `fn` themselves.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def clear(self):
+        with self._lock:
+            self.calls = self.coalesced = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.calls + self.coalesced
+            return {
+                "in_flight": len(self._calls),
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "coalesced_ratio": self.coalesced / total if total else 0.0,
+            }
+
+
+class QueryCache:
+    """
+    Bounded LRU cache of query results, each served for at most `ttl` seconds.
+
+    `invalidate()` drops every entry and starts a new generation; a result
+    loaded while an invalidation happened is not stored, so a query that raced
+    with a write can never be cached after it.
+
+    Concurrent misses of the same key (in the same generation) share one load.
+    """
+
+    def __init__(self, name: str, maxsize: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.flight = SingleFlight(name)
+
+    def get(self, key: Hashable, now: Optional[float] = None) -> Optional[Any]:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any, generation: int, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if generation != self.generation or self.maxsize <= 0:
+                return
+            self._entries[key] = (value, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        """
+        Cached value of `key`, or the result of `load()` (then cached).
+        """
+        value = self.get(key)
+        if value is None:
+            generation = self.generation
+
+            def load_and_put():
+                loaded = load()
+                self.put(key, loaded, generation)
+                return loaded
+
+            # Callers arriving after an invalidation start a load of their own
+            value = self.flight.do((generation, key), load_and_put)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+        self.flight.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "coalesced": self.flight.coalesced,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+# One cache per list endpoint
+avistamentos_cache = QueryCache("avistamentos")
+telemetria_cache = QueryCache("telemetria")
+
+# Counts are not cached, only coalesced (keyed with the generation of the
+# list cache of the same collection, so they restart after a write)
+avistamentos_count_flight = SingleFlight("avistamentos_count")
+telemetria_count_flight = SingleFlight("telemetria_count")
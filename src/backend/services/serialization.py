@@ -0,0 +1,112 @@
+"""
+Serialization of the API responses: JSON encoded with orjson, or MessagePack
+when the client asks for it (`Accept: application/msgpack` or
+`?format=msgpack`). Firestore and NumPy values are converted by one `default`
+hook shared by both encoders.
+"""
+import datetime
+from typing import Any, Dict, Optional
+
+import msgpack
+import numpy as np
+import orjson
+from fastapi.responses import JSONResponse, Response
+from google.cloud.firestore_v1 import DocumentReference, GeoPoint
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def default(value: Any) -> Any:
+    """
+    Plain equivalent of the values neither encoder handles natively:
+    - timestamps (Firestore returns a datetime subclass): ISO 8601 string
+    - GeoPoint: {"latitude", "longitude"}
+    - DocumentReference: document path
+    - NumPy scalars and arrays: Python numbers and lists
+    """
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, GeoPoint):
+        return {"latitude": value.latitude, "longitude": value.longitude}
+    if isinstance(value, DocumentReference):
+        return value.path
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type is not serializable: {type(value).__name__}")
+
+
+def dumps_json(content: Any) -> bytes:
+    return orjson.dumps(content, default=default, option=JSON_OPTIONS)
+
+
+def dumps_msgpack(content: Any) -> bytes:
+    return msgpack.packb(content, default=default, use_bin_type=True)
+
+
+class APIResponse(JSONResponse):
+    """
+    JSONResponse encoded with orjson; default response class of the app.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return dumps_msgpack(content)
+
+
+def wants_msgpack(accept: Optional[str], format: Optional[str] = None) -> bool:
+    if format is not None:
+        return format == "msgpack"
+    return bool(accept) and any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+def is_api_request(format: Optional[str], accept: Optional[str]) -> bool:
+    """
+    True if the client asked for data (JSON or MessagePack) instead of HTML:
+    ?format=json|msgpack, or an Accept with one of those and not text/html.
+    """
+    if format in ("json", "msgpack"):
+        return True
+    return bool(accept) and (
+        "application/json" in accept or wants_msgpack(accept)
+    ) and "text/html" not in accept
+
+
+def response_format(format: Optional[str], accept: Optional[str]) -> str:
+    """
+    Representation a request gets: "msgpack", "json" or "html".
+    """
+    if not is_api_request(format, accept):
+        return "html"
+    return "msgpack" if wants_msgpack(accept, format) else "json"
+
+
+def api_response(
+    content: Any,
+    accept: Optional[str] = None,
+    format: Optional[str] = None,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+    media_type: Optional[str] = None,
+) -> Response:
+    """
+    `content` as MessagePack if the client asked for it, otherwise as JSON
+    (with `media_type`, e.g. application/geo+json). The body depends on the
+    Accept header, so responses carry Vary: Accept.
+    """
+    headers = {**(headers or {}), "Vary": "Accept"}
+    if wants_msgpack(accept, format):
+        return MsgPackResponse(content, status_code=status_code, headers=headers)
+    return APIResponse(content, status_code=status_code, headers=headers, media_type=media_type)
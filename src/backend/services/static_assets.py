@@ -0,0 +1,67 @@
+"""
+Fingerprinted static files: templates link to `static_url("/styles.css")`,
+which adds a hash of the file contents (`/static/styles.css?v=<hash>`).
+Requests carrying the current hash are served with a long-lived immutable
+Cache-Control; a changed file gets a new URL, so browsers never use a stale copy.
+"""
+import hashlib
+import os
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi.staticfiles import StaticFiles
+
+from config import STATIC_DIR, STATIC_MAX_AGE
+
+STATIC_PREFIX = "/static"
+IMMUTABLE = f"public, max-age={STATIC_MAX_AGE}, immutable"
+
+# path -> (mtime_ns, size, hash); rehashed when the file changes
+_fingerprints: Dict[str, Tuple[int, int, str]] = {}
+_lock = threading.Lock()
+
+
+def fingerprint(full_path: str) -> Optional[str]:
+    """
+    Short hash of the contents of `full_path`, or None if it is not a file.
+    """
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        return None
+    entry = _fingerprints.get(full_path)
+    if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+        return entry[2]
+    with open(full_path, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:12]
+    with _lock:
+        _fingerprints[full_path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def static_url(path: str, directory: str = STATIC_DIR) -> str:
+    """
+    URL of the static file `path` (relative to the static directory), with its fingerprint.
+    """
+    path = path.lstrip("/")
+    digest = fingerprint(os.path.join(directory, path))
+    url = f"{STATIC_PREFIX}/{path}"
+    return f"{url}?v={digest}" if digest else url
+
+
+class FingerprintedStaticFiles(StaticFiles):
+    """
+    StaticFiles that marks responses as immutable when the URL carries the
+    current fingerprint of the file. Other requests keep the default
+    (revalidated with ETag/Last-Modified).
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        requested = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("v")
+        if requested and requested[0] == fingerprint(str(full_path)):
+            response.headers["Cache-Control"] = IMMUTABLE
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
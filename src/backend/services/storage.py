@@ -1,25 +1,151 @@
 import datetime
-from google.cloud import storage
-from config import GCP_BUCKET_NAME
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
 
-def generate_signed_url(blob_name: str, expiration=3600) -> str:
+from config import (
+    GCP_BUCKET_NAME,
+    SIGNED_URL_CACHE_SIZE,
+    SIGNED_URL_EXPIRY_BUCKET,
+    SIGNED_URL_MIN_REMAINING,
+)
+from database import registry
+
+
+class SignedUrlCache:
     """
-    Generates a v4 signed URL for a blob.
-    
-    :param blob_name: The name of the blob (file) in the bucket.
-    :param expiration: Expiration time in seconds (default 1 hour).
-    :return: The signed URL.
+    Bounded LRU cache of signed URLs.
+
+    Expiry times are rounded up to a bucket boundary, so every URL signed for a
+    blob within the same bucket is identical. A cached URL is returned while it
+    still has at least `min_remaining` seconds of validity; otherwise it is
+    signed again.
     """
-    storage_client = storage.Client.from_service_account_json('./serviceAccountKey.json')
-    bucket = storage_client.bucket(GCP_BUCKET_NAME)
-    blob = bucket.blob(blob_name)
 
-    url = blob.generate_signed_url(
+    def __init__(
+        self,
+        maxsize: int = SIGNED_URL_CACHE_SIZE,
+        bucket_seconds: int = SIGNED_URL_EXPIRY_BUCKET,
+        min_remaining: int = SIGNED_URL_MIN_REMAINING,
+    ):
+        self.maxsize = maxsize
+        self.bucket_seconds = bucket_seconds
+        self.min_remaining = min_remaining
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def expires_at(self, expiration: int, now: Optional[float] = None) -> int:
+        """
+        Absolute expiry (epoch seconds) for a URL valid at least `expiration` seconds.
+        """
+        now = time.time() if now is None else now
+        target = int(now) + expiration
+        return -(-target // self.bucket_seconds) * self.bucket_seconds
+
+    def get(self, blob_name: str, expiration: int, now: Optional[float] = None) -> Optional[str]:
+        now = time.time() if now is None else now
+        key = (blob_name, expiration)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] - now >= min(self.min_remaining, expiration):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def put(self, blob_name: str, expiration: int, url: str, expires_at: int):
+        key = (blob_name, expiration)
+        with self._lock:
+            self._entries[key] = (url, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+signed_url_cache = SignedUrlCache()
+
+
+def signed_url_window(now: Optional[float] = None) -> int:
+    """
+    Index of the current SIGNED_URL_MIN_REMAINING-long time window. Responses
+    that embed signed URLs put it in their ETag, so a URL is never revalidated
+    after the window it was served in (it is still valid until then).
+    """
+    now = time.time() if now is None else now
+    return int(now) // SIGNED_URL_MIN_REMAINING
+
+
+def _sign(bucket, blob_name: str, expires_at: int) -> str:
+    blob = bucket.blob(blob_name)
+    return blob.generate_signed_url(
         version="v4",
-        # This URL is valid for 1 hour
-        expiration=datetime.timedelta(seconds=expiration),
+        expiration=datetime.datetime.fromtimestamp(expires_at, tz=datetime.timezone.utc),
         # Allow GET requests using this URL.
         method="GET",
     )
 
-    return url
+
+def generate_signed_url(blob_name: str, expiration=3600) -> str:
+    """
+    Generates a v4 signed URL for a blob.
+
+    URLs are cached (see SignedUrlCache), so repeated calls for the same blob
+    return the same URL until it gets close to its expiry.
+
+    :param blob_name: The name of the blob (file) in the bucket.
+    :param expiration: Minimum validity in seconds (default 1 hour).
+    :return: The signed URL.
+    """
+    return generate_signed_urls([blob_name], expiration)[blob_name]
+
+
+def generate_signed_urls(blob_names: Iterable[str], expiration=3600) -> Dict[str, str]:
+    """
+    Generates v4 signed URLs for several blobs at once (e.g. list thumbnails).
+
+    :param blob_names: The names of the blobs (files) in the bucket.
+    :param expiration: Minimum validity in seconds (default 1 hour).
+    :return: A dict mapping each blob name to its signed URL.
+    """
+    now = time.time()
+    urls = {}
+    missing = []
+    for blob_name in dict.fromkeys(blob_names):
+        url = signed_url_cache.get(blob_name, expiration, now)
+        if url is None:
+            missing.append(blob_name)
+        else:
+            urls[blob_name] = url
+
+    if missing:
+        bucket = registry.storage.bucket(GCP_BUCKET_NAME)
+        expires_at = signed_url_cache.expires_at(expiration, now)
+        for blob_name in missing:
+            url = _sign(bucket, blob_name, expires_at)
+            signed_url_cache.put(blob_name, expiration, url, expires_at)
+            urls[blob_name] = url
+
+    return urls
@@ -0,0 +1,271 @@
+"""
+Delta sync of the Unity client.
+
+Sighting and telemetry documents carry an `updated_at` server timestamp,
+set by the write handlers (services/avistamentos.py) and the import
+scripts; deleted sightings leave a tombstone in `avistamentos_removidos`.
+`sync_changes(since)` returns the documents written after a watermark, read
+in (updated_at, document id) order, and the watermark to send next time.
+
+The initial state comes from the snapshot bundle built by `build_bundle`
+(scripts/build_sync_bundle.py): one gzipped MessagePack file with every
+sighting, the places and the recent telemetry as packed little-endian
+columns, plus the watermark it was taken at.
+"""
+import base64
+import datetime
+import gzip
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import msgpack
+import numpy as np
+from google.cloud import firestore
+
+from config import PLACES_JSON_PATH, SYNC_BUNDLE_PATH, SYNC_PAGE_SIZE, SYNC_TELEMETRY_DAYS
+from database import db
+from services.avistamentos import TOMBSTONES
+from services.counters import DAY
+from services.pagination import DOCUMENT_ID
+from services.serialization import default
+from services.versions import AVISTAMENTOS_VERSION, VERSIONS_COLLECTION
+
+BUNDLE_FORMAT = 1
+
+# Collections read by the delta sync, in watermark order
+SYNC_COLLECTIONS = ("avistamentos", TOMBSTONES, "telemetria")
+
+# Telemetry fields sent to the client; the bundle keeps them as columns
+TELEMETRIA_FIELDS = ["oid", "date", "latitude", "longitude"]
+
+# Column dtypes of the bundle's telemetry (little-endian, readable in place)
+TELEMETRIA_DTYPES = {"oid_index": "<u4", "date": "<i8", "latitude": "<f8", "longitude": "<f8"}
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Position of a collection in the watermark: (updated_at, document id) of the
+# last document sent, or (updated_at, None) for "from that instant on"
+Mark = Tuple[Optional[datetime.datetime], Optional[str]]
+
+
+def _to_micros(value: datetime.datetime) -> int:
+    return (value - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def _from_micros(micros: int) -> datetime.datetime:
+    return EPOCH + datetime.timedelta(microseconds=micros)
+
+
+def encode_watermark(marks: Dict[str, Mark], places: Optional[int]) -> str:
+    """
+    Encodes the per-collection marks and the places file version (mtime in
+    ns) into an opaque token, like the pagination cursors.
+    """
+    payload = {
+        "m": {
+            name: None if ts is None else [_to_micros(ts), doc_id]
+            for name, (ts, doc_id) in marks.items()
+        },
+        "p": places,
+    }
+    data = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_watermark(token: str) -> Tuple[Dict[str, Mark], Optional[int]]:
+    """
+    Decodes a token produced by encode_watermark.
+    Raises ValueError if the token is malformed.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        marks = {}
+        for name in SYNC_COLLECTIONS:
+            mark = payload["m"][name]
+            if mark is None:
+                marks[name] = (None, None)
+                continue
+            micros, doc_id = mark
+            if not isinstance(micros, int) or not (doc_id is None or isinstance(doc_id, str)):
+                raise TypeError(mark)
+            marks[name] = (_from_micros(micros), doc_id)
+        places = payload["p"]
+        if places is not None and not isinstance(places, int):
+            raise TypeError(places)
+    except (ValueError, KeyError, TypeError, OverflowError) as e:
+        raise ValueError(f"Invalid watermark: {token}") from e
+    return marks, places
+
+
+def places_version() -> Optional[int]:
+    """
+    mtime (ns) of the places file, or None if there is none.
+    """
+    try:
+        return os.stat(PLACES_JSON_PATH).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _load_places() -> Optional[list]:
+    try:
+        with open(PLACES_JSON_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except OSError:
+        return None
+
+
+def telemetria_cutoff(now: Optional[float] = None) -> Optional[int]:
+    """
+    First telemetry date (start of a UTC day) sent to the client, or None
+    to send all of it.
+    """
+    if SYNC_TELEMETRY_DAYS <= 0:
+        return None
+    today = int(time.time() if now is None else now) // DAY
+    return (today - SYNC_TELEMETRY_DAYS) * DAY
+
+
+def _changes(collection: str, mark: Mark, limit: int, fields: Optional[List[str]] = None):
+    """
+    Documents of `collection` written after `mark`, oldest first.
+    Returns (snapshots, next mark, has_more).
+    """
+    query = db.collection(collection).order_by("updated_at").order_by(DOCUMENT_ID)
+    if fields is not None:
+        query = query.select(fields)
+    ts, doc_id = mark
+    if ts is not None:
+        if doc_id is None:
+            query = query.where(filter=firestore.FieldFilter("updated_at", ">=", ts))
+        else:
+            query = query.start_after({"updated_at": ts, DOCUMENT_ID: doc_id})
+
+    snapshots = list(query.limit(limit + 1).stream())
+    has_more = len(snapshots) > limit
+    snapshots = snapshots[:limit]
+    if snapshots:
+        last = snapshots[-1]
+        mark = ((last.to_dict() or {}).get("updated_at"), last.id)
+    return snapshots, mark, has_more
+
+
+def sync_changes(since: str, limit: int = SYNC_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    Changes after the watermark `since`, at most `limit` documents per
+    collection. While `has_more` is true the client calls again with the
+    returned watermark.
+
+    Deleted sightings come as {registro, updated_at}; a sighting recreated
+    after its deletion may appear in both lists, and the newest updated_at
+    wins. Telemetry is limited to the last SYNC_TELEMETRY_DAYS days. `places`
+    is only sent when places.json changed.
+
+    Raises ValueError if `since` is not a valid watermark.
+    """
+    marks, places_mark = decode_watermark(since)
+
+    sightings, marks["avistamentos"], more_sightings = _changes("avistamentos", marks["avistamentos"], limit)
+    removed, marks[TOMBSTONES], more_removed = _changes(TOMBSTONES, marks[TOMBSTONES], limit, ["updated_at"])
+    telemetry, marks["telemetria"], more_telemetry = _changes(
+        "telemetria", marks["telemetria"], limit, TELEMETRIA_FIELDS + ["updated_at"]
+    )
+
+    cutoff = telemetria_cutoff()
+    telemetry_items = []
+    for snapshot in telemetry:
+        data = snapshot.to_dict() or {}
+        if cutoff is None or int(data.get("date") or 0) >= cutoff:
+            telemetry_items.append({**data, "id": snapshot.id})
+
+    current_places = places_version()
+    places = _load_places() if current_places != places_mark else None
+
+    return {
+        "watermark": encode_watermark(marks, current_places),
+        "has_more": more_sightings or more_removed or more_telemetry,
+        "avistamentos": {
+            "changed": [snapshot.to_dict() for snapshot in sightings],
+            "deleted": [
+                {"registro": snapshot.id, "updated_at": (snapshot.to_dict() or {}).get("updated_at")}
+                for snapshot in removed
+            ],
+        },
+        "telemetria": {"changed": telemetry_items},
+        "places": places,
+    }
+
+
+def _telemetria_columns(snapshots) -> Dict[str, Any]:
+    """
+    Telemetry as columns: the oid table, and one little-endian array per
+    field (oid_index points into the table), stored as raw bytes.
+    """
+    oids: Dict[str, int] = {}
+    oid_index, dates, lats, lons = [], [], [], []
+    for snapshot in snapshots:
+        data = snapshot.to_dict() or {}
+        try:
+            row = (int(data["date"]), float(data["latitude"]), float(data["longitude"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+        oid_index.append(oids.setdefault(str(data.get("oid")), len(oids)))
+        dates.append(row[0])
+        lats.append(row[1])
+        lons.append(row[2])
+
+    columns = {"oid_index": oid_index, "date": dates, "latitude": lats, "longitude": lons}
+    return {
+        "count": len(dates),
+        "oids": list(oids),
+        "dtypes": TELEMETRIA_DTYPES,
+        "columns": {
+            name: np.asarray(values, dtype=TELEMETRIA_DTYPES[name]).tobytes() for name, values in columns.items()
+        },
+    }
+
+
+def build_bundle(path=SYNC_BUNDLE_PATH) -> Dict[str, int]:
+    """
+    Writes the snapshot bundle to `path` (atomically: temporary file +
+    os.replace) and returns its counts.
+
+    The watermark is the server read time taken before the collections are
+    streamed, so writes made while the bundle is built are sent again by the
+    first /sync (applying a document twice is harmless).
+    """
+    read_time = db.collection(VERSIONS_COLLECTION).document(AVISTAMENTOS_VERSION).get().read_time
+    places_mark = places_version()
+    watermark = encode_watermark({name: (read_time, None) for name in SYNC_COLLECTIONS}, places_mark)
+
+    sightings = [snapshot.to_dict() for snapshot in db.collection("avistamentos").stream()]
+
+    cutoff = telemetria_cutoff()
+    query = db.collection("telemetria").select(TELEMETRIA_FIELDS)
+    if cutoff is not None:
+        query = query.where(filter=firestore.FieldFilter("date", ">=", cutoff))
+    telemetry = _telemetria_columns(query.stream())
+
+    bundle = {
+        "format": BUNDLE_FORMAT,
+        "created_at": datetime.datetime.now(datetime.timezone.utc),
+        "watermark": watermark,
+        "avistamentos": sightings,
+        "places": _load_places(),
+        "telemetria_since": cutoff,
+        "telemetria": telemetry,
+    }
+    data = gzip.compress(msgpack.packb(bundle, default=default, use_bin_type=True))
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+    return {"avistamentos": len(sightings), "telemetria": telemetry["count"], "bytes": len(data)}
@@ -1,6 +1,43 @@
+import bisect
+import datetime
+import math
 from typing import Optional, List, Tuple, Dict, Any
 from google.cloud import firestore
+from config import TELEMETRIA_GEOHASH_PRECISION, TELEMETRIA_MAX_GEOHASH_RANGES
 from database import db
+from services import geohash
+from services.counters import count_telemetria_rollup, rollups_ready
+from services.export import encode, iter_chunks
+from services.pagination import CURSOR_PREV, InvalidCursor, decode_cursor, encode_cursor, paginate, DOCUMENT_ID
+from services.projection import Fields, project, select_fields
+from services.query_cache import telemetria_cache, telemetria_count_flight
+from services.telemetria_analytics import haversine
+from services.tracks import EARTH_RADIUS
+
+# Order key of the listing (document id breaks ties between equal dates)
+ORDER_FIELDS = ["date", DOCUMENT_ID]
+
+# Default projection of the HTML listing: the columns of telemetria/list.html
+LIST_FIELDS = ("oid", "title", "date", "latitude", "longitude", "notes")
+# Fields the spatial filters read besides the requested ones
+AREA_FIELDS = ("date", "latitude", "longitude")
+
+# Export columns (as written by scripts/import_telemetry_from_csv.py) and their Arrow types
+EXPORT_FIELDS = ["oid", "title", "date", "latitude", "longitude", "notes", "place"]
+EXPORT_TYPES = {"date": "int64", "latitude": "float64", "longitude": "float64"}
+
+# Spatial filters: bbox is (min_lon, min_lat, max_lon, max_lat) and near is
+# (lat, lon, radius in meters)
+BBox = Tuple[float, float, float, float]
+Near = Tuple[float, float, float]
+
+
+def telemetria_geohash(lat: float, lon: float) -> str:
+    """
+    Value of the `geohash` field of a telemetry document, used by the
+    bbox/near filters.
+    """
+    return geohash.encode(lat, lon, TELEMETRIA_GEOHASH_PRECISION)
 
 
 def query_telemetria(
@@ -9,28 +46,62 @@ def query_telemetria(
     oid: Optional[str] = None,
     date_start: Optional[int] = None,
     date_end: Optional[int] = None,
-) -> Tuple[List[Dict[str, Any]], int, int, bool]:
+    cursor: Optional[str] = None,
+    bbox: Optional[BBox] = None,
+    near: Optional[Near] = None,
+    fields: Optional[Fields] = None,
+) -> Tuple[List[Dict[str, Any]], int, int, bool, Optional[str], Optional[str]]:
     """
     Common function to query telemetry from Firestore with pagination and filters.
-    Returns a tuple: (items, page, page_size, has_more)
+
+    With `fields` (see services/projection.py) only those fields are read
+    from Firestore (plus the ones the query needs) and returned.
+
+    With `cursor` the page is read with start_after/end_before on the order key,
+    so deep pages cost the same as the first one. Without it, `page` (offset)
+    is used for compatibility.
+
+    With `bbox` or `near`, only the documents in a few geohash ranges around
+    the area are read (see _area_matches) and pages are cut from the matches.
+
+    Pages are kept in `telemetria_cache`, keyed by the normalized parameters.
+    Telemetry is only written by the import scripts, so entries just expire.
+
+    Returns a tuple: (items, page, page_size, has_more, next_cursor, prev_cursor)
     """
     # Sanitize parameters
     page = max(page, 1)
     page_size = max(min(page_size, 100), 1)
 
-    offset = (page - 1) * page_size
+    if bbox is not None or near is not None:
+        matches = _area_matches(oid, date_start, date_end, bbox, near, select_fields(fields, AREA_FIELDS))
+        rows, has_more, next_cursor, prev_cursor = _paginate_matches(matches, page, page_size, cursor)
+        return [project(data, fields) for _, data in rows], page, page_size, has_more, next_cursor, prev_cursor
 
-    query = _build_query(oid, date_start, date_end)
+    def load():
+        query = _build_query(oid, date_start, date_end)
+        if fields is not None:
+            query = query.select(select_fields(fields, ORDER_FIELDS))
+        docs, has_more, next_cursor, prev_cursor = paginate(
+            query, ORDER_FIELDS, page, page_size, cursor=cursor
+        )
+        return [doc.to_dict() for doc in docs], has_more, next_cursor, prev_cursor
 
-    query = query.offset(offset).limit(page_size)
+    key = (
+        page,
+        page_size,
+        oid,
+        None if date_start is None else int(date_start),
+        None if date_end is None else int(date_end),
+        cursor,
+        fields,
+    )
+    items, has_more, next_cursor, prev_cursor = telemetria_cache.get_or_load(key, load)
 
-    docs = query.stream()
+    # Copies: callers add display fields (date_str) to the items
+    items = [project(item, fields) for item in items]
 
-    items = [doc.to_dict() for doc in docs]
-
-    has_more = len(items) == page_size
-
-    return items, page, page_size, has_more
+    return items, page, page_size, has_more, next_cursor, prev_cursor
 
 
 def build_telemetria_url(
@@ -39,6 +110,10 @@ def build_telemetria_url(
     oid: Optional[str] = None,
     date_start: Optional[int] = None,
     date_end: Optional[int] = None,
+    cursor: Optional[str] = None,
+    bbox: Optional[str] = None,
+    near: Optional[str] = None,
+    radius: Optional[float] = None,
 ) -> str:
     """
     Builds the URL for the telemetry list with query parameters.
@@ -52,6 +127,14 @@ def build_telemetria_url(
         params.append(f"date_start={date_start}")
     if date_end is not None:
         params.append(f"date_end={date_end}")
+    if cursor is not None:
+        params.append(f"cursor={cursor}")
+    if bbox is not None:
+        params.append(f"bbox={bbox}")
+    if near is not None:
+        params.append(f"near={near}")
+    if radius is not None:
+        params.append(f"radius={radius}")
 
     return "/telemetria?" + "&".join(params)
 
@@ -60,14 +143,53 @@ def count_telemetria(
     oid: Optional[str] = None,
     date_start: Optional[int] = None,
     date_end: Optional[int] = None,
-) -> int:
+    bbox: Optional[BBox] = None,
+    near: Optional[Near] = None,
+) -> Tuple[int, Optional[datetime.datetime]]:
     """
     Counts total telemetry records matching filters.
+
+    Whole days are summed from the (oid, day) counters of services/counters.py;
+    until those were reconciled, the raw collection is counted instead.
+    Spatial filters count the (cached) matches of the area. Identical
+    concurrent counts share one backend call.
+
+    Returns a tuple: (total, updated_at of the most recent counter or None)
     """
-    query = _build_query(oid, date_start, date_end)
-    aggregate_query = query.count()
-    results = aggregate_query.get()
-    return results[0][0].value
+    if bbox is not None or near is not None:
+        return len(_area_matches(oid, date_start, date_end, bbox, near)), None
+
+    def count_raw(start: Optional[int], end: Optional[int]) -> int:
+        aggregate_query = _build_query(oid, start, end).count()
+        results = aggregate_query.get()
+        return results[0][0].value
+
+    def load():
+        if rollups_ready("telemetria"):
+            return count_telemetria_rollup(oid, date_start, date_end, count_raw)
+        return count_raw(date_start, date_end), None
+
+    key = (
+        telemetria_cache.generation,
+        oid,
+        None if date_start is None else int(date_start),
+        None if date_end is None else int(date_end),
+    )
+    return telemetria_count_flight.do(key, load)
+
+
+def export_telemetria(
+    export_format: str,
+    oid: Optional[str] = None,
+    date_start: Optional[int] = None,
+    date_end: Optional[int] = None,
+):
+    """
+    Streams every telemetry record matching the filters, ordered by date, as
+    `export_format` (see services/export.py). Returns an async iterator of bytes.
+    """
+    chunks = iter_chunks(_build_query(oid, date_start, date_end), ORDER_FIELDS)
+    return encode(chunks, export_format, EXPORT_FIELDS, EXPORT_TYPES)
 
 
 def _build_query(
@@ -78,7 +200,7 @@ def _build_query(
     """
     Helper to build base query with filters.
     """
-    query = db.collection("telemetria").order_by("date")
+    query = db.collection("telemetria").order_by("date").order_by(DOCUMENT_ID)
 
     # Optional filters
     if oid is not None:
@@ -91,3 +213,141 @@ def _build_query(
         query = query.where(filter=firestore.FieldFilter("date", "<=", int(date_end)))
         
     return query
+
+
+# --- Spatial filters --------------------------------------------------------
+
+def _area_boxes(bbox: Optional[BBox], near: Optional[Near]) -> List[Tuple[float, float, float, float]]:
+    """
+    (min_lat, min_lon, max_lat, max_lon) boxes covering the area; a box
+    crossing the antimeridian is split in two.
+    """
+    if near is not None:
+        lat, lon, radius = near
+        dlat = math.degrees(radius / EARTH_RADIUS)
+        cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 90.0)))
+        dlon = 180.0 if cos_lat < 1e-9 else min(dlat / cos_lat, 180.0)
+        min_lat, max_lat = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        if dlon >= 180.0:
+            return [(min_lat, -180.0, max_lat, 180.0)]
+        min_lon = (lon - dlon + 180.0) % 360.0 - 180.0
+        max_lon = (lon + dlon + 180.0) % 360.0 - 180.0
+    else:
+        min_lon, min_lat, max_lon, max_lat = bbox
+
+    if min_lon <= max_lon:
+        return [(min_lat, min_lon, max_lat, max_lon)]
+    return [(min_lat, min_lon, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon)]
+
+
+def _in_area(lat: float, lon: float, boxes, near: Optional[Near]) -> bool:
+    if near is not None:
+        return float(haversine(near[0], near[1], lat, lon)) <= near[2]
+    return any(
+        min_lat <= lat <= max_lat and min_lon <= lon <= max_lon for min_lat, min_lon, max_lat, max_lon in boxes
+    )
+
+
+def _order_key(date: Any, doc_id: str):
+    # Same order as the Firestore listing: missing dates first, then date, then id
+    return (0, 0, doc_id) if date is None else (1, date, doc_id)
+
+
+def _area_matches(
+    oid: Optional[str],
+    date_start: Optional[int],
+    date_end: Optional[int],
+    bbox: Optional[BBox],
+    near: Optional[Near],
+    select: Optional[List[str]] = None,
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    (doc id, data) of the telemetry inside the area, ordered by date. With
+    `select`, only those fields (which must include AREA_FIELDS) are read.
+
+    The area is covered by a few ranges of the `geohash` field; the documents
+    in those ranges are read and filtered exactly (position and dates). Only
+    documents with a geohash (imported or backfilled by
+    scripts/backfill_telemetry_geohash.py) can match.
+    """
+    def load():
+        boxes = _area_boxes(bbox, near)
+        ranges = dict.fromkeys(
+            cell_range
+            for box in boxes
+            for cell_range in geohash.covering_ranges(*box, max_ranges=TELEMETRIA_MAX_GEOHASH_RANGES)
+        )
+        matches = {}
+        for start, end in ranges:
+            query = (
+                db.collection("telemetria")
+                .where(filter=firestore.FieldFilter("geohash", ">=", start))
+                .where(filter=firestore.FieldFilter("geohash", "<", end))
+            )
+            if oid is not None:
+                query = query.where(filter=firestore.FieldFilter("oid", "==", oid))
+            if select is not None:
+                query = query.select(select)
+            for snapshot in query.stream():
+                data = snapshot.to_dict() or {}
+                date, lat, lon = data.get("date"), data.get("latitude"), data.get("longitude")
+                if lat is None or lon is None:
+                    continue
+                if date_start is not None and (date is None or date < date_start):
+                    continue
+                if date_end is not None and (date is None or date > date_end):
+                    continue
+                if _in_area(lat, lon, boxes, near):
+                    matches[snapshot.id] = data
+        return sorted(matches.items(), key=lambda item: _order_key(item[1].get("date"), item[0]))
+
+    key = (
+        "area",
+        oid,
+        None if date_start is None else int(date_start),
+        None if date_end is None else int(date_end),
+        bbox,
+        near,
+        None if select is None else tuple(select),
+    )
+    return telemetria_cache.get_or_load(key, load)
+
+
+def _paginate_matches(
+    matches: List[Tuple[str, Dict[str, Any]]], page: int, page_size: int, cursor: Optional[str] = None
+) -> Tuple[list, bool, Optional[str], Optional[str]]:
+    """
+    Page of the ordered `matches`, with the same cursors (date, document id)
+    and return values as services.pagination.paginate.
+    """
+    keys = [_order_key(data.get("date"), doc_id) for doc_id, data in matches]
+    if cursor:
+        values, direction = decode_cursor(cursor)
+        if len(values) != len(ORDER_FIELDS):
+            raise InvalidCursor(f"Invalid cursor: {cursor}")
+        try:
+            position = _order_key(*values)
+            if direction == CURSOR_PREV:
+                end = bisect.bisect_left(keys, position)
+                start = max(end - page_size, 0)
+            else:
+                start = bisect.bisect_right(keys, position)
+                end = start + page_size
+        except TypeError:
+            raise InvalidCursor(f"Invalid cursor: {cursor}")
+        has_prev = start > 0 if direction == CURSOR_PREV else True
+        has_more = True if direction == CURSOR_PREV else end < len(matches)
+    else:
+        start = (page - 1) * page_size
+        end = start + page_size
+        has_prev = page > 1
+        has_more = end < len(matches)
+
+    rows = matches[start:end]
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more:
+            next_cursor = encode_cursor([rows[-1][1].get("date"), rows[-1][0]])
+        if has_prev:
+            prev_cursor = encode_cursor([rows[0][1].get("date"), rows[0][0]], CURSOR_PREV)
+    return rows, has_more, next_cursor, prev_cursor
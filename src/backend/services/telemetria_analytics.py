@@ -0,0 +1,188 @@
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config import TELEMETRIA_STATS_CACHE_TTL
+from database import db
+from services.counters import TELEMETRIA_COUNTERS, rollups_ready
+from services.places import get_place_index
+from services.positions import position_index
+from services.query_cache import QueryCache
+from services.tracks import EARTH_RADIUS
+from services.versions import TELEMETRIA_VERSION, cached_version
+
+
+def haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Great-circle distances in meters between arrays of points (degrees).
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class MovementStats:
+    """
+    Movement statistics of one animal, accumulated over its fixes in date
+    order so that appended telemetry only costs its own steps.
+
+    Residency: each step's duration is split in half between the places
+    (places.json polygons) of its two fixes; time outside every place goes
+    to `outside`.
+    """
+
+    def __init__(self, with_places: bool):
+        self.with_places = with_places
+        self.fixes = 0
+        self.first_date = None
+        self.last_fix = None  # (date, lat, lon, place) of the last fix added
+        self.distance = 0.0
+        self.moving_time = 0.0
+        self.max_speed = 0.0
+        self.residency: Dict[str, float] = defaultdict(float)
+        self.outside = 0.0
+
+    def add(self, dates: np.ndarray, lats: np.ndarray, lons: np.ndarray, places: Optional[Sequence[Optional[str]]]):
+        """
+        Adds fixes dated after the last one added.
+        """
+        if not len(dates):
+            return
+        places = list(places) if places is not None else [None] * len(dates)
+        if self.first_date is None:
+            self.first_date = int(dates[0])
+        self.fixes += len(dates)
+
+        if self.last_fix is not None:
+            date, lat, lon, place = self.last_fix
+            dates = np.concatenate([[date], dates])
+            lats = np.concatenate([[lat], lats])
+            lons = np.concatenate([[lon], lons])
+            places = [place] + places
+        self.last_fix = (dates[-1], lats[-1], lons[-1], places[-1])
+
+        if len(dates) < 2:
+            return
+        steps = haversine(lats[:-1], lons[:-1], lats[1:], lons[1:])
+        durations = np.diff(dates).astype(np.float64)
+        moving = durations > 0
+        self.distance += float(steps.sum())
+        self.moving_time += float(durations.sum())
+        if moving.any():
+            self.max_speed = max(self.max_speed, float((steps[moving] / durations[moving]).max()))
+
+        if self.with_places:
+            half = durations / 2
+            for endpoint_places in (places[:-1], places[1:]):
+                names = np.array(endpoint_places, dtype=object)
+                for name in set(endpoint_places):
+                    seconds = float(half[names == name].sum())
+                    if name is None:
+                        self.outside += seconds
+                    else:
+                        self.residency[name] += seconds
+
+    def to_dict(self, oid: str) -> Dict[str, Any]:
+        last_date = None if self.last_fix is None else int(self.last_fix[0])
+        return {
+            "oid": oid,
+            "fixes": self.fixes,
+            "first_date": self.first_date,
+            "last_date": last_date,
+            "duration": 0 if last_date is None else last_date - self.first_date,
+            "distance": self.distance,
+            "mean_speed": self.distance / self.moving_time if self.moving_time else 0.0,
+            "max_speed": self.max_speed,
+            "residency": dict(self.residency) if self.with_places else None,
+            "outside": self.outside if self.with_places else None,
+        }
+
+
+# oid -> accumulated stats; updated under the oid's lock
+_memo: Dict[str, MovementStats] = {}
+_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+_locks_lock = threading.Lock()
+
+# (kind, telemetry version) -> every oid, or the stats of every oid
+analytics_cache = QueryCache("telemetria_analytics", maxsize=4, ttl=TELEMETRIA_STATS_CACHE_TTL)
+
+
+def _place_index():
+    try:
+        return get_place_index()
+    except (OSError, ValueError) as e:
+        print(f"Residency not computed, places are not available: {e}")
+        return None
+
+
+def movement_stats(oid: str) -> Optional[Dict[str, Any]]:
+    """
+    Movement statistics of `oid` (distance in meters, speeds in m/s, times in
+    seconds), or None if it has no telemetry.
+
+    Stats are memoized per oid. When the positions index only gained newer
+    fixes, just those are added; otherwise everything is recomputed.
+    """
+    dates, lats, lons, _ = position_index.get(oid).data
+    if not len(dates):
+        return None
+    place_index = _place_index()
+
+    with _locks_lock:
+        lock = _locks[oid]
+    with lock:
+        stats = _memo.get(oid)
+        start = 0
+        if stats is not None and stats.with_places == (place_index is not None):
+            known = int(np.searchsorted(dates, stats.last_fix[0], side="right"))
+            if known == stats.fixes and dates[known - 1] == stats.last_fix[0]:
+                start = known
+            else:
+                stats = None
+        else:
+            stats = None
+        if stats is None:
+            stats = MovementStats(with_places=place_index is not None)
+
+        if start < len(dates):
+            new_lats, new_lons = lats[start:], lons[start:]
+            places = place_index.lookup_many(new_lats, new_lons) if place_index is not None else None
+            stats.add(dates[start:], new_lats, new_lons, places)
+        _memo[oid] = stats
+        return stats.to_dict(oid)
+
+
+def telemetria_oids() -> List[str]:
+    """
+    Every tagged animal, read from the (small) count rollups when available.
+    Cached per telemetry version (versoes/telemetria, bumped by imports).
+    """
+    def load():
+        if rollups_ready("telemetria"):
+            query = db.collection(TELEMETRIA_COUNTERS).select(["oid"])
+        else:
+            query = db.collection("telemetria").select(["oid"])
+        oids = {(snapshot.to_dict() or {}).get("oid") for snapshot in query.stream()}
+        return sorted(oid for oid in oids if oid)
+
+    return analytics_cache.get_or_load(("oids", cached_version(TELEMETRIA_VERSION)), load)
+
+
+def all_movement_stats() -> List[Dict[str, Any]]:
+    """
+    Movement statistics of every animal with telemetry, cached per telemetry
+    version so the positions of every animal are only walked after an import.
+    """
+    def load():
+        return [stats for stats in map(movement_stats, telemetria_oids()) if stats is not None]
+
+    return analytics_cache.get_or_load(("stats", cached_version(TELEMETRIA_VERSION)), load)
+
+
+def clear():
+    with _locks_lock:
+        _memo.clear()
+        _locks.clear()
+    analytics_cache.clear()
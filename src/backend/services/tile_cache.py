@@ -0,0 +1,114 @@
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from config import TILE_CACHE_DIR, TILE_CACHE_MAX_BYTES
+
+
+class DiskTileCache:
+    """
+    Bounded on-disk cache of rendered tiles, one file per key
+    ("{layer}/{version}/{z}/{x}/{y}.mvt").
+
+    Files are written atomically (temporary file + os.replace), so several
+    processes (e.g. scripts/seed_tiles.py) can fill the same directory. The
+    least recently used files are deleted once the total size exceeds
+    `max_bytes`; the index is rebuilt from the directory (oldest first) on
+    first use.
+    """
+
+    def __init__(self, directory=TILE_CACHE_DIR, max_bytes: int = TILE_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._entries: Optional["OrderedDict[str, int]"] = None
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _index(self) -> "OrderedDict[str, int]":
+        # Called with the lock held
+        if self._entries is None:
+            files = []
+            if self.directory.exists():
+                for path in self.directory.rglob("*.mvt"):
+                    try:
+                        stat = path.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, path.relative_to(self.directory).as_posix(), stat.st_size))
+            files.sort()
+            self._entries = OrderedDict((key, size) for _, key, size in files)
+            self.total_bytes = sum(self._entries.values())
+        return self._entries
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            data = (self.directory / key).read_bytes()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+                entries = self._index()
+                if key in entries:
+                    self.total_bytes -= entries.pop(key)
+            return None
+        with self._lock:
+            self.hits += 1
+            entries = self._index()
+            if key not in entries:
+                # Written by another process
+                entries[key] = len(data)
+                self.total_bytes += len(data)
+            entries.move_to_end(key)
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = self.directory / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        evicted = []
+        with self._lock:
+            entries = self._index()
+            self.total_bytes += len(data) - entries.pop(key, 0)
+            entries[key] = len(data)
+            while self.total_bytes > self.max_bytes and len(entries) > 1:
+                old_key, size = entries.popitem(last=False)
+                self.total_bytes -= size
+                self.evictions += 1
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                (self.directory / old_key).unlink()
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self._entries = None
+            self.total_bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries = self._index()
+            total = self.hits + self.misses
+            return {
+                "tiles": len(entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+tile_cache = DiskTileCache()
@@ -0,0 +1,293 @@
+"""
+Mapbox vector tiles of the telemetry, places and sightings layers.
+
+Layer data is loaded once per data version and kept in memory as normalized
+web mercator coordinates (0..1), so rendering a tile is a few vectorized
+operations. Rendered tiles are kept in the on-disk tile cache under the
+layer's version, so new data never serves stale tiles.
+"""
+import os
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import (
+    PLACES_JSON_PATH,
+    TILE_BUFFER,
+    TILE_CLUSTER_CELL,
+    TILE_DATA_TTL,
+    TILE_EXTENT,
+    VERSION_CHECK_INTERVAL,
+)
+from database import db
+from services import mvt
+from services.places import get_place_index
+from services.query_cache import QueryCache
+from services.tile_cache import tile_cache
+from services.versions import AVISTAMENTOS_VERSION, TELEMETRIA_VERSION, get_version
+
+TELEMETRIA = "telemetria"
+PLACES = "places"
+AVISTAMENTOS = "avistamentos"
+LAYERS = (TELEMETRIA, PLACES, AVISTAMENTOS)
+
+# Web mercator latitude limit
+MAX_LATITUDE = 85.0511287798
+
+# layer -> current data version, checked every VERSION_CHECK_INTERVAL seconds
+tile_versions_cache = QueryCache("tile_versions", maxsize=len(LAYERS), ttl=VERSION_CHECK_INTERVAL)
+# (layer, version) -> layer data; the version is in the key, so entries never
+# go stale; the TTL only bounds how long a layer's memory is held
+tile_data_cache = QueryCache("tile_data", maxsize=2 * len(LAYERS), ttl=TILE_DATA_TTL)
+
+
+def mercator(lats, lons) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Normalized web mercator coordinates: (0, 0) is the north-west corner of
+    the world and (1, 1) the south-east one.
+    """
+    lats = np.clip(np.asarray(lats, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE)
+    lons = np.asarray(lons, dtype=np.float64)
+    mx = (lons + 180.0) / 360.0
+    my = 0.5 - np.log(np.tan(np.pi / 4 + np.radians(lats) / 2)) / (2 * np.pi)
+    return mx, my
+
+
+def tile_coords(mx, my, z: int, x: int, y: int, extent: int = TILE_EXTENT) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tile coordinates (0..extent inside tile z/x/y) of normalized mercator points.
+    """
+    scale = float(1 << z)
+    return (np.asarray(mx) * scale - x) * extent, (np.asarray(my) * scale - y) * extent
+
+
+def normalize_name(name: Optional[str]) -> str:
+    # Place names are matched ignoring case, accents and surrounding spaces
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
+
+# --- Layer data ------------------------------------------------------------
+
+def _points_data(lats, lons, weights, columns: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    mx, my = mercator(lats, lons)
+    return {
+        "kind": "points",
+        "mx": mx,
+        "my": my,
+        "weights": np.asarray(weights, dtype=np.float64),
+        "columns": columns,
+    }
+
+
+def _load_telemetria() -> Dict[str, Any]:
+    oids, dates, lats, lons = [], [], [], []
+    fields = ["oid", "date", "latitude", "longitude"]
+    for snapshot in db.collection("telemetria").select(fields).stream():
+        data = snapshot.to_dict() or {}
+        if data.get("latitude") is None or data.get("longitude") is None:
+            continue
+        oids.append(data.get("oid") or "")
+        dates.append(int(data.get("date") or 0))
+        lats.append(float(data["latitude"]))
+        lons.append(float(data["longitude"]))
+    columns = {"oid": np.array(oids, dtype=object), "date": np.array(dates, dtype=np.int64)}
+    return _points_data(lats, lons, np.ones(len(lats)), columns)
+
+
+def _load_places() -> Dict[str, Any]:
+    index = get_place_index()
+    rings = [mercator(polygon[:, 1], polygon[:, 0]) for polygon in index.polygons]
+    bboxes = np.array([[mx.min(), my.min(), mx.max(), my.max()] for mx, my in rings]).reshape(-1, 4)
+    return {"kind": "polygons", "rings": rings, "bboxes": bboxes, "names": list(index.names)}
+
+
+def _load_avistamentos() -> Dict[str, Any]:
+    # Sightings have no coordinates: each place gets one point (the mean of
+    # its vertices) weighted by the number of sightings recorded there
+    totals = Counter(
+        normalize_name((snapshot.to_dict() or {}).get("local"))
+        for snapshot in db.collection("avistamentos").select(["local"]).stream()
+    )
+    index = get_place_index()
+    names, lats, lons, counts = [], [], [], []
+    for name, polygon in zip(index.names, index.polygons):
+        count = totals.get(normalize_name(name), 0)
+        if count:
+            names.append(name)
+            lons.append(polygon[:, 0].mean())
+            lats.append(polygon[:, 1].mean())
+            counts.append(count)
+    return _points_data(lats, lons, counts, {"local": np.array(names, dtype=object)})
+
+
+_LOADERS = {TELEMETRIA: _load_telemetria, PLACES: _load_places, AVISTAMENTOS: _load_avistamentos}
+
+
+def load_layer_data(layer: str) -> Dict[str, Any]:
+    """
+    Everything needed to render any tile of `layer`. The result is plain
+    data (arrays, lists), so it can be sent to worker processes.
+    """
+    return _LOADERS[layer]()
+
+
+def layer_version(layer: str) -> str:
+    """
+    Version of the data of `layer`: the versoes document bumped by the
+    writers, or the modification time of places.json.
+    """
+    def load():
+        if layer == PLACES:
+            return f"p{os.stat(PLACES_JSON_PATH).st_mtime_ns}"
+        name = TELEMETRIA_VERSION if layer == TELEMETRIA else AVISTAMENTOS_VERSION
+        return f"v{get_version(name)}"
+
+    return tile_versions_cache.get_or_load(layer, load)
+
+
+# --- Rendering -------------------------------------------------------------
+
+def _add_points(layer: mvt.Layer, data, z, x, y, extent, buffer, cluster_cell):
+    px, py = tile_coords(data["mx"], data["my"], z, x, y, extent)
+    inside = np.flatnonzero((px >= -buffer) & (px < extent + buffer) & (py >= -buffer) & (py < extent + buffer))
+    if not inside.size:
+        return
+    px, py, weights = px[inside], py[inside], data["weights"][inside]
+
+    # Points falling in the same cell of a grid aligned with the tile become
+    # one feature at their (weighted) centroid, so clusters match across tiles
+    cells_per_side = extent // cluster_cell + 4
+    cx = np.floor(px / cluster_cell).astype(np.int64) + 2
+    cy = np.floor(py / cluster_cell).astype(np.int64) + 2
+    _, first, cluster = np.unique(cx * cells_per_side + cy, return_index=True, return_inverse=True)
+    cluster = cluster.ravel()
+    members = np.bincount(cluster)
+    totals = np.bincount(cluster, weights=weights)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        centers_x = np.bincount(cluster, weights=px * weights) / totals
+        centers_y = np.bincount(cluster, weights=py * weights) / totals
+    empty = totals == 0
+    centers_x[empty] = np.bincount(cluster, weights=px)[empty] / members[empty]
+    centers_y[empty] = np.bincount(cluster, weights=py)[empty] / members[empty]
+
+    for i in range(len(members)):
+        point = np.array([[round(centers_x[i]), round(centers_y[i])]])
+        total = totals[i]
+        properties = {"count": int(total) if float(total).is_integer() else float(total)}
+        if members[i] == 1:
+            source = inside[first[i]]
+            for name, column in data["columns"].items():
+                value = column[source]
+                properties[name] = value.item() if isinstance(value, np.generic) else value
+        else:
+            properties["cluster"] = True
+            properties["point_count"] = int(members[i])
+        layer.add_feature(mvt.POINT, [point], properties)
+
+
+def clip_ring(ring: np.ndarray, low: float, high: float) -> np.ndarray:
+    """
+    Sutherland-Hodgman clipping of a polygon ring to the square [low, high]².
+    """
+    points = [tuple(p) for p in ring]
+    for axis, bound, keep_above in ((0, low, True), (0, high, False), (1, low, True), (1, high, False)):
+        if not points:
+            break
+        clipped = []
+        previous = points[-1]
+        for current in points:
+            current_in = current[axis] >= bound if keep_above else current[axis] <= bound
+            previous_in = previous[axis] >= bound if keep_above else previous[axis] <= bound
+            if current_in != previous_in:
+                t = (bound - previous[axis]) / (current[axis] - previous[axis])
+                clipped.append(tuple(p + t * (c - p) for p, c in zip(previous, current)))
+            if current_in:
+                clipped.append(current)
+            previous = current
+        points = clipped
+    return np.array(points, dtype=np.float64).reshape(-1, 2)
+
+
+def _add_polygons(layer: mvt.Layer, data, z, x, y, extent, buffer):
+    scale = float(1 << z)
+    margin = buffer / extent
+    min_x, max_x = (x - margin) / scale, (x + 1 + margin) / scale
+    min_y, max_y = (y - margin) / scale, (y + 1 + margin) / scale
+    bboxes = data["bboxes"]
+    candidates = np.flatnonzero(
+        (bboxes[:, 2] >= min_x) & (bboxes[:, 0] <= max_x) & (bboxes[:, 3] >= min_y) & (bboxes[:, 1] <= max_y)
+    )
+    for index in candidates:
+        mx, my = data["rings"][index]
+        px, py = tile_coords(mx, my, z, x, y, extent)
+        ring = np.round(clip_ring(np.column_stack([px, py]), -buffer, extent + buffer)).astype(np.int64)
+        if len(ring):
+            # Drop repeated vertices (consecutive, and the closing one)
+            keep = np.any(ring != np.roll(ring, 1, axis=0), axis=1)
+            ring = ring[keep] if keep.any() else ring[:1]
+        if len(ring) < 3:
+            continue
+        area = mvt.ring_area(ring)
+        if area == 0:
+            continue
+        if area < 0:
+            ring = ring[::-1]
+        layer.add_feature(mvt.POLYGON, [ring], {"name": data["names"][index]}, feature_id=index + 1)
+
+
+def render_tile(
+    layer_name: str,
+    data: Dict[str, Any],
+    z: int,
+    x: int,
+    y: int,
+    extent: int = TILE_EXTENT,
+    buffer: int = TILE_BUFFER,
+    cluster_cell: int = TILE_CLUSTER_CELL,
+) -> bytes:
+    """
+    Encodes tile z/x/y of a layer from its `load_layer_data` result.
+    Pure function of its arguments (used by the seeding worker processes).
+    """
+    layer = mvt.Layer(layer_name, extent)
+    if data["kind"] == "polygons":
+        _add_polygons(layer, data, z, x, y, extent, buffer)
+    else:
+        _add_points(layer, data, z, x, y, extent, buffer, cluster_cell)
+    return mvt.encode_tile([layer])
+
+
+def tile_key(layer: str, version: str, z: int, x: int, y: int) -> str:
+    return f"{layer}/{version}/{z}/{x}/{y}.mvt"
+
+
+def layer_data(layer: str, version: str) -> Dict[str, Any]:
+    return tile_data_cache.get_or_load((layer, version), lambda: load_layer_data(layer))
+
+
+def get_tile(layer: str, z: int, x: int, y: int) -> bytes:
+    """
+    Tile z/x/y of `layer` from the disk cache, rendered (and cached) on a miss.
+    """
+    version = layer_version(layer)
+    key = tile_key(layer, version, z, x, y)
+    tile = tile_cache.get(key)
+    if tile is None:
+        tile = render_tile(layer, layer_data(layer, version), z, x, y)
+        tile_cache.put(key, tile)
+    return tile
+
+
+def tiles_in_bbox(bbox: Tuple[float, float, float, float], z: int) -> List[Tuple[int, int]]:
+    """
+    (x, y) of the tiles at zoom `z` covering min_lon,min_lat,max_lon,max_lat.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    (left, right), (top, bottom) = mercator([max_lat, min_lat], [min_lon, max_lon])
+    last = (1 << z) - 1
+    xs = range(max(0, int(left * (1 << z))), min(last, int(right * (1 << z))) + 1)
+    ys = range(max(0, int(top * (1 << z))), min(last, int(bottom * (1 << z))) + 1)
+    return [(tx, ty) for tx in xs for ty in ys]
@@ -0,0 +1,227 @@
+import heapq
+import math
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from google.cloud import firestore
+
+from config import TRACK_CACHE_SIZE, TRACK_CACHE_TTL
+from database import db
+from services.pagination import DOCUMENT_ID
+from services.query_cache import QueryCache
+from services.versions import cached_version, telemetria_version_name
+
+DOUGLAS_PEUCKER = "douglas-peucker"
+VISVALINGAM = "visvalingam"
+SIMPLIFY_METHODS = (DOUGLAS_PEUCKER, VISVALINGAM)
+
+EARTH_RADIUS = 6371008.8  # meters
+
+# (oid, version, method) -> positions and their significance
+track_points_cache = QueryCache("track_points", maxsize=TRACK_CACHE_SIZE, ttl=TRACK_CACHE_TTL)
+# (oid, version, method, tolerance, max_points) -> GeoJSON Feature
+track_cache = QueryCache("tracks", maxsize=TRACK_CACHE_SIZE, ttl=TRACK_CACHE_TTL)
+
+
+def project(lats: np.ndarray, lons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Equirectangular projection to meters around the mean latitude; accurate
+    enough for the distances involved in simplifying one animal's track.
+    """
+    if not len(lats):
+        return np.empty(0), np.empty(0)
+    scale = math.cos(math.radians(float(np.mean(lats))))
+    return EARTH_RADIUS * np.radians(lons) * scale, EARTH_RADIUS * np.radians(lats)
+
+
+def _segment_distances(px, py, x1, y1, x2, y2) -> np.ndarray:
+    # Distances from the points (px, py) to the segment (x1, y1)-(x2, y2)
+    dx, dy = x2 - x1, y2 - y1
+    length2 = dx * dx + dy * dy
+    if length2 == 0:
+        return np.hypot(px - x1, py - y1)
+    t = np.clip(((px - x1) * dx + (py - y1) * dy) / length2, 0.0, 1.0)
+    return np.hypot(px - (x1 + t * dx), py - (y1 + t * dy))
+
+
+def douglas_peucker_significance(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Douglas-Peucker distance (meters) at which each point stops being kept.
+    The distances of each segment's points are computed in one vectorized
+    step. A point is never more significant than the point that split its
+    segment, so `significance > tolerance` gives the usual Douglas-Peucker
+    result and the top-k points give the best k-point simplification in the
+    same ranking.
+    """
+    n = len(x)
+    significance = np.zeros(n)
+    if n == 0:
+        return significance
+    significance[0] = significance[-1] = np.inf
+
+    stack = [(0, n - 1, np.inf)]
+    while stack:
+        start, end, parent = stack.pop()
+        if end - start < 2:
+            continue
+        distances = _segment_distances(x[start + 1:end], y[start + 1:end], x[start], y[start], x[end], y[end])
+        offset = int(np.argmax(distances))
+        index = start + 1 + offset
+        significance[index] = min(float(distances[offset]), parent)
+        stack.append((start, index, significance[index]))
+        stack.append((index, end, significance[index]))
+    return significance
+
+
+def _triangle_areas(x, y, a, b, c):
+    return 0.5 * np.abs((x[b] - x[a]) * (y[c] - y[a]) - (x[c] - x[a]) * (y[b] - y[a]))
+
+
+def visvalingam_significance(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Visvalingam-Whyatt effective area (square meters) of each point: the
+    area of the triangle it formed with its neighbours when it was removed,
+    never less than the area of an earlier removal.
+    """
+    n = len(x)
+    significance = np.full(n, np.inf)
+    if n < 3:
+        return significance
+
+    previous = np.arange(-1, n - 1)
+    following = np.arange(1, n + 1)
+    inner = np.arange(1, n - 1)
+    areas = np.full(n, np.inf)
+    areas[inner] = _triangle_areas(x, y, inner - 1, inner, inner + 1)
+
+    heap = list(zip(areas[inner].tolist(), inner.tolist()))
+    heapq.heapify(heap)
+    removed = np.zeros(n, dtype=bool)
+    largest = 0.0
+    while heap:
+        area, index = heapq.heappop(heap)
+        if removed[index] or area != areas[index]:
+            continue  # stale entry
+        largest = max(largest, area)
+        significance[index] = largest
+        removed[index] = True
+        before, after = previous[index], following[index]
+        following[before], previous[after] = after, before
+        for neighbour in (before, after):
+            if 0 < neighbour < n - 1:
+                areas[neighbour] = float(_triangle_areas(x, y, previous[neighbour], neighbour, following[neighbour]))
+                heapq.heappush(heap, (areas[neighbour], neighbour))
+    return significance
+
+
+def select_points(
+    significance: np.ndarray, threshold: Optional[float] = None, max_points: Optional[int] = None
+) -> np.ndarray:
+    """
+    Indexes (in track order) of the points whose significance is above
+    `threshold`, limited to the `max_points` most significant ones.
+    """
+    keep = np.ones(len(significance), dtype=bool)
+    if threshold is not None:
+        keep &= significance > threshold
+    if max_points is not None and keep.sum() > max_points:
+        ranked = np.argsort(-significance, kind="stable")
+        ranked = ranked[keep[ranked]][:max(max_points, 2)]
+        keep[:] = False
+        keep[ranked] = True
+    return np.flatnonzero(keep)
+
+
+def load_positions(oid: str, after: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Dates, latitudes and longitudes of every telemetry record of `oid` (only
+    those dated after `after`, if given), ordered by date. Records without a
+    date or position are skipped.
+    """
+    query = db.collection("telemetria").where(filter=firestore.FieldFilter("oid", "==", oid))
+    if after is not None:
+        query = query.where(filter=firestore.FieldFilter("date", ">", int(after)))
+    query = (
+        query
+        .order_by("date")
+        .order_by(DOCUMENT_ID)
+        .select(["date", "latitude", "longitude"])
+    )
+    dates, lats, lons = [], [], []
+    for snapshot in query.stream():
+        data = snapshot.to_dict() or {}
+        if data.get("date") is None or data.get("latitude") is None or data.get("longitude") is None:
+            continue
+        dates.append(data["date"])
+        lats.append(data["latitude"])
+        lons.append(data["longitude"])
+    return (
+        np.asarray(dates, dtype=np.int64),
+        np.asarray(lats, dtype=np.float64),
+        np.asarray(lons, dtype=np.float64),
+    )
+
+
+def _ranked_positions(oid: str, version: int, method: str):
+    def load():
+        dates, lats, lons = load_positions(oid)
+        x, y = project(lats, lons)
+        if method == VISVALINGAM:
+            significance = visvalingam_significance(x, y)
+        else:
+            significance = douglas_peucker_significance(x, y)
+        return dates, lats, lons, significance
+
+    return track_points_cache.get_or_load((oid, version, method), load)
+
+
+def get_track(
+    oid: str,
+    method: str = DOUGLAS_PEUCKER,
+    tolerance: Optional[float] = None,
+    max_points: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Track of `oid` as a GeoJSON LineString Feature, simplified with `method`
+    (a Point Feature when the oid has a single position).
+
+    `tolerance` is in meters: the maximum distance from the simplified line
+    for Douglas-Peucker, or the side of a square with the minimum triangle
+    area kept for Visvalingam. `max_points` caps the number of points. With
+    neither, the full track is returned. Returns None if `oid` has no positions.
+
+    Results are cached per (oid, tolerance, max_points) and tied to the
+    version of the oid's telemetry, which the import script bumps.
+    """
+    version = cached_version(telemetria_version_name(oid))
+    threshold = None
+    if tolerance is not None:
+        threshold = tolerance if method == DOUGLAS_PEUCKER else tolerance * tolerance
+
+    def load():
+        dates, lats, lons, significance = _ranked_positions(oid, version, method)
+        if not len(dates):
+            return None
+        kept = select_points(significance, threshold, max_points)
+        coordinates = np.column_stack((lons[kept], lats[kept])).tolist()
+        # A LineString needs at least two positions
+        if len(coordinates) < 2:
+            geometry = {"type": "Point", "coordinates": coordinates[0]}
+        else:
+            geometry = {"type": "LineString", "coordinates": coordinates}
+        return {
+            "type": "Feature",
+            "geometry": geometry,
+            "properties": {
+                "oid": oid,
+                "method": method,
+                "tolerance": tolerance,
+                "max_points": max_points,
+                "point_count": len(dates),
+                "simplified_point_count": len(kept),
+                "times": dates[kept].tolist(),
+                "version": version,
+            },
+        }
+
+    return track_cache.get_or_load((oid, version, method, tolerance, max_points), load)
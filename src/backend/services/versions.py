@@ -0,0 +1,61 @@
+from google.cloud import firestore
+
+from config import VERSION_CHECK_INTERVAL
+from database import db
+from services.query_cache import QueryCache, avistamentos_cache, telemetria_cache
+
+# One document per versioned dataset, e.g. versoes/telemetria_{oid}. Writers
+# (the import scripts) bump it so that caches in every worker notice new data.
+VERSIONS_COLLECTION = "versoes"
+
+# Whole datasets (e.g. the vector tile layers), bumped by every write to them
+TELEMETRIA_VERSION = "telemetria"
+AVISTAMENTOS_VERSION = "avistamentos"
+
+# name -> version, re-read every VERSION_CHECK_INTERVAL seconds (ETags of the
+# list and count responses). Writes made by this process invalidate it at once
+versions_cache = QueryCache("versions", ttl=VERSION_CHECK_INTERVAL)
+
+# List query caches dropped when a new version of their dataset is seen, so a
+# response never pairs a new version (ETag) with a page cached before it
+_DATASET_CACHES = {TELEMETRIA_VERSION: telemetria_cache, AVISTAMENTOS_VERSION: avistamentos_cache}
+_seen_versions = {}
+
+
+def telemetria_version_name(oid: str) -> str:
+    return f"telemetria_{oid}"
+
+
+def get_version(name: str) -> int:
+    """
+    Current version of the dataset `name` (0 if it was never bumped).
+    """
+    snapshot = db.collection(VERSIONS_COLLECTION).document(name).get()
+    if not snapshot.exists:
+        return 0
+    return int((snapshot.to_dict() or {}).get("version") or 0)
+
+
+def cached_version(name: str) -> int:
+    """
+    get_version(name), cached in `versions_cache`.
+    """
+    def load():
+        version = get_version(name)
+        if _seen_versions.get(name) != version and name in _DATASET_CACHES:
+            _DATASET_CACHES[name].invalidate()
+        _seen_versions[name] = version
+        return version
+
+    return versions_cache.get_or_load(name, load)
+
+
+def bump_version(batch, name: str):
+    """
+    Adds to `batch` the increment of the version of `name`.
+    """
+    batch.set(
+        db.collection(VERSIONS_COLLECTION).document(name),
+        {"version": firestore.Increment(1), "updated_at": firestore.SERVER_TIMESTAMP},
+        merge=True,
+    )
@@ -1,8 +1,11 @@
+import datetime
 
 import pytest
 from unittest.mock import MagicMock, patch
 from httpx import AsyncClient
 
+from services.avistamentos import LIST_FIELDS
+
 @pytest.fixture
 def mock_db():
     with patch("api.endpoints.avistamentos.db") as mock:
@@ -15,7 +18,7 @@ def mock_query_avistamentos():
 
 @pytest.mark.asyncio
 async def test_list_avistamentos(async_client: AsyncClient, mock_query_avistamentos):
-    mock_query_avistamentos.return_value = ([], 1, 10, False)
+    mock_query_avistamentos.return_value = ([], 1, 10, False, None, None)
     
     response = await async_client.get("/avistamentos", headers={"Accept": "application/json"})
     
@@ -26,27 +29,21 @@ async def test_list_avistamentos(async_client: AsyncClient, mock_query_avistamen
     assert data["page_size"] == 10
 
 @pytest.mark.asyncio
-async def test_create_avistamento(async_client: AsyncClient, mock_db):
+async def test_create_avistamento(async_client: AsyncClient):
     registro_id = "123"
     payload = {"species": "Shark", "location": "Recife"}
     
-    # Mock the document reference and set method
-    mock_doc_ref = MagicMock()
-    mock_db.collection.return_value.document.return_value = mock_doc_ref
-    
-    # We need to send body as string because the endpoint expects 'body' from path/query/form?
-    # Wait, the endpoint signature is async def create_avistamento(registro, body).
-    # 'body' is treated as a query param by FastAPI if not using Body/Pydantic model.
-    # Let's verify how it behaves. If I pass query param ?body=... it works.
-    
+    # The endpoint signature is async def create_avistamento(registro, body):
+    # 'body' is treated as a query param by FastAPI, so it goes in ?body=...
     import json
     body_str = json.dumps(payload)
     
-    response = await async_client.post(f"/avistamentos/{registro_id}", params={"body": body_str})
+    with patch("api.endpoints.avistamentos.create_avistamento_doc", return_value=payload) as mock_create:
+        response = await async_client.post(f"/avistamentos/{registro_id}", params={"body": body_str})
     
     assert response.status_code == 200
     assert response.json()["message"] == "Avistamento criado com sucesso"
-    mock_doc_ref.set.assert_called_once_with(payload)
+    mock_create.assert_called_once_with(registro_id, payload)
 
 @pytest.mark.asyncio
 async def test_read_avistamento(async_client: AsyncClient, mock_db):
@@ -77,15 +74,206 @@ async def test_read_avistamento_not_found(async_client: AsyncClient, mock_db):
     assert response.status_code == 404
 
 @pytest.mark.asyncio
-async def test_delete_avistamento(async_client: AsyncClient, mock_db):
+async def test_delete_avistamento(async_client: AsyncClient):
     registro_id = "123"
-    mock_doc = MagicMock()
-    mock_doc.exists = True
-    
-    mock_db.collection.return_value.document.return_value.get.return_value = mock_doc
     
-    response = await async_client.delete(f"/avistamentos/{registro_id}", params={"format": "json"})
+    with patch("api.endpoints.avistamentos.delete_avistamento_doc", return_value=True) as mock_delete:
+        response = await async_client.delete(f"/avistamentos/{registro_id}", params={"format": "json"})
     
     assert response.status_code == 200
     assert response.json()["message"] == "Avistamento deletado com sucesso"
-    mock_db.collection.return_value.document.return_value.delete.assert_called_once()
+    mock_delete.assert_called_once_with(registro_id)
+
+@pytest.mark.asyncio
+async def test_delete_avistamento_not_found(async_client: AsyncClient):
+    with patch("api.endpoints.avistamentos.delete_avistamento_doc", return_value=False):
+        response = await async_client.delete("/avistamentos/999", params={"format": "json"})
+    
+    assert response.status_code == 404
+
+@pytest.mark.asyncio
+async def test_update_avistamento(async_client: AsyncClient):
+    updated = {"registro": "123", "species": "Ray"}
+    with patch("api.endpoints.avistamentos.update_avistamento_doc", return_value=updated) as mock_update:
+        response = await async_client.put(
+            "/avistamentos/123", params={"format": "json"}, json={"species": "Ray"}
+        )
+    
+    assert response.status_code == 200
+    assert response.json()["avistamento"] == updated
+    mock_update.assert_called_once_with("123", {"species": "Ray"})
+
+@pytest.mark.asyncio
+async def test_list_avistamentos_date_range(async_client: AsyncClient, mock_query_avistamentos):
+    mock_query_avistamentos.return_value = ([], 1, 10, False, None, None)
+
+    response = await async_client.get(
+        "/avistamentos", params={"format": "json", "date_start": "2024-03-01", "date_end": "2024-06-30"}
+    )
+
+    assert response.status_code == 200
+    kwargs = mock_query_avistamentos.call_args.kwargs
+    assert (kwargs["date_start"], kwargs["date_end"]) == (1709251200, 1719791999)
+
+    response = await async_client.get("/avistamentos", params={"format": "json", "date_start": "março"})
+    assert response.status_code == 400
+
+    # Intervalo com dia/mes/ano_registro exigiria outros índices compostos
+    response = await async_client.get(
+        "/avistamentos", params={"format": "json", "date_start": "2024-03-01", "ano_registro": 2024}
+    )
+    assert response.status_code == 400
+    response = await async_client.get("/avistamentos/export", params={"date_end": "2024-06-30", "mes_registro": 6})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_date_range_query_is_ordered_by_date(async_client: AsyncClient, fake_clients):
+    db, _ = fake_clients
+
+    response = await async_client.get("/avistamentos", params={"format": "json", "date_start": "1709251200"})
+
+    assert response.status_code == 200
+    assert db.collection.return_value.order_by.call_args.args == ("data_registro",)
+    date_filter = db.collection.return_value.order_by.return_value.order_by.return_value.order_by.return_value.where
+    assert date_filter.call_args.kwargs["filter"].field_path == "data_registro"
+
+@pytest.mark.asyncio
+async def test_read_avistamento_not_modified(async_client: AsyncClient, mock_db):
+    mock_doc = MagicMock()
+    mock_doc.exists = True
+    mock_doc.update_time = datetime.datetime(2024, 9, 1, 12, 0, tzinfo=datetime.timezone.utc)
+    mock_doc.to_dict.return_value = {"registro": "123", "species": "Shark"}
+    mock_db.collection.return_value.document.return_value.get.return_value = mock_doc
+
+    with patch("api.endpoints.avistamentos.generate_signed_url", return_value="https://storage.test/x") as mock_sign:
+        response = await async_client.get("/avistamentos/123", headers={"Accept": "application/json"})
+        etag = response.headers["ETag"]
+        assert response.headers["Cache-Control"] == "no-cache"
+
+        response = await async_client.get(
+            "/avistamentos/123", headers={"Accept": "application/json", "If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.content == b""
+        assert mock_sign.call_count == 1
+
+        # HTML é outra representação, com outra ETag
+        response = await async_client.get("/avistamentos/123", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+
+        # Documento alterado
+        mock_doc.update_time = datetime.datetime(2024, 9, 2, tzinfo=datetime.timezone.utc)
+        response = await async_client.get(
+            "/avistamentos/123", headers={"Accept": "application/json", "If-None-Match": etag}
+        )
+        assert response.status_code == 200
+
+@pytest.mark.asyncio
+async def test_list_avistamentos_not_modified(async_client: AsyncClient, mock_query_avistamentos):
+    mock_query_avistamentos.return_value = ([], 1, 10, False, None, None)
+
+    with patch("api.endpoints.avistamentos.cached_version", return_value=3) as mock_version:
+        response = await async_client.get("/avistamentos", params={"format": "json"})
+        etag = response.headers["ETag"]
+
+        response = await async_client.get("/avistamentos", params={"format": "json"}, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        mock_query_avistamentos.assert_called_once()
+
+        # Uma escrita incrementa a versão da coleção
+        mock_version.return_value = 4
+        response = await async_client.get("/avistamentos", params={"format": "json"}, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+@pytest.mark.asyncio
+async def test_batch_get_avistamentos(async_client: AsyncClient):
+    found = {"2": {"registro": "2"}, "1": None}
+    with patch("api.endpoints.avistamentos.get_avistamentos", return_value=found):
+        response = await async_client.post("/avistamentos:batchGet", json={"registros": ["2", "1"]})
+
+    assert response.status_code == 200
+    assert response.json()["results"] == [
+        {"registro": "2", "status": "found", "avistamento": {"registro": "2"}},
+        {"registro": "1", "status": "not_found"},
+    ]
+
+@pytest.mark.asyncio
+async def test_batch_update_and_delete_avistamentos(async_client: AsyncClient):
+    with patch(
+        "api.endpoints.avistamentos.update_avistamentos", return_value={"1": "updated", "2": "not_found"}
+    ) as mock_update:
+        response = await async_client.patch(
+            "/avistamentos:batch", json={"updates": {"1": {"local": "Sueste"}, "2": {"local": "Baía"}}}
+        )
+    assert response.status_code == 200
+    assert response.json()["totals"] == {"updated": 1, "not_found": 1}
+    mock_update.assert_called_once_with({"1": {"local": "Sueste"}, "2": {"local": "Baía"}})
+
+    with patch("api.endpoints.avistamentos.delete_avistamentos", return_value={"1": "deleted"}):
+        response = await async_client.request("DELETE", "/avistamentos:batch", json={"registros": ["1"]})
+    assert response.json()["results"] == [{"registro": "1", "status": "deleted"}]
+
+    response = await async_client.request(
+        "DELETE", "/avistamentos:batch", json={"registros": [str(i) for i in range(501)]}
+    )
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_list_avistamentos_fields(async_client: AsyncClient, mock_query_avistamentos):
+    mock_query_avistamentos.return_value = ([], 1, 10, False, None, None)
+
+    await async_client.get("/avistamentos", params={"format": "json", "fields": "local,registro"})
+    assert mock_query_avistamentos.call_args.kwargs["fields"] == ("local", "registro")
+
+    # Sem `fields`, o JSON traz todos os campos e o HTML só os da tabela
+    await async_client.get("/avistamentos", params={"format": "json"})
+    assert mock_query_avistamentos.call_args.kwargs["fields"] is None
+    await async_client.get("/avistamentos")
+    assert mock_query_avistamentos.call_args.kwargs["fields"] == LIST_FIELDS
+
+    response = await async_client.get("/avistamentos", params={"format": "json", "fields": "a b"})
+    assert response.status_code == 400
+
+def edit_form(**changes):
+    # Todos os campos enviados por templates/avistamentos/edit.html
+    form = {
+        "registro": "123", "nome_popular": "Tubarão-limão", "nome_cientifico": "Negaprion brevirostris",
+        "observador": "Ana", "classificacao_observador": "Guia",
+        "dia_registro": "1", "mes_registro": "9", "ano_registro": "2024",
+        "dia_registro_original": "1", "mes_registro_original": "9", "ano_registro_original": "2024",
+        "local": "Sueste", "quantidade": "1", "comportamento": "Nadando", "tamanho_estimado": "Médio",
+        "sexo": "F", "interacao": "Mergulho", "modo_registro": "Foto", "link_instagram": "",
+        "dia_anotacao": "", "mes_anotacao": "", "ano_anotacao": "", "responsavel_anotacao": "",
+        "operadora_empresa_foto": "", "recebido_por": "", "observacao": "", "outra_ID": "", "concatenado": "",
+    }
+    return {**form, **changes}
+
+@pytest.mark.asyncio
+async def test_edit_form_updates_avistamento(async_client: AsyncClient, fake_clients):
+    db, _ = fake_clients
+    doc = db.collection.return_value.document.return_value
+    doc.get.return_value.exists = True
+    doc.get.return_value.to_dict.return_value = {"registro": "123", "dia_registro": "1", "mes_registro": "9", "ano_registro": "2024"}
+
+    response = await async_client.get("/avistamentos/123/edit")
+    assert 'action="/avistamentos/123/edit"' in response.text
+    assert 'name="dia_registro_original" value="1"' in response.text
+    doc.get.reset_mock()
+
+    response = await async_client.post("/avistamentos/123/edit", data=edit_form(local="Baía"))
+
+    assert response.status_code == 303
+    assert response.headers["location"] == "/avistamentos/123"
+    # Data inalterada: um único commit, sem leitura
+    doc.get.assert_not_called()
+    fields = db.batch.return_value.update.call_args.args[1]
+    assert fields["local"] == "Baía" and fields["observador"] == "Ana"
+    assert not set(fields) & {"registro", "dia_registro", "mes_registro", "ano_registro", "dia_registro_original"}
+    db.batch.return_value.commit.assert_called_once()
+
+    # Data alterada: lê o documento para mover os contadores
+    response = await async_client.post("/avistamentos/123/edit", data=edit_form(dia_registro="2"))
+    assert response.status_code == 303
+    doc.get.assert_called_once()
+    assert db.batch.return_value.update.call_args.args[1]["dia_registro"] == "2"
@@ -1,4 +1,6 @@
 
+import datetime
+
 import pytest
 from unittest.mock import patch
 from httpx import AsyncClient
@@ -10,10 +12,33 @@ def mock_count_avistamentos():
 
 @pytest.mark.asyncio
 async def test_count_avistamentos(async_client: AsyncClient, mock_count_avistamentos):
-    mock_count_avistamentos.return_value = 42
+    mock_count_avistamentos.return_value = (42, None)
     
     response = await async_client.get("/avistamentos?count=true", headers={"Accept": "application/json"})
     
     assert response.status_code == 200
     assert response.json() == {"count": 42}
     mock_count_avistamentos.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_count_avistamentos_etag(async_client: AsyncClient, mock_count_avistamentos):
+    updated_at = datetime.datetime(2024, 9, 1, 12, 0, tzinfo=datetime.timezone.utc)
+    mock_count_avistamentos.return_value = (42, updated_at)
+
+    response = await async_client.get("/avistamentos?count=true&ano_registro=2024")
+
+    assert response.status_code == 200
+    assert response.headers["X-Counts-Updated-At"] == updated_at.isoformat()
+    etag = response.headers["ETag"]
+
+    response = await async_client.get(
+        "/avistamentos?count=true&ano_registro=2024", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+    # Outro filtro, outra ETag
+    response = await async_client.get(
+        "/avistamentos?count=true&ano_registro=2023", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
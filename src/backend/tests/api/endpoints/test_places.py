@@ -0,0 +1,79 @@
+
+import pytest
+from unittest.mock import patch
+from httpx import AsyncClient
+
+from services.places import PlaceIndex
+
+PLACES = [
+    {"name": "Square", "points": [{"lat": 0, "lon": 0}, {"lat": 0, "lon": 10}, {"lat": 10, "lon": 10}, {"lat": 10, "lon": 0}]},
+    {"name": "Overlap", "points": [{"lat": 5, "lon": 5}, {"lat": 5, "lon": 15}, {"lat": 15, "lon": 15}, {"lat": 15, "lon": 5}]},
+    {"name": "Degenerate", "points": [{"lat": 20, "lon": 20}, {"lat": 21, "lon": 21}]},
+]
+
+@pytest.fixture
+def place_index():
+    index = PlaceIndex(PLACES, cell_size=1.0)
+    with patch("api.endpoints.places.get_place_index", return_value=index):
+        yield index
+
+def test_lookup_first_match_wins():
+    index = PlaceIndex(PLACES, cell_size=1.0)
+
+    assert index.lookup(2, 2) == "Square"
+    assert index.lookup(7, 7) == "Square"
+    assert index.lookup(12, 12) == "Overlap"
+    assert index.lookup(-1, 2) is None
+    assert len(index) == 2
+
+def test_lookup_many_matches_lookup():
+    index = PlaceIndex(PLACES, cell_size=1.0)
+    lats = [2, 7, 12, -1, 20.5]
+    lons = [2, 7, 12, 2, 20.5]
+
+    assert index.lookup_many(lats, lons) == [index.lookup(lat, lon) for lat, lon in zip(lats, lons)]
+
+@pytest.mark.asyncio
+async def test_lookup_endpoint(async_client: AsyncClient, place_index):
+    response = await async_client.get("/places/lookup", params={"lat": 2, "lon": 3})
+
+    assert response.status_code == 200
+    assert response.json() == {"lat": 2, "lon": 3, "name": "Square"}
+
+@pytest.mark.asyncio
+async def test_batch_lookup_endpoint(async_client: AsyncClient, place_index):
+    payload = {"points": [{"lat": 2, "lon": 3}, {"lat": 50, "lon": 50}]}
+
+    response = await async_client.post("/places/lookup", json=payload)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 2
+    assert [r["name"] for r in data["results"]] == ["Square", None]
+
+@pytest.mark.asyncio
+async def test_batch_lookup_invalid_body(async_client: AsyncClient, place_index):
+    response = await async_client.post("/places/lookup", json={"points": [{"lat": "x"}]})
+
+    assert response.status_code == 400
+
+def test_oversized_polygons_are_not_gridded():
+    with patch("services.places.PLACES_GRID_MAX_CELLS", 50):
+        index = PlaceIndex(PLACES, cell_size=1.0)
+
+    # Square and Overlap span 121 cells each
+    assert index.oversized == [0, 1]
+    assert not index.grid
+    assert index.lookup(7, 7) == "Square"
+    assert index.lookup(12, 12) == "Overlap"
+    assert index.lookup(float("nan"), 2) is None
+
+@pytest.mark.asyncio
+async def test_lookup_rejects_non_finite_coordinates(async_client: AsyncClient, place_index):
+    response = await async_client.get("/places/lookup", params={"lat": "nan", "lon": 3})
+    assert response.status_code == 400
+    response = await async_client.get("/places/lookup", params={"lat": 2, "lon": "inf"})
+    assert response.status_code == 400
+
+    response = await async_client.post("/places/lookup", json={"points": [{"lat": 2, "lon": "-inf"}]})
+    assert response.status_code == 400
@@ -0,0 +1,52 @@
+import pytest
+from unittest.mock import patch
+from httpx import AsyncClient
+
+from services.sync import encode_watermark
+
+SINCE = encode_watermark({"avistamentos": (None, None), "avistamentos_removidos": (None, None), "telemetria": (None, None)}, None)
+
+
+@pytest.mark.asyncio
+async def test_sync_requires_a_valid_watermark(async_client: AsyncClient):
+    response = await async_client.get("/sync", params={"since": "x"})
+    assert response.status_code == 400
+
+    response = await async_client.get("/sync")
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_sync_not_modified(async_client: AsyncClient):
+    changes = {"watermark": SINCE, "has_more": False, "avistamentos": {"changed": [], "deleted": []}}
+    with patch("api.endpoints.sync.cached_version", return_value=3) as mock_version, patch(
+        "api.endpoints.sync.sync_changes", return_value=changes
+    ) as mock_changes:
+        response = await async_client.get("/sync", params={"since": SINCE})
+        assert response.json() == changes
+        etag = response.headers["ETag"]
+
+        response = await async_client.get("/sync", params={"since": SINCE}, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        mock_changes.assert_called_once_with(SINCE)
+
+        mock_version.return_value = 4
+        response = await async_client.get("/sync", params={"since": SINCE}, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_sync_bundle(async_client: AsyncClient, tmp_path):
+    path = tmp_path / "bundle.msgpack.gz"
+    with patch("api.endpoints.sync.SYNC_BUNDLE_PATH", str(path)):
+        response = await async_client.get("/sync/bundle")
+        assert response.status_code == 404
+
+        path.write_bytes(b"bundle")
+        response = await async_client.get("/sync/bundle")
+        assert response.status_code == 200
+        assert response.content == b"bundle"
+        assert response.headers["content-type"] == "application/gzip"
+
+        response = await async_client.get("/sync/bundle", headers={"If-None-Match": response.headers["ETag"]})
+        assert response.status_code == 304
@@ -4,6 +4,8 @@ from httpx import AsyncClient
 
 from unittest.mock import patch, MagicMock
 
+from services.pagination import InvalidCursor
+
 @pytest.fixture
 def mock_query_telemetria():
     with patch("api.endpoints.telemetria.query_telemetria") as mock:
@@ -12,7 +14,7 @@ def mock_query_telemetria():
 @pytest.mark.asyncio
 async def test_telemetry(async_client: AsyncClient, mock_query_telemetria):
     # Setup mock to return an empty list of items
-    mock_query_telemetria.return_value = ([], 1, 10, False)
+    mock_query_telemetria.return_value = ([], 1, 10, False, None, None)
     
     # Request JSON explicitly
     response = await async_client.get("/telemetria", headers={"Accept": "application/json"})
@@ -22,3 +24,91 @@ async def test_telemetry(async_client: AsyncClient, mock_query_telemetria):
     assert data["items"] == []
     assert data["page"] == 1
     assert data["page_size"] == 10
+
+@pytest.mark.asyncio
+async def test_telemetry_cursor(async_client: AsyncClient, mock_query_telemetria):
+    mock_query_telemetria.return_value = ([{"oid": "a", "date": 1}], 1, 10, True, "next-token", "prev-token")
+
+    response = await async_client.get("/telemetria", params={"format": "json", "cursor": "abc"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["next_cursor"] == "next-token"
+    assert data["prev_cursor"] == "prev-token"
+    assert mock_query_telemetria.call_args.kwargs["cursor"] == "abc"
+
+@pytest.mark.asyncio
+async def test_telemetry_invalid_cursor(async_client: AsyncClient, mock_query_telemetria):
+    mock_query_telemetria.side_effect = InvalidCursor("Invalid cursor: ???")
+
+    response = await async_client.get("/telemetria", params={"format": "json", "cursor": "???"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+@pytest.mark.asyncio
+async def test_telemetry_query_errors_are_not_cursor_errors(async_client: AsyncClient, mock_query_telemetria):
+    mock_query_telemetria.side_effect = ValueError("query failed")
+
+    with pytest.raises(ValueError):
+        await async_client.get("/telemetria", params={"format": "json"})
+
+def _snapshot(doc_id, data):
+    snapshot = MagicMock()
+    snapshot.id = doc_id
+    snapshot.to_dict.return_value = data
+    return snapshot
+
+@pytest.mark.asyncio
+async def test_telemetry_near_filters_geohash_ranges(async_client: AsyncClient, fake_clients):
+    db, _ = fake_clients
+    # Every geohash range query returns the same candidates; only exact matches are kept
+    db.collection.return_value.where.return_value.where.return_value.stream.side_effect = lambda: iter([
+        _snapshot("a_3", {"oid": "a", "date": 3, "latitude": -3.8501, "longitude": -32.42}),
+        _snapshot("a_1", {"oid": "a", "date": 1, "latitude": -3.85, "longitude": -32.42}),
+        _snapshot("a_2", {"oid": "a", "date": 2, "latitude": -3.95, "longitude": -32.42}),
+    ])
+
+    params = {"format": "json", "near": "-3.85,-32.42", "radius": 100, "page_size": 1}
+    response = await async_client.get("/telemetria", params=params)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["date"] for item in data["items"]] == [1]
+    first_range = db.collection.return_value.where.call_args_list[0].kwargs["filter"]
+    assert first_range.field_path == "geohash"
+
+    response = await async_client.get("/telemetria", params={**params, "cursor": data["next_cursor"]})
+    assert [item["date"] for item in response.json()["items"]] == [3]
+    assert response.json()["next_cursor"] is None
+
+    response = await async_client.get("/telemetria", params={"format": "json", "count": "true", "bbox": "-33,-4,-32,-3.9"})
+    assert response.json() == {"count": 1}
+
+@pytest.mark.asyncio
+async def test_telemetry_invalid_area(async_client: AsyncClient):
+    assert (await async_client.get("/telemetria", params={"near": "-3.85,-32.42"})).status_code == 400
+    assert (await async_client.get("/telemetria", params={"bbox": "1,2"})).status_code == 400
+    params = {"bbox": "-33,-4,-32,-3", "near": "-3.85,-32.42", "radius": 10}
+    assert (await async_client.get("/telemetria", params=params)).status_code == 400
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("count", ["false", "true"])
+@pytest.mark.parametrize(
+    "params, name",
+    [
+        ({"bbox": "-32,-4,-33,-3"}, "bbox"),  # min_lon > max_lon
+        ({"bbox": "-33,-3,-32,-4"}, "bbox"),  # min_lat > max_lat
+        ({"bbox": "-33,nan,-32,-3"}, "bbox"),
+        ({"bbox": "-33,-4,-32,inf"}, "bbox"),
+        ({"bbox": "-200,-4,-32,-3"}, "bbox"),
+        ({"near": "nan,-32.42", "radius": 10}, "near"),
+        ({"near": "-95,-32.42", "radius": 10}, "near"),
+        ({"near": "-3.85,-32.42", "radius": "inf"}, "radius"),
+    ],
+)
+async def test_telemetry_rejects_bad_area_values(async_client: AsyncClient, params, name, count):
+    response = await async_client.get("/telemetria", params={"format": "json", "count": count, **params})
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith(name)
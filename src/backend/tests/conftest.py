@@ -1,14 +1,55 @@
 
 import pytest
 import pytest_asyncio
+from unittest.mock import MagicMock
 from httpx import AsyncClient, ASGITransport
 from typing import AsyncGenerator
 from main import app
+from database import registry
+from services.query_cache import (
+    avistamentos_cache,
+    avistamentos_count_flight,
+    telemetria_cache,
+    telemetria_count_flight,
+)
+from services.heatmap import heatmap_cache, heatmap_points_cache
+from services.positions import position_index
+from services.storage import signed_url_cache
+from services import telemetria_analytics
+from services.tiles import tile_data_cache, tile_versions_cache
+from services.tracks import track_cache, track_points_cache
+from services.versions import versions_cache
 
 @pytest.fixture
 def anyio_backend():
     return 'asyncio'
 
+@pytest.fixture(autouse=True)
+def fake_clients():
+    # Keeps tests offline: nothing should reach the real Google Cloud clients
+    firestore_client = MagicMock()
+    storage_client = MagicMock()
+    storage_client.bucket.return_value.blob.return_value.generate_signed_url.return_value = (
+        "https://storage.test/signed"
+    )
+    registry.override(firestore=firestore_client, storage=storage_client)
+    yield firestore_client, storage_client
+    registry.close()
+    signed_url_cache.clear()
+    avistamentos_cache.clear()
+    telemetria_cache.clear()
+    avistamentos_count_flight.clear()
+    telemetria_count_flight.clear()
+    track_cache.clear()
+    track_points_cache.clear()
+    position_index.clear()
+    heatmap_cache.clear()
+    heatmap_points_cache.clear()
+    telemetria_analytics.clear()
+    tile_versions_cache.clear()
+    tile_data_cache.clear()
+    versions_cache.clear()
+
 @pytest_asyncio.fixture
 async def async_client() -> AsyncGenerator[AsyncClient, None]:
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
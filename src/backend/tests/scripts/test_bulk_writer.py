@@ -0,0 +1,154 @@
+import sys
+from pathlib import Path
+
+import pytest
+from google.api_core import exceptions
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+
+from bulk_writer import MAX_BATCH_SIZE, BulkImporter, Checkpoint, document_id  # noqa: E402
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.writes = []
+
+    def set(self, ref, data):
+        self.writes.append(ref)
+
+    def __len__(self):
+        return len(self.writes)
+
+    def commit(self):
+        self.db.attempts += 1
+        error = self.db.failures.get(self.writes[0])
+        if error is not None:
+            if self.db.fail_once:
+                del self.db.failures[self.writes[0]]
+            raise error
+        self.db.committed.extend(self.writes)
+        self.db.commits.append(len(self.writes))
+
+
+class FakeDB:
+    """
+    Records committed document IDs. A commit whose first document is in
+    `failures` raises the mapped error (only once with `fail_once`).
+    """
+
+    def __init__(self, failures=None, fail_once=True):
+        self.failures = dict(failures or {})
+        self.fail_once = fail_once
+        self.attempts = 0
+        self.committed = []
+        self.commits = []  # writes per committed batch
+
+    def collection(self, name):
+        return self
+
+    def document(self, doc_id):
+        return doc_id
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+def rows(count):
+    return [(f"d{i}", {"i": i}) for i in range(count)]
+
+
+def test_transient_failure_is_retried(tmp_path):
+    db = FakeDB({"d4": exceptions.ServiceUnavailable("busy")})
+    checkpoint = Checkpoint(tmp_path / "import.checkpoint", source="test.csv")
+    importer = BulkImporter(db, "telemetria", checkpoint=checkpoint, batch_size=2, max_in_flight=1, base_delay=0)
+
+    assert importer.run(rows(7)) == 7
+    assert sorted(db.committed) == sorted(doc_id for doc_id, _ in rows(7))
+    assert db.attempts == 5  # 4 batches, one of them twice
+    assert not checkpoint.path.exists()
+
+
+def test_resume_after_failed_batch(tmp_path):
+    path = tmp_path / "import.checkpoint"
+    db = FakeDB({"d2": exceptions.ServiceUnavailable("down")}, fail_once=False)
+    importer = BulkImporter(
+        db, "telemetria", checkpoint=Checkpoint(path, "test.csv"), batch_size=2, max_in_flight=1,
+        max_retries=1, base_delay=0,
+    )
+
+    with pytest.raises(exceptions.ServiceUnavailable):
+        importer.run(rows(7))
+
+    # Only the batch before the failed one is recorded
+    assert Checkpoint(path, "test.csv").load() == 2
+    assert Checkpoint(path, "other.csv").load() == 0
+
+    db.failures.clear()
+    db.committed.clear()
+    importer = BulkImporter(db, "telemetria", checkpoint=Checkpoint(path, "test.csv"), batch_size=2, max_in_flight=1)
+    assert importer.run(rows(7)) == 7
+    assert db.committed == [f"d{i}" for i in range(2, 7)]
+
+
+def test_checkpoint_waits_for_earlier_batches(tmp_path):
+    # Batches after the failed one may commit in parallel, but the resume
+    # point never passes a batch that did not commit
+    path = tmp_path / "import.checkpoint"
+    db = FakeDB({"d2": exceptions.ServiceUnavailable("down")}, fail_once=False)
+    importer = BulkImporter(
+        db, "telemetria", checkpoint=Checkpoint(path, "test.csv"), batch_size=2, max_in_flight=4,
+        max_retries=0, base_delay=0,
+    )
+
+    with pytest.raises(exceptions.ServiceUnavailable):
+        importer.run(rows(10))
+
+    resume = Checkpoint(path, "test.csv").load()
+    assert resume in (0, 2)
+    assert "d2" not in db.committed
+
+    db.failures.clear()
+    importer = BulkImporter(db, "telemetria", checkpoint=Checkpoint(path, "test.csv"), batch_size=2)
+    importer.run(rows(10))
+    assert set(db.committed) == {f"d{i}" for i in range(10)}
+
+
+def test_chunk_over_the_write_limit_is_split():
+    def extra_writes(batch, docs):
+        # Two rollup increments per document
+        for doc_id, _ in docs:
+            batch.set(f"count-{doc_id}-a", {})
+            batch.set(f"count-{doc_id}-b", {})
+
+    db = FakeDB()
+    importer = BulkImporter(db, "avistamentos", batch_size=MAX_BATCH_SIZE, extra_writes=extra_writes)
+
+    assert importer.run(rows(600)) == 600
+    assert max(db.commits) <= MAX_BATCH_SIZE
+    assert sum(db.commits) == 600 * 3
+
+
+def test_versions_are_bumped_once_per_checkpoint(tmp_path):
+    bumps = []
+
+    def version_writes(batch, docs):
+        bumps.append(len(docs))
+        batch.set("versoes/telemetria", {})
+
+    db = FakeDB()
+    importer = BulkImporter(
+        db, "telemetria", checkpoint=Checkpoint(tmp_path / "import.checkpoint", "test.csv"), batch_size=2,
+        max_in_flight=1, version_writes=version_writes,
+    )
+
+    assert importer.run(rows(5)) == 5
+    assert sum(bumps) == 5
+    assert db.committed.count("versoes/telemetria") == len(bumps)
+    assert all(size <= 2 for size in db.commits)
+
+
+def test_document_id_escapes_slashes():
+    assert document_id("123", 1725148800) == "123_1725148800"
+    assert document_id("tag/7", 1) == "tag%2F7_1"
+    assert document_id("tag%2F7", 1) == "tag%252F7_1"
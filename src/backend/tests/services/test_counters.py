@@ -0,0 +1,307 @@
+import datetime
+from unittest.mock import MagicMock
+
+import pytest
+from google.cloud.firestore import SERVER_TIMESTAMP
+
+from database import registry
+from services import counters
+from services.avistamentos import (
+    count_avistamentos,
+    create_avistamento_doc,
+    delete_avistamento_doc,
+    delete_avistamentos,
+    patch_avistamento_doc,
+    update_avistamento_doc,
+    update_avistamentos,
+)
+from services.counters import (
+    DAY,
+    avistamento_date,
+    avistamento_deltas,
+    count_avistamentos_rollup,
+    count_telemetria_rollup,
+    telemetria_bucket,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_ready():
+    counters._ready.clear()
+    counters._not_ready_until.clear()
+    yield
+    counters._ready.clear()
+    counters._not_ready_until.clear()
+
+
+def rollup(count, updated_at=None):
+    snapshot = MagicMock()
+    snapshot.to_dict.return_value = {"count": count, "updated_at": updated_at}
+    return snapshot
+
+
+def stored(data):
+    snapshot = MagicMock()
+    snapshot.exists = data is not None
+    snapshot.to_dict.return_value = data
+    return snapshot
+
+
+def test_avistamento_deltas():
+    old = {"ano_registro": "2024", "mes_registro": "9", "dia_registro": "1"}
+    moved = {**old, "dia_registro": "2"}
+
+    assert avistamento_deltas(None, old) == {("2024", "9", "1"): 1}
+    assert avistamento_deltas(old, None) == {("2024", "9", "1"): -1}
+    assert avistamento_deltas(old, {**old, "local": "Sueste"}) == {}
+    assert avistamento_deltas(old, moved) == {("2024", "9", "1"): -1, ("2024", "9", "2"): 1}
+
+
+def test_telemetria_bucket_uses_utc_day():
+    assert telemetria_bucket({"oid": "a", "date": 3 * DAY + 5}) == ("a", 3 * DAY)
+    assert telemetria_bucket({"oid": "a", "date": None}) == ("a", None)
+
+
+def test_telemetria_rollup_ids_escape_slashes():
+    db = registry.firestore
+    batch = MagicMock()
+    counters.add_telemetria_counts(batch, {("tag/7", DAY): 2, ("50%", None): 1})
+
+    assert [call.args[0] for call in db.collection.return_value.document.call_args_list] == [
+        "tag%2F7_86400",
+        "50%25_none",
+    ]
+
+    db.collection.return_value.select.return_value.stream.return_value = [
+        MagicMock(**{"to_dict.return_value": {"oid": "tag/7", "date": DAY + 5}})
+    ]
+    db.collection.return_value.document.reset_mock()
+    counters.reconcile_telemetria_counts()
+    assert "tag%2F7_86400" in [call.args[0] for call in db.collection.return_value.document.call_args_list]
+
+
+def test_telemetria_rollup_counts_partial_days_raw():
+    db = registry.firestore
+    newer = datetime.datetime(2024, 9, 2, tzinfo=datetime.timezone.utc)
+    query = db.collection.return_value.where.return_value
+    query.where.return_value.where.return_value.stream.return_value = [
+        rollup(10, datetime.datetime(2024, 9, 1, tzinfo=datetime.timezone.utc)),
+        rollup(5, newer),
+    ]
+    raw_ranges = []
+
+    def count_raw(start, end):
+        raw_ranges.append((start, end))
+        return 1
+
+    # From the middle of day 1 to the middle of day 4: days 2 and 3 are whole
+    total, updated_at = count_telemetria_rollup("a", DAY + 100, 4 * DAY + 100, count_raw)
+
+    assert total == 17
+    assert updated_at == newer
+    assert raw_ranges == [(DAY + 100, 2 * DAY - 1), (4 * DAY, 4 * DAY + 100)]
+
+
+def test_telemetria_rollup_within_one_day_is_raw():
+    total, updated_at = count_telemetria_rollup("a", DAY + 10, DAY + 20, lambda start, end: 3)
+
+    assert (total, updated_at) == (3, None)
+    registry.firestore.collection.return_value.where.return_value.stream.assert_not_called()
+
+
+def test_count_avistamentos_falls_back_until_reconciled():
+    db = registry.firestore
+    db.collection.return_value.document.return_value.get.return_value = stored(None)
+    aggregate = MagicMock()
+    aggregate.value = 7
+    query = db.collection.return_value.order_by.return_value.order_by.return_value
+    query.count.return_value.get.return_value = [[aggregate]]
+
+    assert count_avistamentos() == (7, None)
+
+    # Seen after ROLLUPS_CHECK_INTERVAL
+    db.collection.return_value.document.return_value.get.return_value = stored({})
+    db.collection.return_value.stream.return_value = [rollup(4), rollup(3)]
+    counters._not_ready_until.clear()
+
+    assert count_avistamentos() == (7, None)
+    db.collection.return_value.stream.assert_called_once()
+
+
+def test_create_new_avistamento_increments_its_bucket():
+    db = registry.firestore
+    data = {"registro": "1", "ano_registro": "2024", "mes_registro": "9", "dia_registro": "1"}
+    db.collection.return_value.document.return_value.get.return_value = stored(None)
+
+    stored_data = {**data, "data_registro": 1725148800}  # 2024-09-01T00:00:00Z
+    assert create_avistamento_doc("1", data) == stored_data
+
+    batch = db.batch.return_value
+    batch.create.assert_called_once_with(
+        db.collection.return_value.document.return_value, {**stored_data, "updated_at": SERVER_TIMESTAMP}
+    )
+    batch.delete.assert_called_once()  # tombstone of a previous deletion
+    assert batch.set.call_count == 2  # rollup increment and sightings version
+    assert batch.set.call_args.kwargs == {"merge": True}
+    batch.commit.assert_called_once()
+
+
+def test_update_moving_bucket_is_retried_on_contention():
+    from google.api_core.exceptions import FailedPrecondition
+
+    db = registry.firestore
+    old = {"ano_registro": "2024", "mes_registro": "9", "dia_registro": "1"}
+    db.collection.return_value.document.return_value.get.return_value = stored(old)
+    db.batch.return_value.commit.side_effect = [FailedPrecondition("changed"), None]
+
+    updated = update_avistamento_doc("1", {"dia_registro": "2"})
+
+    assert updated == {**old, "dia_registro": "2", "data_registro": 1725235200}
+    assert db.batch.return_value.update.call_args.args[1] == {
+        "dia_registro": "2",
+        "data_registro": 1725235200,
+        "updated_at": SERVER_TIMESTAMP,
+    }
+    assert db.batch.return_value.commit.call_count == 2
+    # Each attempt decrements the old bucket, increments the new one and bumps the version
+    assert db.batch.return_value.set.call_count == 6
+
+
+def test_avistamento_date_normalizes_strings():
+    assert avistamento_date({"ano_registro": "2024", "mes_registro": "03", "dia_registro": "2"}) == 1709337600
+    assert avistamento_date({"ano_registro": "2024", "mes_registro": "3", "dia_registro": "02"}) == 1709337600
+    assert avistamento_date({"ano_registro": "2024", "mes_registro": "2", "dia_registro": "30"}) is None
+    assert avistamento_date({"ano_registro": "", "mes_registro": "2", "dia_registro": "3"}) is None
+
+
+def test_rollup_count_with_date_range():
+    db = registry.firestore
+    db.collection.return_value.stream.return_value = [
+        stored({"ano_registro": "2024", "mes_registro": m, "dia_registro": "1", "count": 10}) for m in ("2", "3", "6", "7")
+    ]
+
+    # March to June 2024
+    total, _ = count_avistamentos_rollup(date_start=1709251200, date_end=1719791999)
+
+    assert total == 20
+
+
+def test_missing_avistamento_is_not_written():
+    db = registry.firestore
+    db.collection.return_value.document.return_value.get.return_value = stored(None)
+
+    assert update_avistamento_doc("1", {"local": "Sueste"}) is None
+    assert delete_avistamento_doc("1") is False
+    db.batch.assert_not_called()
+
+
+def test_patch_is_a_single_commit_without_reads():
+    from google.api_core.exceptions import NotFound
+
+    db = registry.firestore
+
+    assert patch_avistamento_doc("1", {"local": "Sueste", "data_registro": 0, "updated_at": 0}) is True
+
+    db.collection.return_value.document.return_value.get.assert_not_called()
+    assert db.batch.return_value.update.call_args.args[1] == {"local": "Sueste", "updated_at": SERVER_TIMESTAMP}
+    assert db.write_option.call_args.kwargs == {"exists": True}
+    assert db.batch.return_value.commit.call_count == 1
+    assert db.batch.return_value.set.call_count == 1  # sightings version
+
+    db.batch.return_value.commit.side_effect = NotFound("missing")
+    assert patch_avistamento_doc("2", {"local": "Sueste"}) is False
+
+
+def test_patch_changing_date_reads_for_the_rollups():
+    db = registry.firestore
+    old = {"ano_registro": "2024", "mes_registro": "9", "dia_registro": "1"}
+    db.collection.return_value.document.return_value.get.return_value = stored(old)
+
+    assert patch_avistamento_doc("1", {"dia_registro": "2"}) is True
+
+    db.collection.return_value.document.return_value.get.assert_called_once()
+    assert db.batch.return_value.set.call_count == 3
+
+
+def snapshot_of(registro, data):
+    snapshot = stored(data)
+    snapshot.id = registro
+    return snapshot
+
+
+def test_batch_update_is_one_read_and_one_commit():
+    db = registry.firestore
+    db.get_all.return_value = [
+        snapshot_of("1", {"ano_registro": "2024", "mes_registro": "9", "dia_registro": "1"}),
+        snapshot_of("2", {"ano_registro": "2024", "mes_registro": "9", "dia_registro": "1"}),
+        snapshot_of("3", None),
+    ]
+
+    results = update_avistamentos({"1": {"dia_registro": "2"}, "2": {"dia_registro": "2"}, "3": {"local": "x"}})
+
+    assert results == {"1": "updated", "2": "updated", "3": "not_found"}
+    db.get_all.assert_called_once()
+    assert db.batch.return_value.update.call_count == 2
+    assert db.batch.return_value.commit.call_count == 1
+    # Deltas summed per bucket: -2 for day 1, +2 for day 2, and the version
+    assert db.batch.return_value.set.call_count == 3
+
+
+def test_batch_delete_of_missing_documents_does_not_commit():
+    db = registry.firestore
+    db.get_all.return_value = [snapshot_of("1", None)]
+
+    assert delete_avistamentos(["1"]) == {"1": "not_found"}
+    db.batch.return_value.commit.assert_not_called()
+
+
+def test_batch_delete_writes_tombstones():
+    db = registry.firestore
+    db.get_all.return_value = [snapshot_of("1", {"ano_registro": "2024", "mes_registro": "9", "dia_registro": "1"})]
+
+    assert delete_avistamentos(["1"]) == {"1": "deleted"}
+    db.collection.assert_any_call("avistamentos_removidos")
+    tombstone = db.batch.return_value.set.call_args_list[0].args[1]
+    assert tombstone == {"registro": db.collection.return_value.document.return_value.id, "updated_at": SERVER_TIMESTAMP}
+    # Tombstone, rollup decrement and sightings version
+    assert db.batch.return_value.set.call_count == 3
+
+
+def test_rollups_not_ready_is_cached():
+    db = registry.firestore
+    meta = db.collection.return_value.document.return_value
+    meta.get.return_value = stored(None)
+
+    assert counters.rollups_ready("avistamentos") is False
+    assert counters.rollups_ready("avistamentos") is False
+    meta.get.assert_called_once()
+
+    meta.get.return_value = stored({})
+    counters._not_ready_until.clear()
+    assert counters.rollups_ready("avistamentos") is True
+    assert counters.rollups_ready("avistamentos") is True
+    assert meta.get.call_count == 2
+
+
+def test_reconcile_lease():
+    from google.api_core.exceptions import AlreadyExists
+
+    db = registry.firestore
+    lease = db.collection.return_value.document.return_value
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    lease.get.return_value = stored(None)
+    assert counters.acquire_reconcile_lease("a", 60) is True
+    assert lease.create.call_args.args[0]["holder"] == "a"
+
+    # Another worker created it first
+    lease.create.side_effect = AlreadyExists("taken")
+    assert counters.acquire_reconcile_lease("b", 60) is False
+
+    lease.get.return_value = stored({"holder": "a", "expires_at": now + datetime.timedelta(seconds=30)})
+    assert counters.acquire_reconcile_lease("b", 60) is False
+    lease.update.assert_not_called()
+
+    lease.get.return_value = stored({"holder": "a", "expires_at": now - datetime.timedelta(seconds=1)})
+    assert counters.acquire_reconcile_lease("b", 60) is True
+    assert lease.update.call_args.kwargs["option"] == db.write_option.return_value
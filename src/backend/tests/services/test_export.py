@@ -0,0 +1,111 @@
+import asyncio
+import datetime
+import json
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from services.export import encode_arrow, encode_csv, encode_ndjson, iter_chunks
+from services.pagination import DOCUMENT_ID
+
+
+def snapshot(doc_id, data):
+    snap = MagicMock()
+    snap.id = doc_id
+    snap.to_dict.return_value = data
+    return snap
+
+
+async def chunks_of(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def run(iterator):
+    return asyncio.run(collect(iterator))
+
+
+def test_iter_chunks_follows_the_order_key():
+    docs = [snapshot(f"d{i}", {"date": i}) for i in range(5)]
+    query = MagicMock()
+    query.limit.return_value.stream.return_value = docs[:2]
+    query.start_after.return_value.limit.return_value.stream.side_effect = [docs[2:4], docs[4:]]
+
+    chunks = run(iter_chunks(query, ["date", DOCUMENT_ID], chunk_size=2))
+
+    assert chunks == [[{"date": 0}, {"date": 1}], [{"date": 2}, {"date": 3}], [{"date": 4}]]
+    assert [c.args[0] for c in query.start_after.call_args_list] == [
+        {"date": 1, DOCUMENT_ID: "d1"},
+        {"date": 3, DOCUMENT_ID: "d3"},
+    ]
+
+
+def test_ndjson():
+    body = b"".join(run(encode_ndjson(chunks_of([{"a": 1}], [{"a": "ç"}]))))
+
+    assert [json.loads(line) for line in body.decode().splitlines()] == [{"a": 1}, {"a": "ç"}]
+
+
+def test_ndjson_timestamps_are_iso_8601():
+    updated_at = datetime.datetime(2024, 9, 1, 12, 0, tzinfo=datetime.timezone.utc)
+    body = b"".join(run(encode_ndjson(chunks_of([{"updated_at": updated_at, "n": np.int64(3)}]))))
+
+    assert json.loads(body) == {"updated_at": "2024-09-01T12:00:00+00:00", "n": 3}
+
+
+def test_csv_uses_given_columns():
+    body = b"".join(run(encode_csv(chunks_of([{"a": 1, "b": 2}], [{"a": 3}]), ["a", "b"])))
+
+    assert body.decode().splitlines() == ["a,b", "1,2", "3,"]
+
+
+def test_csv_header_only_when_empty():
+    assert b"".join(run(encode_csv(chunks_of(), ["a", "b"]))) == b"a,b\r\n"
+
+
+def test_arrow_stream():
+    pa = pytest.importorskip("pyarrow")
+    chunks = chunks_of([{"oid": "x", "date": 1}], [{"oid": None, "date": 2, "extra": "ignored"}])
+
+    body = b"".join(run(encode_arrow(chunks, ["oid", "date"], {"date": "int64"})))
+    table = pa.ipc.open_stream(body).read_all()
+
+    assert table.num_rows == 2
+    assert table.schema.field("date").type == pa.int64()
+    assert table.to_pylist() == [{"oid": "x", "date": 1}, {"oid": None, "date": 2}]
+
+
+@pytest.mark.asyncio
+async def test_telemetry_export_endpoint(async_client):
+    rows = [{"oid": "a", "title": "Shark", "date": 10, "latitude": -3.8, "longitude": -32.4, "notes": ""}]
+    with patch("services.telemetria.iter_chunks", return_value=chunks_of(rows)):
+        response = await async_client.get("/telemetria/export", params={"format": "csv", "oid": "a"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.splitlines() == [
+        "oid,title,date,latitude,longitude,notes,place",
+        "a,Shark,10,-3.8,-32.4,,",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_sightings_export_endpoint(async_client):
+    with patch("services.avistamentos.iter_chunks", return_value=chunks_of([{"registro": "1"}])):
+        response = await async_client.get("/avistamentos/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.json() == {"registro": "1"}
+
+
+@pytest.mark.asyncio
+async def test_export_rejects_unknown_format(async_client):
+    response = await async_client.get("/telemetria/export", params={"format": "xml"})
+
+    assert response.status_code == 400
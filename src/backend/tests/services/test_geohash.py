@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from services import geohash
+
+
+def test_known_geohash():
+    assert geohash.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+
+def test_encode_many_matches_scalar():
+    lats = np.array([-3.85, 0.0, 45.5, -89.9])
+    lons = np.array([-32.42, 0.0, -120.1, 179.9])
+
+    codes = geohash.encode_many(lats, lons, 7)
+
+    assert codes.tolist() == [geohash.encode(lat, lon, 7) for lat, lon in zip(lats, lons)]
+
+
+def test_bounds_contain_point():
+    code = geohash.encode(-3.85, -32.42, 6)
+    min_lat, min_lon, max_lat, max_lon = geohash.bounds(code)
+
+    assert min_lat <= -3.85 <= max_lat
+    assert min_lon <= -32.42 <= max_lon
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        geohash.bounds("abc")  # 'a' is not a geohash character
+    with pytest.raises(ValueError):
+        geohash.encode_many([0], [0], 0)
+
+
+def test_covering_ranges_contain_every_point_of_the_box():
+    box = (-3.9, -32.5, -3.8, -32.35)
+    ranges = geohash.covering_ranges(*box, max_ranges=4)
+    assert 1 <= len(ranges) <= 4
+
+    rng = np.random.default_rng(0)
+    lats = rng.uniform(box[0], box[2], 500)
+    lons = rng.uniform(box[1], box[3], 500)
+    for code in geohash.encode_many(lats, lons, 9):
+        assert any(start <= code < end for start, end in ranges)
+    # Far away points are left out
+    assert not any(start <= geohash.encode(10.0, 10.0, 9) < end for start, end in ranges)
+
+
+def test_covering_ranges_of_an_empty_box():
+    assert geohash.covering_ranges(-3.8, -32.5, -3.9, -32.35) == []
+    assert geohash.covering_ranges(-3.9, -32.35, -3.8, -32.5) == []
+    assert geohash.covering_ranges(float("nan"), -32.5, -3.8, -32.35) == []
@@ -0,0 +1,72 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from services.heatmap import aggregate_grid, dwell_times, heatmap
+
+
+def test_dwell_times_ignore_long_gaps():
+    assert dwell_times(np.array([0, 100, 300, 100000]), max_gap=1000).tolist() == [50, 150, 100, 0]
+
+
+def test_aggregate_grid():
+    cells = aggregate_grid(np.array([0.1, 0.2, 1.5]), np.array([0.1, 0.3, 0.5]), np.ones(3), cell=1.0)
+
+    assert cells["value"].tolist() == [2, 1]
+    assert cells["lat"].tolist() == [0.5, 1.5]
+    assert cells["lon"].tolist() == [0.5, 0.5]
+
+
+@pytest.fixture
+def positions():
+    dates = np.array([0, 100, 200, 300], dtype=np.int64)
+    lats = np.array([-3.86, -3.87, -3.96, -3.97])
+    lons = np.array([-32.41, -32.41, -32.41, -32.41])
+    with patch("services.positions.load_positions", return_value=(dates, lats, lons)) as mock, \
+            patch("services.positions.get_version", return_value=0):
+        yield mock
+
+
+def test_heatmap_is_cached_per_level(positions):
+    with patch("services.heatmap.aggregate_grid", wraps=aggregate_grid) as aggregate:
+        first = heatmap(oids=["a"], cell=0.05)
+        panned = heatmap(oids=["a"], cell=0.05, bbox=(-33, -3.9, -32, -3.8))
+        heatmap(oids=["a"], cell=0.5)
+
+    assert [c["value"] for c in first["cells"]] == [2, 2]
+    assert [c["value"] for c in panned["cells"]] == [2]
+    assert aggregate.call_count == 2
+    assert positions.call_count == 1
+
+
+def test_heatmap_of_every_animal_reuses_the_oid_list(positions):
+    with patch("services.telemetria_analytics.rollups_ready", return_value=True), \
+            patch("services.telemetria_analytics.cached_version", return_value=3), \
+            patch("services.telemetria_analytics.db") as db:
+        stream = db.collection.return_value.select.return_value.stream
+        stream.return_value = [type("Snapshot", (), {"to_dict": lambda self: {"oid": "a"}})()]
+        first = heatmap(cell=0.05)
+        heatmap(cell=0.05, bbox=(-33, -3.9, -32, -3.8))
+
+    assert [c["value"] for c in first["cells"]] == [2, 2]
+    assert stream.call_count == 1
+
+
+def test_heatmap_dwell_and_date_range(positions):
+    result = heatmap(oids=["a"], date_start=100, date_end=300, weight="dwell", geohash_precision=5)
+
+    assert sum(c["value"] for c in result["cells"]) == 200
+    assert all(len(c["geohash"]) == 5 for c in result["cells"])
+
+
+@pytest.mark.asyncio
+async def test_heatmap_endpoint(async_client, positions):
+    response = await async_client.get("/telemetria/heatmap", params={"oid": "a", "zoom": 4})
+    assert response.status_code == 200
+    assert response.json()["max"] == 4
+
+    response = await async_client.get("/telemetria/heatmap", params={"oid": "a", "zoom": 8, "geohash": 5})
+    assert response.status_code == 400
+    response = await async_client.get("/telemetria/heatmap", params={"bbox": "1,2,3"})
+    assert response.status_code == 400
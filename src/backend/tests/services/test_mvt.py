@@ -0,0 +1,109 @@
+import struct
+
+import numpy as np
+
+from services import mvt
+
+
+def _read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return result, pos
+
+
+def _fields(data):
+    # Minimal protobuf reader: list of (field number, value)
+    pos, fields = 0, []
+    while pos < len(data):
+        key, pos = _read_varint(data, pos)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        else:
+            length, pos = _read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        fields.append((number, value))
+    return fields
+
+
+def _packed(data):
+    pos, values = 0, []
+    while pos < len(data):
+        value, pos = _read_varint(data, pos)
+        values.append(value)
+    return values
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def _decode_value(data):
+    number, value = _fields(data)[0]
+    if number == 1:
+        return value.decode()
+    if number == 3:
+        return struct.unpack("<d", value)[0]
+    if number == 6:
+        return _unzigzag(value)
+    if number == 7:
+        return bool(value)
+    return value
+
+
+def decode_tile(data):
+    """
+    Decodes an MVT tile into {layer: {"extent", "features": [(type, id, properties, commands)]}}.
+    """
+    layers = {}
+    for _, layer_data in _fields(data):
+        fields = _fields(layer_data)
+        keys = [value.decode() for number, value in fields if number == 3]
+        values = [_decode_value(value) for number, value in fields if number == 4]
+        features = []
+        for number, value in fields:
+            if number != 2:
+                continue
+            feature = dict(_fields(value))
+            tags = _packed(feature.get(2, b""))
+            properties = {keys[k]: values[v] for k, v in zip(tags[::2], tags[1::2])}
+            features.append((feature[3], feature.get(1), properties, _packed(feature[4])))
+        name = next(value for number, value in fields if number == 1).decode()
+        extent = next(value for number, value in fields if number == 5)
+        layers[name] = {"extent": extent, "features": features}
+    return layers
+
+
+def test_points_and_properties_round_trip():
+    layer = mvt.Layer("pts", extent=4096)
+    layer.add_feature(mvt.POINT, [np.array([[25, 17]])], {"name": "Sancho", "count": 3, "t": -2, "x": 1.5})
+    layer.add_feature(mvt.POINT, [np.array([[1, 1], [2, 2]])], {"name": "Sancho", "ok": True}, feature_id=7)
+
+    decoded = decode_tile(mvt.encode_tile([layer, mvt.Layer("empty")]))
+
+    assert list(decoded) == ["pts"]
+    assert decoded["pts"]["extent"] == 4096
+    (type1, id1, props1, cmds1), (type2, id2, props2, cmds2) = decoded["pts"]["features"]
+    assert (type1, id1, props1) == (mvt.POINT, None, {"name": "Sancho", "count": 3, "t": -2, "x": 1.5})
+    assert cmds1 == [9, 50, 34]  # MoveTo(1), zigzag(25), zigzag(17)
+    assert (id2, props2) == (7, {"name": "Sancho", "ok": True})
+    # The cursor of every feature starts at (0, 0)
+    assert cmds2 == [17, 2, 2, 2, 2]
+
+
+def test_polygon_commands():
+    ring = np.array([[3, 6], [8, 12], [20, 34]])
+    assert mvt.ring_area(ring) > 0
+
+    layer = mvt.Layer("poly")
+    layer.add_feature(mvt.POLYGON, [ring])
+
+    _, _, _, commands = decode_tile(mvt.encode_tile([layer]))["poly"]["features"][0]
+    assert commands == [9, 6, 12, 18, 10, 12, 24, 44, 15]
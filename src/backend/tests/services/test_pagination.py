@@ -0,0 +1,75 @@
+
+import pytest
+from unittest.mock import MagicMock
+
+from services.pagination import (
+    encode_cursor,
+    decode_cursor,
+    paginate,
+    DOCUMENT_ID,
+    CURSOR_NEXT,
+    CURSOR_PREV,
+    InvalidCursor,
+)
+
+ORDER_FIELDS = ["date", DOCUMENT_ID]
+
+
+def make_snapshot(doc_id, date):
+    snapshot = MagicMock()
+    snapshot.id = doc_id
+    snapshot.to_dict.return_value = {"date": date}
+    return snapshot
+
+
+def test_cursor_roundtrip():
+    token = encode_cursor([1700000000, "abc"], CURSOR_PREV)
+    assert decode_cursor(token) == ([1700000000, "abc"], CURSOR_PREV)
+
+
+def test_decode_invalid_cursor():
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
+
+
+def test_paginate_with_cursor_uses_start_after():
+    query = MagicMock()
+    snapshots = [make_snapshot(f"d{i}", i) for i in range(3)]
+    query.start_after.return_value.limit.return_value.stream.return_value = snapshots
+
+    cursor = encode_cursor([0, "d0"])
+    docs, has_more, next_cursor, prev_cursor = paginate(query, ORDER_FIELDS, 1, 2, cursor=cursor)
+
+    query.start_after.assert_called_once_with({"date": 0, DOCUMENT_ID: "d0"})
+    query.offset.assert_not_called()
+    assert docs == snapshots[:2]
+    assert has_more
+    assert decode_cursor(next_cursor) == ([1, "d1"], CURSOR_NEXT)
+    assert decode_cursor(prev_cursor) == ([0, "d0"], CURSOR_PREV)
+
+
+def test_paginate_backwards_uses_end_before():
+    query = MagicMock()
+    snapshots = [make_snapshot(f"d{i}", i) for i in range(2)]
+    query.end_before.return_value.limit_to_last.return_value.get.return_value = snapshots
+
+    cursor = encode_cursor([2, "d2"], CURSOR_PREV)
+    docs, has_more, next_cursor, prev_cursor = paginate(query, ORDER_FIELDS, 2, 2, cursor=cursor)
+
+    query.end_before.return_value.limit_to_last.assert_called_once_with(3)
+    assert docs == snapshots
+    assert has_more
+    assert prev_cursor is None
+    assert decode_cursor(next_cursor) == ([1, "d1"], CURSOR_NEXT)
+
+
+def test_paginate_by_page_keeps_offset_compatibility():
+    query = MagicMock()
+    query.offset.return_value.limit.return_value.stream.return_value = [make_snapshot("d4", 4)]
+
+    docs, has_more, next_cursor, prev_cursor = paginate(query, ORDER_FIELDS, 3, 2)
+
+    query.offset.assert_called_once_with(4)
+    assert not has_more
+    assert next_cursor is None
+    assert prev_cursor is not None
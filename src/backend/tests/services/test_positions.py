@@ -0,0 +1,106 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from services.positions import OidPositions, PositionIndex
+
+
+def arrays(dates, lats, lons):
+    return np.array(dates, dtype=np.int64), np.array(lats, dtype=float), np.array(lons, dtype=float)
+
+
+def test_interpolation_between_fixes():
+    track = OidPositions(*arrays([0, 100, 300], [0.0, 1.0, 3.0], [10.0, 11.0, 13.0]), version=0, now=0)
+
+    result = track.interpolate(np.array([-1, 0, 50, 200, 300, 301]))
+
+    assert result["valid"].tolist() == [False, True, True, True, True, False]
+    assert result["lat"][1:5].tolist() == pytest.approx([0.0, 0.5, 2.0, 3.0])
+    assert result["lon"][1:5].tolist() == pytest.approx([10.0, 10.5, 12.0, 13.0])
+    assert result["gap"][1:5].tolist() == [0, 100, 200, 0]
+
+
+def test_interpolation_across_antimeridian():
+    track = OidPositions(*arrays([0, 100], [0.0, 0.0], [179.0, -179.0]), version=0, now=0)
+
+    assert abs(track.interpolate(np.array([50]))["lon"][0]) == pytest.approx(180.0)
+    assert track.interpolate(np.array([75]))["lon"][0] == pytest.approx(-179.5)
+
+
+def test_merge_keeps_dates_sorted_and_unique():
+    track = OidPositions(*arrays([0, 100], [0.0, 1.0], [0.0, 1.0]), version=0, now=0)
+
+    track.merge(*arrays([200], [2.0], [2.0]))
+    track.merge(*arrays([50, 100], [0.5, 9.0], [0.5, 9.0]))
+
+    dates, lats, _, _ = track.data
+    assert dates.tolist() == [0, 50, 100, 200]
+    assert lats.tolist() == [0.0, 0.5, 9.0, 2.0]
+
+
+def test_index_refreshes_incrementally_when_version_changes():
+    index = PositionIndex(refresh_interval=60, full_reload=3600)
+    loads = []
+
+    def load(oid, after=None):
+        loads.append(after)
+        return arrays([0, 100], [0.0, 1.0], [0.0, 1.0]) if after is None else arrays([200], [2.0], [2.0])
+
+    with patch("services.positions.load_positions", side_effect=load), \
+            patch("services.positions.get_version", side_effect=[1, 1, 2]):
+        index.get("shark", now=0)
+        index.get("shark", now=30)  # within the refresh interval: no reads
+        index.get("shark", now=61)  # same version: nothing to load
+        track = index.get("shark", now=130)
+
+    assert loads == [None, 100]
+    assert len(track) == 3
+    assert index.stats()["refreshes"] == 1
+
+
+def test_index_evicts_least_recently_used():
+    index = PositionIndex(max_oids=1)
+    with patch("services.positions.load_positions", return_value=arrays([0], [0.0], [0.0])), \
+            patch("services.positions.get_version", return_value=0):
+        index.get("a")
+        index.get("b")
+        index.get("a")
+
+    assert index.stats()["loads"] == 3
+    assert index.stats()["oids"] == 1
+
+
+@pytest.fixture
+def two_fixes():
+    with patch("services.positions.load_positions", return_value=arrays([0, 100], [0.0, 1.0], [0.0, 2.0])), \
+            patch("services.positions.get_version", return_value=0):
+        yield
+
+
+@pytest.mark.asyncio
+async def test_positions_endpoint(async_client, two_fixes):
+    response = await async_client.get("/telemetria/positions", params={"t": 50, "oids": "a,b"})
+
+    assert response.status_code == 200
+    positions = response.json()["positions"]
+    assert [p["oid"] for p in positions] == ["a", "b"]
+    assert positions[0]["lat"] == pytest.approx(0.5)
+    assert positions[0]["lon"] == pytest.approx(1.0)
+
+
+@pytest.mark.asyncio
+async def test_positions_range_endpoint(async_client, two_fixes):
+    response = await async_client.get(
+        "/telemetria/positions/range", params={"oids": "a", "start": 50, "end": 150, "step": 50}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["times"] == [50, 100, 150]
+    assert data["tracks"]["a"]["lat"] == [0.5, 1.0, None]
+
+    response = await async_client.get(
+        "/telemetria/positions/range", params={"oids": "a", "start": 0, "end": 10**9, "step": 1}
+    )
+    assert response.status_code == 400
@@ -0,0 +1,37 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from database import registry
+from services.avistamentos import query_avistamentos
+from services.projection import parse_fields, project, select_fields
+
+
+def test_parse_fields():
+    assert parse_fields("local, registro,local") == ("local", "registro")
+    assert parse_fields("") is None
+    assert parse_fields(None) is None
+    with pytest.raises(ValueError):
+        parse_fields("local,a.b")
+
+
+def test_select_keeps_order_fields_and_project_trims_them():
+    assert select_fields(("local",), ["registro", "__name__"]) == ["local", "registro"]
+    assert select_fields(None, ["registro"]) is None
+    assert project({"local": "Sueste", "registro": "1"}, ("local",)) == {"local": "Sueste"}
+
+
+def test_query_selects_requested_fields():
+    db = registry.firestore
+    snapshot = MagicMock()
+    snapshot.id = "1"
+    snapshot.to_dict.return_value = {"registro": "1", "local": "Sueste"}
+    query = db.collection.return_value.order_by.return_value.order_by.return_value.select.return_value
+    query.limit.return_value.stream.return_value = [snapshot]
+
+    items, *_ = query_avistamentos(fields=("local",))
+
+    db.collection.return_value.order_by.return_value.order_by.return_value.select.assert_called_once_with(
+        ["local", "registro"]
+    )
+    assert items == [{"local": "Sueste"}]
@@ -0,0 +1,128 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from services.avistamentos import create_avistamento_doc, query_avistamentos
+from services.query_cache import QueryCache, SingleFlight, avistamentos_cache
+
+
+def test_entries_expire_after_ttl():
+    cache = QueryCache("test", ttl=30)
+    cache.put("a", 1, cache.generation, now=0)
+
+    assert cache.get("a", now=29) == 1
+    assert cache.get("a", now=31) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_lru_eviction():
+    cache = QueryCache("test", maxsize=2)
+    cache.put("a", 1, cache.generation)
+    cache.put("b", 2, cache.generation)
+    cache.get("a")
+    cache.put("c", 3, cache.generation)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_result_loaded_across_invalidation_is_not_stored():
+    cache = QueryCache("test")
+
+    def load():
+        cache.invalidate()  # a write happens while the query runs
+        return "stale"
+
+    assert cache.get_or_load("a", load) == "stale"
+    assert cache.get("a") is None
+
+
+@pytest.fixture
+def mock_paginate():
+    with patch("services.avistamentos.paginate") as mock:
+        doc = MagicMock()
+        doc.to_dict.return_value = {"registro": "1"}
+        mock.return_value = ([doc], False, None, None)
+        yield mock
+
+
+def test_identical_queries_hit_the_cache(mock_paginate):
+    items, *_ = query_avistamentos(page=1, page_size=10, ano_registro=2024)
+    items[0]["image_url"] = "changed by the caller"
+    items, *_ = query_avistamentos(page=1, page_size=10, ano_registro=2024)
+
+    assert items == [{"registro": "1"}]
+    assert mock_paginate.call_count == 1
+
+    query_avistamentos(page=1, page_size=10, ano_registro=2023)
+    assert mock_paginate.call_count == 2
+    assert avistamentos_cache.stats()["hit_ratio"] == pytest.approx(1 / 3)
+
+
+def test_writes_invalidate_the_cache(mock_paginate, fake_clients):
+    firestore_client, _ = fake_clients
+    firestore_client.collection.return_value.document.return_value.get.return_value.exists = False
+
+    query_avistamentos()
+    create_avistamento_doc("2", {"registro": "2"})
+    query_avistamentos()
+
+    assert mock_paginate.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_metrics(async_client):
+    response = await async_client.get("/metrics")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert {"avistamentos", "telemetria", "tracks"} <= set(data["query_cache"])
+    assert "hit_ratio" in data["signed_url_cache"]
+
+
+def run_concurrently(count, fn):
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(count) as pool:
+        futures = [pool.submit(fn) for _ in range(count)]
+        return [future.exception() or future.result() for future in futures]
+
+
+def test_concurrent_misses_share_one_load():
+    import threading
+    import time
+
+    cache = QueryCache("test")
+    started = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return ["page"]
+
+    results = run_concurrently(8, lambda: cache.get_or_load("a", load))
+
+    assert results == [["page"]] * 8
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 7
+
+
+def test_coalesced_callers_share_the_error():
+    import time
+
+    flight = SingleFlight("test")
+
+    def fail():
+        time.sleep(0.05)
+        raise ValueError("boom")
+
+    results = run_concurrently(4, lambda: flight.do("a", fail))
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.stats()["calls"] + flight.stats()["coalesced"] == 4
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,50 @@
+import datetime
+from unittest.mock import patch
+
+import msgpack
+import numpy as np
+import orjson
+import pytest
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+from google.cloud.firestore_v1 import GeoPoint
+
+from services.serialization import dumps_json, dumps_msgpack, is_api_request
+
+
+def test_firestore_and_numpy_values():
+    content = {
+        "when": DatetimeWithNanoseconds(2024, 3, 1, 12, tzinfo=datetime.timezone.utc),
+        "where": GeoPoint(-3.85, -32.42),
+        "n": np.int64(3),
+        "xs": np.array([1.5, 2.5]),
+    }
+    expected = {
+        "when": "2024-03-01T12:00:00+00:00",
+        "where": {"latitude": -3.85, "longitude": -32.42},
+        "n": 3,
+        "xs": [1.5, 2.5],
+    }
+
+    assert orjson.loads(dumps_json(content)) == expected
+    assert msgpack.unpackb(dumps_msgpack(content)) == expected
+
+
+def test_is_api_request():
+    assert is_api_request("msgpack", None)
+    assert is_api_request(None, "application/x-msgpack")
+    assert not is_api_request(None, "text/html,application/json")
+    assert not is_api_request(None, None)
+
+
+@pytest.mark.asyncio
+async def test_msgpack_negotiation(async_client):
+    stats = {"oid": "a", "fixes": 2, "distance": 12.5}
+    with patch("api.endpoints.telemetria.movement_stats", return_value=stats):
+        packed = await async_client.get("/telemetria/a/stats", headers={"Accept": "application/msgpack"})
+        plain = await async_client.get("/telemetria/a/stats")
+
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert packed.headers["vary"] == "Accept"
+    assert msgpack.unpackb(packed.content) == stats
+    assert plain.headers["content-type"] == "application/json"
+    assert plain.json() == stats
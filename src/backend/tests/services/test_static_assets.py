@@ -0,0 +1,29 @@
+import pytest
+from httpx import AsyncClient
+
+from services.etags import etag_matches, make_etag
+from services.static_assets import IMMUTABLE, static_url
+
+
+def test_etag_matches():
+    etag = make_etag("avistamentos", 3)
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(make_etag("avistamentos", 4), etag)
+    assert not etag_matches(None, etag)
+
+
+@pytest.mark.asyncio
+async def test_fingerprinted_static_files_are_immutable(async_client: AsyncClient):
+    url = static_url("/styles.css")
+    assert url.startswith("/static/styles.css?v=")
+
+    response = await async_client.get(url)
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == IMMUTABLE
+
+    # Without (or with an outdated) fingerprint the file must be revalidated
+    response = await async_client.get("/static/styles.css?v=outdated")
+    assert response.headers["Cache-Control"] == "no-cache"
@@ -0,0 +1,52 @@
+
+from services.storage import SignedUrlCache, generate_signed_url, generate_signed_urls, signed_url_cache
+
+
+def test_expiry_is_rounded_up_to_bucket():
+    cache = SignedUrlCache(bucket_seconds=900, min_remaining=600)
+
+    assert cache.expires_at(3600, now=0) == 3600
+    assert cache.expires_at(3600, now=1000) == 5400
+    assert cache.expires_at(3600, now=1800) == 5400
+
+
+def test_cached_url_is_reused_while_valid():
+    cache = SignedUrlCache(bucket_seconds=900, min_remaining=600)
+    cache.put("a.jpg", 3600, "url-a", expires_at=4500)
+
+    assert cache.get("a.jpg", 3600, now=3000) == "url-a"
+    # Less than min_remaining seconds left: must be signed again
+    assert cache.get("a.jpg", 3600, now=4000) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_eviction():
+    cache = SignedUrlCache(maxsize=2)
+    cache.put("a", 60, "url-a", expires_at=10**10)
+    cache.put("b", 60, "url-b", expires_at=10**10)
+    cache.get("a", 60)
+    cache.put("c", 60, "url-c", expires_at=10**10)
+
+    assert cache.get("b", 60) is None
+    assert cache.get("a", 60) == "url-a"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_generate_signed_url_signs_once(fake_clients):
+    _, storage_client = fake_clients
+    blob = storage_client.bucket.return_value.blob.return_value
+
+    assert generate_signed_url("imagens/1.jpg") == generate_signed_url("imagens/1.jpg")
+    blob.generate_signed_url.assert_called_once()
+
+
+def test_generate_signed_urls_batch(fake_clients):
+    _, storage_client = fake_clients
+    generate_signed_url("imagens/1.jpg")
+
+    urls = generate_signed_urls(["imagens/1.jpg", "imagens/2.jpg", "imagens/3.jpg"])
+
+    assert set(urls) == {"imagens/1.jpg", "imagens/2.jpg", "imagens/3.jpg"}
+    assert storage_client.bucket.return_value.blob.call_count == 3
+    assert signed_url_cache.stats()["hits"] == 1
@@ -0,0 +1,102 @@
+import datetime
+import gzip
+from unittest.mock import MagicMock, patch
+
+import msgpack
+import numpy as np
+import pytest
+
+from database import registry
+from services import sync
+from services.sync import SYNC_COLLECTIONS, build_bundle, decode_watermark, encode_watermark, sync_changes
+
+T0 = datetime.datetime(2024, 9, 1, 12, 0, 0, 123456, tzinfo=datetime.timezone.utc)
+
+
+def snapshot_of(doc_id, data):
+    snapshot = MagicMock()
+    snapshot.id = doc_id
+    snapshot.to_dict.return_value = data
+    return snapshot
+
+
+def collections(db):
+    # One query mock per collection
+    mocks = {name: MagicMock() for name in SYNC_COLLECTIONS}
+    db.collection.side_effect = lambda name: mocks[name]
+    return {name: mock.order_by.return_value.order_by.return_value for name, mock in mocks.items()}
+
+
+def test_watermark_roundtrip():
+    marks = {"avistamentos": (T0, "12"), "avistamentos_removidos": (T0, None), "telemetria": (None, None)}
+    token = encode_watermark(marks, 1700000000123456789)
+    assert decode_watermark(token) == (marks, 1700000000123456789)
+
+    with pytest.raises(ValueError):
+        decode_watermark("not-a-watermark")
+    with pytest.raises(ValueError):
+        decode_watermark(encode_watermark({"avistamentos": (T0, "1")}, None))
+
+
+def test_sync_changes_reads_after_the_watermark():
+    queries = collections(registry.firestore)
+    t1 = T0 + datetime.timedelta(seconds=1)
+    queries["avistamentos"].start_after.return_value.limit.return_value.stream.return_value = [
+        snapshot_of("13", {"registro": "13", "updated_at": t1}),
+        snapshot_of("14", {"registro": "14", "updated_at": t1}),
+    ]
+    removed = queries["avistamentos_removidos"].select.return_value.where.return_value
+    removed.limit.return_value.stream.return_value = [snapshot_of("7", {"updated_at": t1})]
+    telemetry = queries["telemetria"].select.return_value.where.return_value
+    telemetry.limit.return_value.stream.return_value = [
+        snapshot_of("a", {"oid": "x", "date": 1725148800, "updated_at": t1}),
+        snapshot_of("b", {"oid": "x", "date": 1000, "updated_at": t1}),  # older than the cutoff
+    ]
+    since = encode_watermark(
+        {"avistamentos": (T0, "12"), "avistamentos_removidos": (T0, None), "telemetria": (T0, None)}, None
+    )
+
+    with patch.object(sync, "telemetria_cutoff", return_value=1700000000), patch.object(
+        sync, "places_version", return_value=None
+    ):
+        changes = sync_changes(since, limit=1)
+
+    assert queries["avistamentos"].start_after.call_args.args[0]["updated_at"] == T0
+    assert [item["registro"] for item in changes["avistamentos"]["changed"]] == ["13"]
+    assert changes["avistamentos"]["deleted"] == [{"registro": "7", "updated_at": t1}]
+    assert changes["telemetria"]["changed"] == [{"oid": "x", "date": 1725148800, "updated_at": t1, "id": "a"}]
+    assert changes["has_more"] is True
+    assert changes["places"] is None
+
+    marks, _ = decode_watermark(changes["watermark"])
+    assert marks == {"avistamentos": (t1, "13"), "avistamentos_removidos": (t1, "7"), "telemetria": (t1, "a")}
+
+
+def test_build_bundle(tmp_path):
+    db = registry.firestore
+    db.collection.return_value.document.return_value.get.return_value.read_time = T0
+    db.collection.return_value.stream.return_value = [snapshot_of("1", {"registro": "1", "updated_at": T0})]
+    db.collection.return_value.select.return_value.where.return_value.stream.return_value = [
+        snapshot_of("a", {"oid": "x", "date": 1725148800, "latitude": -3.85, "longitude": -32.42}),
+        snapshot_of("b", {"oid": "y", "date": 1725148860, "latitude": -3.86, "longitude": -32.43}),
+        snapshot_of("c", {"oid": "x", "date": 1725148920, "latitude": None, "longitude": -32.43}),
+    ]
+
+    path = tmp_path / "bundle.msgpack.gz"
+    with patch.object(sync, "_load_places", return_value=[{"name": "Sueste"}]):
+        counts = build_bundle(path)
+
+    assert counts["avistamentos"] == 1 and counts["telemetria"] == 2
+    bundle = msgpack.unpackb(gzip.decompress(path.read_bytes()))
+    assert bundle["format"] == 1
+    assert bundle["avistamentos"] == [{"registro": "1", "updated_at": T0.isoformat()}]
+    assert bundle["places"] == [{"name": "Sueste"}]
+    marks, _ = decode_watermark(bundle["watermark"])
+    assert marks["avistamentos"] == (T0, None)
+
+    telemetry = bundle["telemetria"]
+    assert telemetry["oids"] == ["x", "y"]
+    columns = {name: np.frombuffer(data, dtype=telemetry["dtypes"][name]) for name, data in telemetry["columns"].items()}
+    assert columns["oid_index"].tolist() == [0, 1]
+    assert columns["date"].tolist() == [1725148800, 1725148860]
+    assert columns["latitude"].tolist() == [-3.85, -3.86]
@@ -0,0 +1,106 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from services import telemetria_analytics
+from services.places import PlaceIndex
+from services.telemetria_analytics import MovementStats, all_movement_stats, haversine, movement_stats, telemetria_oids
+
+SQUARE = [{"name": "Baía", "points": [{"lat": 0, "lon": 0}, {"lat": 0, "lon": 1}, {"lat": 1, "lon": 1}, {"lat": 1, "lon": 0}]}]
+
+
+def test_haversine_one_degree_of_latitude():
+    assert haversine([0.0], [0.0], [1.0], [0.0])[0] == pytest.approx(111195, rel=1e-4)
+
+
+def test_incremental_equals_full():
+    dates = np.arange(0, 1000, 100)
+    lats = np.linspace(-3.8, -3.9, 10)
+    lons = np.linspace(-32.4, -32.5, 10)
+    places = ["Baía"] * 5 + [None] * 5
+
+    full = MovementStats(with_places=True)
+    full.add(dates, lats, lons, places)
+    incremental = MovementStats(with_places=True)
+    incremental.add(dates[:4], lats[:4], lons[:4], places[:4])
+    incremental.add(dates[4:], lats[4:], lons[4:], places[4:])
+
+    expected, result = full.to_dict("a"), incremental.to_dict("a")
+    for key in ("distance", "mean_speed", "max_speed", "outside"):
+        assert result.pop(key) == pytest.approx(expected.pop(key))
+    assert result == expected
+    assert full.to_dict("a")["residency"] == {"Baía": 450.0}
+    assert full.to_dict("a")["outside"] == 450.0
+    assert full.to_dict("a")["duration"] == 900
+
+
+@pytest.fixture
+def track():
+    data = {
+        "dates": np.array([0, 100, 200], dtype=np.int64),
+        "lats": np.array([0.5, 0.5, 2.0]),
+        "lons": np.array([0.5, 0.6, 0.6]),
+    }
+
+    def load(oid, after=None):
+        keep = data["dates"] > (after if after is not None else -1)
+        return data["dates"][keep], data["lats"][keep], data["lons"][keep]
+
+    with patch("services.positions.load_positions", side_effect=load), \
+            patch("services.positions.get_version", return_value=0), \
+            patch("services.telemetria_analytics.get_place_index", return_value=PlaceIndex(SQUARE)):
+        yield data
+
+
+def test_stats_are_memoized_and_extended(track):
+    with patch.object(MovementStats, "add", autospec=True, side_effect=MovementStats.add) as add:
+        first = movement_stats("shark")
+        assert movement_stats("shark") == first
+        assert add.call_count == 1
+
+        # Telemetry appended: only the new fix is added
+        telemetria_analytics.position_index.get("shark").merge(
+            np.array([300], dtype=np.int64), np.array([2.0]), np.array([0.7])
+        )
+        extended = movement_stats("shark")
+
+    assert add.call_count == 2
+    assert len(add.call_args.args[1]) == 1
+    assert extended["fixes"] == 4
+    assert extended["distance"] > first["distance"]
+    assert first["residency"] == {"Baía": 150.0}
+
+
+@pytest.mark.asyncio
+async def test_stats_endpoints(async_client, track):
+    response = await async_client.get("/telemetria/shark/stats")
+    assert response.status_code == 200
+    assert response.json()["fixes"] == 3
+
+    with patch("services.telemetria_analytics.telemetria_oids", return_value=["shark"]):
+        response = await async_client.get("/telemetria/stats")
+    assert response.json()["count"] == 1
+    assert response.json()["items"][0]["oid"] == "shark"
+
+
+def test_oids_and_all_stats_are_cached_per_version(track):
+    def snapshot(oid):
+        return type("Snapshot", (), {"to_dict": lambda self: {"oid": oid}})()
+
+    with patch("services.telemetria_analytics.rollups_ready", return_value=True), \
+            patch("services.telemetria_analytics.db") as db, \
+            patch("services.telemetria_analytics.cached_version", return_value=1) as version, \
+            patch("services.telemetria_analytics.movement_stats", side_effect=movement_stats) as stats:
+        db.collection.return_value.select.return_value.stream.return_value = [snapshot("shark"), snapshot("shark")]
+        assert telemetria_oids() == ["shark"]
+        assert [item["oid"] for item in all_movement_stats()] == ["shark"]
+        all_movement_stats()
+        assert db.collection.return_value.select.return_value.stream.call_count == 1
+        assert stats.call_count == 1
+
+        # An import bumps the telemetry version
+        version.return_value = 2
+        all_movement_stats()
+        assert db.collection.return_value.select.return_value.stream.call_count == 2
+        assert stats.call_count == 2
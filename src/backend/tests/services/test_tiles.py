@@ -0,0 +1,95 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from services import tiles
+from services.tile_cache import DiskTileCache
+from test_mvt import decode_tile
+
+
+def _points(lats, lons, **columns):
+    return tiles._points_data(lats, lons, np.ones(len(lats)), {k: np.array(v, dtype=object) for k, v in columns.items()})
+
+
+def test_points_are_clustered_per_tile():
+    # Two fixes a few meters apart and one far away (same tile at zoom 8)
+    data = _points([-3.850, -3.85001, -3.900], [-32.420, -32.42001, -32.450], oid=["a", "b", "c"])
+    z = 8
+    mx, my = tiles.mercator([-3.85], [-32.42])
+    x, y = int(mx[0] * (1 << z)), int(my[0] * (1 << z))
+
+    features = decode_tile(tiles.render_tile("telemetria", data, z, x, y))["telemetria"]["features"]
+
+    props = sorted((f[2] for f in features), key=lambda p: p["count"])
+    assert props == [{"count": 1, "oid": "c"}, {"count": 2, "cluster": True, "point_count": 2}]
+
+    # Nothing in a distant tile
+    assert tiles.render_tile("telemetria", data, z, x + 5, y) == b""
+
+
+def test_polygons_are_clipped_to_the_buffered_tile():
+    square = np.array([[-32.5, -3.9], [-32.3, -3.9], [-32.3, -3.7], [-32.5, -3.7]])
+    mx, my = tiles.mercator(square[:, 1], square[:, 0])
+    data = {
+        "kind": "polygons",
+        "rings": [(mx, my)],
+        "bboxes": np.array([[mx.min(), my.min(), mx.max(), my.max()]]),
+        "names": ["Mar de Fora"],
+    }
+    # Zoom 14 tile inside the square: the clipped ring is the buffered tile
+    z = 14
+    cx, cy = tiles.mercator([-3.8], [-32.4])
+    x, y = int(cx[0] * (1 << z)), int(cy[0] * (1 << z))
+
+    (geometry_type, feature_id, props, commands), = decode_tile(
+        tiles.render_tile("places", data, z, x, y, extent=4096, buffer=64)
+    )["places"]["features"]
+
+    assert (geometry_type, feature_id, props) == (3, 1, {"name": "Mar de Fora"})
+    assert commands[0] == 9 and commands[3] == (3 << 3) | 2 and commands[-1] == 15
+    ring = np.cumsum(np.array([[(v >> 1) ^ -(v & 1) for v in commands[i:i + 2]] for i in (1, 4, 6, 8)]), axis=0)
+    assert ring.min() == -64 and ring.max() == 4096 + 64
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskTileCache(tmp_path, max_bytes=10)
+    cache.put("t/1/0/0/0.mvt", b"1234")
+    cache.put("t/1/0/0/1.mvt", b"1234")
+    assert cache.get("t/1/0/0/0.mvt") == b"1234"
+    cache.put("t/1/0/0/2.mvt", b"1234")
+
+    assert cache.get("t/1/0/0/1.mvt") is None
+    assert not (tmp_path / "t/1/0/0/1.mvt").exists()
+    assert cache.stats()["bytes"] == 8
+
+    # A new instance indexes the files already on disk
+    assert DiskTileCache(tmp_path, max_bytes=10).stats()["tiles"] == 2
+
+
+@pytest.fixture
+def tile_cache(tmp_path):
+    cache = DiskTileCache(tmp_path)
+    with patch("services.tiles.tile_cache", cache):
+        yield cache
+
+
+@pytest.mark.asyncio
+async def test_tile_endpoint(async_client, tile_cache):
+    data = _points([-3.85], [-32.42], local=["Sancho"])
+    with patch("services.tiles.get_version", return_value=3), \
+            patch("services.tiles.load_layer_data", return_value=data) as load:
+        first = await async_client.get("/tiles/avistamentos/0/0/0.mvt")
+        second = await async_client.get("/tiles/avistamentos/0/0/0.mvt")
+
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "application/vnd.mapbox-vector-tile"
+    assert first.content == second.content
+    assert decode_tile(first.content)["avistamentos"]["features"][0][2] == {"count": 1, "local": "Sancho"}
+    assert load.call_count == 1
+    assert tile_cache.stats()["hits"] == 1
+    assert (tile_cache.directory / "avistamentos/v3/0/0/0.mvt").exists()
+
+    assert (await async_client.get("/tiles/other/0/0/0.mvt")).status_code == 404
+    assert (await async_client.get("/tiles/places/1/2/0.mvt")).status_code == 400
+    assert (await async_client.get("/tiles/places/30/0/0.mvt")).status_code == 422
@@ -0,0 +1,106 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from services.tracks import (
+    VISVALINGAM,
+    douglas_peucker_significance,
+    get_track,
+    select_points,
+    visvalingam_significance,
+)
+
+
+def zigzag():
+    # A straight line with a 50 m bump at x=500 and 1 m noise elsewhere
+    x = np.arange(0.0, 1001.0, 100.0)
+    y = np.array([0, 1, 0, 1, 0, 50, 0, 1, 0, 1, 0], dtype=float)
+    return x, y
+
+
+def test_douglas_peucker_keeps_points_above_tolerance():
+    x, y = zigzag()
+    significance = douglas_peucker_significance(x, y)
+
+    assert np.isinf(significance[[0, -1]]).all()
+    # The bump and its two feet
+    assert select_points(significance, threshold=10).tolist() == [0, 4, 5, 6, 10]
+    assert len(select_points(significance, threshold=0.1)) == len(x)
+
+
+def test_visvalingam_removes_flat_points_first():
+    # A triangle with 1 m noise on its sides
+    x = np.arange(0.0, 1001.0, 100.0)
+    y = np.array([0, 11, 20, 31, 40, 50, 40, 31, 20, 11, 0], dtype=float)
+    significance = visvalingam_significance(x, y)
+
+    assert select_points(significance, max_points=3).tolist() == [0, 5, 10]
+    # Effective areas never decrease in removal order
+    assert significance[5] == significance[1:-1].max()
+
+
+def test_point_budget():
+    x = np.linspace(0, 1000, 200)
+    y = np.sin(x / 50) * 30
+    kept = select_points(douglas_peucker_significance(x, y), max_points=20)
+
+    assert len(kept) == 20
+    assert kept[0] == 0 and kept[-1] == 199
+    assert (np.diff(kept) > 0).all()
+
+
+@pytest.fixture
+def positions():
+    dates = np.arange(11, dtype=np.int64) * 60
+    lats = -3.85 + np.array([0, 1, 0, 1, 0, 50, 0, 1, 0, 1, 0]) * 1e-5
+    lons = -32.42 + np.arange(11) * 1e-3
+    with patch("services.tracks.load_positions", return_value=(dates, lats, lons)) as mock:
+        yield mock
+
+
+def test_track_is_cached_until_version_changes(positions):
+    with patch("services.tracks.cached_version", return_value=1):
+        track = get_track("shark", tolerance=10)
+        get_track("shark", tolerance=10)
+        get_track("shark", tolerance=1)
+
+    assert track["geometry"]["type"] == "LineString"
+    assert track["properties"]["times"] == [0, 240, 300, 360, 600]
+    assert track["properties"]["point_count"] == 11
+    assert positions.call_count == 1
+
+    with patch("services.tracks.cached_version", return_value=2):
+        get_track("shark", tolerance=10)
+    assert positions.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_track_endpoint(async_client, positions):
+    with patch("services.tracks.cached_version", return_value=0):
+        response = await async_client.get(
+            "/telemetria/shark/track", params={"method": VISVALINGAM, "max_points": 3}
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/geo+json"
+    assert len(response.json()["geometry"]["coordinates"]) == 3
+
+
+def test_single_position_track_is_a_point():
+    one = (np.array([60], dtype=np.int64), np.array([-3.85]), np.array([-32.42]))
+    with patch("services.tracks.cached_version", return_value=0), \
+            patch("services.tracks.load_positions", return_value=one):
+        track = get_track("lonely")
+
+    assert track["geometry"] == {"type": "Point", "coordinates": [-32.42, -3.85]}
+    assert track["properties"]["times"] == [60]
+
+
+@pytest.mark.asyncio
+async def test_track_endpoint_errors(async_client):
+    empty = (np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+    with patch("services.tracks.cached_version", return_value=0), \
+            patch("services.tracks.load_positions", return_value=empty):
+        assert (await async_client.get("/telemetria/none/track")).status_code == 404
+    assert (await async_client.get("/telemetria/x/track", params={"method": "nope"})).status_code == 400
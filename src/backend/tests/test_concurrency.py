@@ -0,0 +1,30 @@
+
+import asyncio
+import time
+
+import pytest
+from unittest.mock import patch
+from httpx import AsyncClient
+
+LATENCY = 0.2
+CLIENTS = 10
+
+
+def slow_query_avistamentos(**kwargs):
+    # Simulates a blocking Firestore round trip
+    time.sleep(LATENCY)
+    return [], 1, 10, False, None, None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_overlap(async_client: AsyncClient):
+    with patch("api.endpoints.avistamentos.query_avistamentos", side_effect=slow_query_avistamentos):
+        start = time.perf_counter()
+        responses = await asyncio.gather(
+            *[async_client.get("/avistamentos", params={"format": "json"}) for _ in range(CLIENTS)]
+        )
+        elapsed = time.perf_counter() - start
+
+    assert all(response.status_code == 200 for response in responses)
+    # Serialized on the event loop this would take CLIENTS * LATENCY seconds
+    assert elapsed < CLIENTS * LATENCY / 2
@@ -0,0 +1,37 @@
+
+from unittest.mock import MagicMock
+
+from database import ClientRegistry
+
+
+def test_clients_are_created_lazily_and_shared():
+    factory = MagicMock()
+    registry = ClientRegistry(firestore_factory=factory, storage_factory=MagicMock())
+
+    factory.assert_not_called()
+    assert registry.firestore is registry.firestore
+    factory.assert_called_once()
+
+
+def test_override_and_close():
+    original = MagicMock()
+    registry = ClientRegistry(firestore_factory=lambda: original, storage_factory=MagicMock())
+    registry.warm()
+
+    replacement = MagicMock()
+    registry.override(firestore=replacement)
+    original.close.assert_called_once()
+    assert registry.firestore is replacement
+
+    registry.close()
+    replacement.close.assert_called_once()
+    assert registry.firestore is original
+
+
+def test_set_factory_for_emulator():
+    registry = ClientRegistry(firestore_factory=MagicMock(), storage_factory=MagicMock())
+    emulator_client = MagicMock()
+
+    registry.set_factory("firestore", lambda: emulator_client)
+
+    assert registry.firestore is emulator_client